@@ -8,7 +8,7 @@ Pattern based on databricks-ai-ticket-vectorsearch project
 
 import streamlit as st
 import os
-from databricks.sdk import WorkspaceClient
+from utils.databricks_client import get_workspace_client
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
@@ -383,65 +383,31 @@ SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "159828d8fa91cd28")  # From app.yaml
 ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
 
-# Initialize Databricks client (uses Databricks Apps authentication)
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient (automatically authenticated in Databricks Apps)"""
-    try:
-        # Check if we have OAuth credentials configured
-        client_id = os.getenv("DATABRICKS_CLIENT_ID")
-        client_secret = os.getenv("DATABRICKS_CLIENT_SECRET")
-        host = os.getenv("DATABRICKS_HOST")
-        
-        if client_id and client_secret and host:
-            # OAuth authentication with service principal
-            from databricks.sdk.oauth import ClientCredentials
-            
-            return WorkspaceClient(
-                host=f"https://{host}" if not host.startswith("http") else host,
-                client_id=client_id,
-                client_secret=client_secret
-            )
-        elif host:
-            # Try with host only (will use other auth methods)
-            return WorkspaceClient(host=f"https://{host}" if not host.startswith("http") else host)
-        else:
-            # Default initialization (works in Databricks Apps)
-            return WorkspaceClient()
-            
-    except Exception as e:
-        error_msg = str(e)
-        
-        if "default auth: cannot configure default credentials" in error_msg:
-            st.error("❌ **Authentication Configuration Missing**")
-            st.warning("""
-            **For Databricks Apps deployment:**
-            - This error occurs during local development
-            - The app will authenticate automatically when deployed to Databricks Apps
-            - To test locally, configure authentication in `~/.databrickscfg`
-            
-            **To fix:**
-            1. **Deploy to Databricks** (recommended):
-               ```bash
-               databricks apps deploy frauddetection-prod --source-code-path prod/files/app
-               ```
-            
-            2. **Or configure local auth**:
-               - Go to: https://docs.databricks.com/en/dev-tools/auth.html
-               - Set up authentication profile
-               - Or set DATABRICKS_HOST and DATABRICKS_TOKEN environment variables
-            """)
-        else:
-            st.error(f"Failed to initialize Databricks client: {error_msg}")
-            
-        return None
-
+# Shared Databricks client (uses Databricks Apps authentication)
 w = get_workspace_client()
 
 # Show authentication status in sidebar
 if w is None:
     st.sidebar.error("⚠️ Not connected to Databricks")
     st.sidebar.info("Deploy to Databricks Apps to enable full functionality")
+    with st.sidebar.expander("🔐 How to fix authentication"):
+        st.markdown("""
+        **For Databricks Apps deployment:**
+        - This error occurs during local development
+        - The app will authenticate automatically when deployed to Databricks Apps
+        - To test locally, configure authentication in `~/.databrickscfg`
+        
+        **To fix:**
+        1. **Deploy to Databricks** (recommended):
+           ```bash
+           databricks apps deploy frauddetection-prod --source-code-path prod/files/app
+           ```
+        
+        2. **Or configure local auth**:
+           - Go to: https://docs.databricks.com/en/dev-tools/auth.html
+           - Set up authentication profile
+           - Or set DATABRICKS_HOST and DATABRICKS_TOKEN environment variables
+        """)
 
 # Enhanced Sidebar - Clean design
 st.sidebar.markdown("# 🛡️ Fraud Detection")
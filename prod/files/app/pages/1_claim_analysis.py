@@ -8,9 +8,12 @@ import streamlit as st
 import os
 import json
 import time
-from databricks.sdk import WorkspaceClient
 import plotly.graph_objects as go
 import plotly.express as px
+from utils.llm_cache import get_shared_cache
+from utils.databricks_client import get_workspace_client, call_uc_function
+from utils.agent_stream import stream_agent_events, StreamTimings
+from utils.vector_search import query_index, VectorSearchError
 
 # Page configuration
 st.set_page_config(
@@ -176,101 +179,15 @@ WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "159828d8fa91cd28")  # From
 ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
 VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
 
-# Initialize Databricks client
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient (automatically authenticated in Databricks Apps)"""
-    try:
-        # Check for OAuth credentials
-        client_id = os.getenv("DATABRICKS_CLIENT_ID")
-        client_secret = os.getenv("DATABRICKS_CLIENT_SECRET")
-        host = os.getenv("DATABRICKS_HOST")
-        
-        if client_id and client_secret and host:
-            return WorkspaceClient(
-                host=f"https://{host}" if not host.startswith("http") else host,
-                client_id=client_id,
-                client_secret=client_secret
-            )
-        elif host:
-            return WorkspaceClient(host=f"https://{host}" if not host.startswith("http") else host)
-        else:
-            return WorkspaceClient()
-    except Exception as e:
-        if "default auth: cannot configure default credentials" in str(e):
-            st.warning("⚠️ Running in local dev mode. Deploy to Databricks Apps for full functionality.")
-        else:
-            st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
+# Shared Databricks client (pooled connections, retries, latency metrics)
 w = get_workspace_client()
 
-def call_uc_function(function_name, *args, timeout=50, show_debug=False):
-    """Call a Unity Catalog function using Statement Execution API"""
-    try:
-        # Escape single quotes in string arguments
-        escaped_args = []
-        for arg in args:
-            if isinstance(arg, str):
-                escaped_arg = arg.replace("'", "''")
-                escaped_args.append(f"'{escaped_arg}'")
-            else:
-                escaped_args.append(str(arg))
-        
-        args_str = ', '.join(escaped_args)
-        query = f"SELECT {CATALOG}.{SCHEMA}.{function_name}({args_str}) as result"
-        
-        if show_debug:
-            st.info(f"🔍 Executing: {function_name}(...) on warehouse {WAREHOUSE_ID}")
-        
-        result = w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=query,
-            wait_timeout="50s"
-        )
-        
-        if result.status.state.value == "SUCCEEDED":
-            if result.result and result.result.data_array:
-                data = result.result.data_array[0][0]
-                
-                if isinstance(data, str):
-                    import json
-                    try:
-                        parsed = json.loads(data)
-                        return parsed
-                    except:
-                        return data
-                elif isinstance(data, dict):
-                    return data
-                elif isinstance(data, (list, tuple)):
-                    # For STRUCT types returned as arrays
-                    if function_name == "fraud_generate_explanation" and len(data) >= 3:
-                        return {
-                            'summary': data[0],
-                            'key_findings': data[1] if data[1] else [],
-                            'recommendations': data[2] if data[2] else []
-                        }
-                    return data
-                else:
-                    return data
-            return None
-        else:
-            if show_debug:
-                st.error(f"Query failed: {result.status.state.value}")
-                if result.status.error:
-                    st.error(f"Error: {result.status.error.message}")
-            return None
-    
-    except Exception as e:
-        if show_debug:
-            st.error(f"Error calling UC function {function_name}: {e}")
-        return None
-
 # ===== LANGCHAIN TOOLS FOR LANGRAPH AGENT =====
 try:
     from langchain_core.tools import Tool, StructuredTool
     from pydantic import BaseModel, Field
-    from langgraph.prebuilt import create_react_agent
+    from utils.agent_graph import build_parallel_agent, PARALLEL_TOOLS_GUIDANCE
+    from utils.fast_path import FastPathPipeline, benchmark_modes
     from langchain_core.messages import SystemMessage
     from databricks_langchain import ChatDatabricks
     
@@ -311,23 +228,7 @@ try:
             if not w:
                 return json.dumps({"error": "WorkspaceClient not initialized"})
             
-            body = {
-                "columns": ["doc_id", "doc_type", "title", "content"],
-                "num_results": 3,
-                "query_text": query
-            }
-            
-            response = w.api_client.do(
-                'POST',
-                f'/api/2.0/vector-search/indexes/{VECTOR_INDEX}/query',
-                body=body
-            )
-            
-            if isinstance(response, dict) and 'error_code' in response:
-                error_msg = response.get('message', 'Unknown error')
-                return json.dumps({"error": f"Vector Search error: {error_msg}"})
-            
-            data_array = response.get('result', {}).get('data_array', [])
+            data_array = query_index(query, num_results=3, index_name=VECTOR_INDEX, w=w)
             
             if data_array:
                 formatted = []
@@ -340,6 +241,8 @@ try:
                     })
                 return json.dumps(formatted, indent=2)
             return json.dumps([])
+        except VectorSearchError as e:
+            return json.dumps({"error": str(e)})
         except Exception as e:
             return json.dumps({"error": f"Search failed: {str(e)}"})
     
@@ -378,10 +281,43 @@ try:
         args_schema=GenerateExplanationInput
     )
     
+    AGENT_SYSTEM_PROMPT = """You are an expert healthcare fraud detection analyst for insurance payers (Humana, UHG, Cigna, etc.). Your job is to analyze claims and detect fraud.
+
+You have access to these tools:
+1. classify_claim - Determines if claim is fraudulent (returns is_fraudulent, fraud_type, etc). Use this FIRST.
+2. extract_indicators - Extracts detailed fraud indicators. Use after classification.
+3. search_fraud_patterns - Searches fraud knowledge base. Use for most claims.
+4. generate_explanation - Creates comprehensive explanation. MUST pass is_fraudulent and fraud_type from classify_claim results.
+
+IMPORTANT: You MUST use the tools by calling them properly. After using tools, provide a final analysis.
+
+Analysis strategy:
+- First turn: call classify_claim, extract_indicators and search_fraud_patterns together
+- Second turn: call generate_explanation with the is_fraudulent and fraud_type from classify_claim
+- After gathering information, provide your final fraud assessment
+
+""" + PARALLEL_TOOLS_GUIDANCE + """
+
+Be thorough but efficient."""
+    
+    def agent_inputs(claim_text):
+        """Graph input for one claim analysis"""
+        return {
+            "messages": [
+                SystemMessage(content=AGENT_SYSTEM_PROMPT),
+                ("user", f"Analyze this healthcare claim for fraud and provide a comprehensive assessment: {claim_text}")
+            ]
+        }
+    
+    @st.cache_resource
+    def create_fast_path():
+        """Fixed classify || extract -> search || explain DAG over the same tools (no planner turns)"""
+        return FastPathPipeline(classify_tool, extract_tool, search_tool, explain_tool)
+    
     # LangGraph Agent creation
     @st.cache_resource
     def create_langraph_agent():
-        """Create the LangGraph ReAct agent with all tools"""
+        """Create the LangGraph agent with all tools (independent tool calls run in parallel)"""
         try:
             # Use Claude Sonnet 4.5 for EXCELLENT function calling support
             agent_endpoint = os.getenv("LLM_ENDPOINT", "databricks-claude-sonnet-4-5")
@@ -393,16 +329,10 @@ try:
                 max_tokens=2000
             )
             
-            # Create agent with all tools
+            # Create agent with all tools (bound to the LLM inside the graph)
             tools_list = [classify_tool, extract_tool, search_tool, explain_tool]
             
-            # CRITICAL: Bind tools to LLM for consistent JSON format
-            llm_with_tools = llm.bind_tools(tools_list)
-            
-            agent = create_react_agent(
-                model=llm_with_tools,
-                tools=tools_list
-            )
+            agent = build_parallel_agent(llm, tools_list)
             
             return agent
         except Exception as e:
@@ -517,6 +447,17 @@ else:
             value=SAMPLE_CLAIMS[sample_choice]
         )
     
+    execution_mode = st.radio(
+        "Execution mode:",
+        ["Agent: LLM plans the tool calls", "Fast path: Fixed pipeline, no planner turns"],
+        horizontal=True,
+        help="""
+        - Agent: The LLM decides which tools to call and writes the final assessment
+        - Fast path: Classify + extract in parallel, then search + explain only if the claim is flagged
+        """
+    )
+    fast_path_mode = execution_mode.startswith("Fast path")
+    
     # Analysis button
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
@@ -543,83 +484,78 @@ else:
             
             total_start = time.time()
             
-            # Create agent
-            agent = create_langraph_agent()
+            # Only agent mode needs the LLM planner; the fast path runs the tools directly
+            agent = None if fast_path_mode else create_langraph_agent()
             
-            if not agent:
+            if not fast_path_mode and not agent:
                 st.error("Failed to create LangGraph agent")
             else:
-                # System prompt
-                system_prompt = """You are an expert healthcare fraud detection analyst for insurance payers (Humana, UHG, Cigna, etc.). Your job is to analyze claims and detect fraud.
-
-You have access to these tools:
-1. classify_claim - Determines if claim is fraudulent (returns is_fraudulent, fraud_type, etc). Use this FIRST.
-2. extract_indicators - Extracts detailed fraud indicators. Use after classification.
-3. search_fraud_patterns - Searches fraud knowledge base. Use for most claims.
-4. generate_explanation - Creates comprehensive explanation. MUST pass is_fraudulent and fraud_type from classify_claim results.
-
-IMPORTANT: You MUST use the tools by calling them properly. After using tools, provide a final analysis.
-
-Analysis strategy:
-- Start with classify_claim (get is_fraudulent and fraud_type)
-- Then use extract_indicators
-- Use search_fraud_patterns to find similar fraud cases
-- Use generate_explanation with the is_fraudulent and fraud_type from step 1
-- After gathering information, provide your final fraud assessment
-
-Be thorough but efficient."""
-                
                 try:
-                    # Invoke agent with system message
-                    result = agent.invoke({
-                        "messages": [
-                            SystemMessage(content=system_prompt),
-                            ("user", f"Analyze this healthcare claim for fraud and provide a comprehensive assessment: {claim_text}")
-                        ]
-                    })
+                    # Stream the agent run so tool calls, results and tokens render as they arrive
+                    timings = StreamTimings()
+                    tool_calls = []
+                    calls_by_id = {}
+                    agent_response = None
+                    streamed_text = ""
                     
-                    elapsed_time = (time.time() - total_start) * 1000
+                    with results_container:
+                        live_status = st.status("🤖 Agent is reasoning...", expanded=True)
+                    with live_status:
+                        live_text = st.empty()
                     
-                    # Clear progress and show results
-                    progress_container.empty()
+                    if fast_path_mode:
+                        events = create_fast_path().stream(claim_text, timings=timings)
+                    else:
+                        events = stream_agent_events(agent, agent_inputs(claim_text), timings=timings)
                     
-                    with results_container:
-                        # Parse messages to show reasoning
-                        messages = result.get('messages', [])
+                    for event in events:
+                        # First output replaces the waiting banner
+                        progress_container.empty()
                         
-                        # Show success message
-                        st.success(f"✅ Analysis complete in {elapsed_time:.0f}ms")
+                        if event['type'] == 'token':
+                            streamed_text += event['text']
+                            live_text.markdown(streamed_text + " ▌")
                         
-                        # Extract tool calls and results
-                        tool_calls = []
-                        agent_response = None
+                        elif event['type'] == 'tool_call':
+                            tc = {'name': event['name'], 'args': event['args']}
+                            tool_calls.append(tc)
+                            calls_by_id[event['id']] = tc
+                            live_status.update(label=f"🔧 Calling {event['name']}...")
+                            with live_status:
+                                st.markdown(f"🔧 **{event['name']}** called")
+                            # Text before a tool call is the model's reasoning, not the answer
+                            streamed_text = ""
+                            live_text.empty()
+                            with live_status:
+                                live_text = st.empty()
                         
-                        for msg in messages:
-                            msg_type = getattr(msg, 'type', None) or type(msg).__name__.lower()
-                            
-                            if 'ai' in msg_type:
-                                content = getattr(msg, 'content', '')
-                                tool_calls_in_msg = getattr(msg, 'tool_calls', [])
-                                
-                                if tool_calls_in_msg:
-                                    for tc in tool_calls_in_msg:
-                                        tool_name = tc.get('name', 'unknown')
-                                        tool_args = tc.get('args', {})
-                                        tool_calls.append({
-                                            'name': tool_name,
-                                            'args': tool_args
-                                        })
-                                elif content and not agent_response:
-                                    agent_response = content
-                            
-                            elif 'tool' in msg_type:
-                                tool_name = getattr(msg, 'name', 'unknown')
-                                tool_content = getattr(msg, 'content', '')
-                                
-                                for tc in tool_calls:
-                                    if tc['name'] == tool_name and 'result' not in tc:
-                                        tc['result'] = tool_content
-                                        break
+                        elif event['type'] == 'tool_result':
+                            tc = calls_by_id.get(event['id'])
+                            if tc is None:
+                                tc = next((c for c in tool_calls if c['name'] == event['name'] and 'result' not in c), None)
+                            if tc is not None:
+                                tc['result'] = event['content']
+                                tc['duration_ms'] = event['duration_ms']
+                            live_status.update(label="🤖 Agent is reasoning...")
+                            with live_status:
+                                st.markdown(f"✅ **{event['name']}** returned in {event['duration_ms']:.0f}ms")
+                        
+                        elif event['type'] == 'final':
+                            agent_response = event['content']
+                            live_text.markdown(agent_response)
+                    
+                    elapsed_time = timings.total_ms
+                    ttfo = timings.ttfo_ms
+                    live_status.update(label=f"✅ Agent finished ({len(tool_calls)} tool calls)",
+                                       state="complete", expanded=False)
+                    progress_container.empty()
+                    
+                    with results_container:
+                        # Show success message
+                        st.success(
+                            f"✅ Analysis complete in {elapsed_time:.0f}ms"
+                            + (f" (first output after {ttfo:.0f}ms)" if ttfo is not None else "")
+                        )
                         
                         # Display tool usage visualization
                         if tool_calls:
@@ -695,7 +631,8 @@ Be thorough but efficient."""
                                     'generate_explanation': '💡'
                                 }.get(tool_name, '🔧')
                                 
-                                with st.expander(f"{icon} **Tool {i}: {tool_name}**", expanded=(i == 1)):
+                                duration_label = f" ({tc['duration_ms']:.0f}ms)" if 'duration_ms' in tc else ""
+                                with st.expander(f"{icon} **Tool {i}: {tool_name}**{duration_label}", expanded=(i == 1)):
                                     st.markdown(f'<span class="tool-badge {badge_class}">{tool_name}</span>', unsafe_allow_html=True)
                                     
                                     st.write("**Input:**")
@@ -745,26 +682,90 @@ Be thorough but efficient."""
                         st.markdown("---")
                         st.markdown("### ⚡ Performance Metrics")
                         
-                        col1, col2, col3, col4 = st.columns(4)
+                        col1, col2, col3, col4, col5 = st.columns(5)
                         
                         with col1:
                             st.metric("⏱️ Response Time", f"{elapsed_time:.0f}ms")
                         with col2:
-                            st.metric("🔧 Tools Used", f"{len(tool_calls)}/4")
+                            st.metric("⚡ First Output", f"{ttfo:.0f}ms" if ttfo is not None else "—")
                         with col3:
+                            st.metric("🔧 Tools Used", f"{len(tool_calls)}/4")
+                        with col4:
                             cost_per_tool = 0.0005
                             total_cost = len(tool_calls) * cost_per_tool
                             st.metric("💰 Est. Cost", f"${total_cost:.4f}")
-                        with col4:
+                        with col5:
                             efficiency = (len(tool_calls) / 4) * 100
                             st.metric("📊 Efficiency", f"{efficiency:.0f}%")
                         
+                        if timings.steps:
+                            with st.expander("⏱️ Step Timings"):
+                                st.dataframe(
+                                    [
+                                        {"Step": step['step'], "Kind": step['kind'],
+                                         "Duration (ms)": round(step['duration_ms'])}
+                                        for step in timings.steps
+                                    ],
+                                    use_container_width=True,
+                                    hide_index=True
+                                )
+                        
+                        if w:
+                            cache_stats = get_shared_cache(w, WAREHOUSE_ID, CATALOG, SCHEMA).stats()
+                            st.caption(
+                                f"🗄️ LLM result cache: {cache_stats['hit_rate']*100:.0f}% hit rate "
+                                f"({cache_stats['memory_hits']} memory + {cache_stats['delta_hits']} Delta hits, "
+                                f"{cache_stats['misses']} misses) | Est. saved: ${cache_stats['cost_saved']:.4f}"
+                            )
+                        
                 except Exception as e:
                     progress_container.empty()
                     st.error(f"Error running agent: {e}")
                     import traceback
                     with st.expander("🔍 Error Details"):
                         st.code(traceback.format_exc())
+    
+    # Built-in latency / token benchmark of the two execution modes
+    st.markdown("---")
+    with st.expander("🏁 Benchmark: Agent vs Fast Path"):
+        st.caption("Runs the claim above through both modes and compares latency, tool calls and planner tokens. "
+                   "UC function results are cached, so later runs mostly measure orchestration overhead.")
+        bench_runs = st.slider("Runs per mode:", min_value=1, max_value=5, value=1)
+        if st.button("Run Benchmark", disabled=not claim_text.strip()):
+            agent = create_langraph_agent()
+            if not agent:
+                st.error("Failed to create LangGraph agent")
+            else:
+                with st.spinner("Benchmarking agent and fast path..."):
+                    bench_rows = benchmark_modes(
+                        lambda text: agent.invoke(agent_inputs(text)),
+                        lambda text: create_fast_path().invoke(text),
+                        [claim_text],
+                        repeats=bench_runs
+                    )
+                
+                summary = {}
+                for row in bench_rows:
+                    stats = summary.setdefault(row['mode'], {'latency': [], 'tokens': [], 'turns': [], 'tools': []})
+                    stats['latency'].append(row['latency_ms'])
+                    stats['tokens'].append(row['tokens'])
+                    stats['turns'].append(row['model_turns'])
+                    stats['tools'].append(row['tool_calls'])
+                
+                col1, col2 = st.columns(2)
+                for col, mode, label in ((col1, "agent", "🧠 Agent"), (col2, "fast_path", "⚡ Fast Path")):
+                    stats = summary.get(mode)
+                    if not stats:
+                        continue
+                    runs = len(stats['latency'])
+                    with col:
+                        st.markdown(f"**{label}**")
+                        st.metric("Avg Latency", f"{sum(stats['latency']) / runs:.0f}ms")
+                        st.metric("Avg Planner Tokens", f"{sum(stats['tokens']) / runs:.0f}")
+                        st.metric("Avg Model Turns", f"{sum(stats['turns']) / runs:.1f}")
+                        st.metric("Avg Tool Calls", f"{sum(stats['tools']) / runs:.1f}")
+                
+                st.dataframe(bench_rows, use_container_width=True, hide_index=True)
 
 # Bottom tips
 st.markdown("---")
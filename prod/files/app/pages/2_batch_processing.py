@@ -6,12 +6,16 @@ Enhanced with Modern UI and Real-time Progress Tracking
 import streamlit as st
 import pandas as pd
 import os
-import json
 import time
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.sql import StatementState
 import plotly.graph_objects as go
 import plotly.express as px
+from utils.batch_executor import run_concurrently, remaining_seconds, DEFAULT_MAX_WORKERS, DEFAULT_CLAIM_TIMEOUT
+from utils.uc_batch import call_uc_functions_batched, AdaptiveChunker, UCBatchAborted
+from utils.result_writer import merge_rows
+from utils.llm_cache import get_shared_cache
+from utils.prescreen import PreScreener, DECISION_LLM, RULES_LEGIT
+from utils.vector_search import query_index, query_index_many
+from utils.databricks_client import get_workspace_client, call_uc_function, execute_statement, get_statement_runner, run_query
 
 # Page configuration
 st.set_page_config(
@@ -115,16 +119,7 @@ SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "159828d8fa91cd28")  # From app.yaml
 VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
 
-# Initialize WorkspaceClient
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
+# Shared Databricks client (pooled connections, retries, latency metrics)
 w = get_workspace_client()
 
 # Sample claims data
@@ -168,99 +163,41 @@ SAMPLE_CLAIMS = {
 }
 
 # Helper Functions
-def call_uc_function(function_name, *args, show_debug=False):
-    """Call a Unity Catalog function using Statement Execution API"""
-    try:
-        # Escape single quotes in string arguments
-        escaped_args = []
-        for arg in args:
-            if isinstance(arg, str):
-                escaped_arg = arg.replace("'", "''")
-                escaped_args.append(f"'{escaped_arg}'")
-            else:
-                escaped_args.append(str(arg))
-        
-        args_str = ', '.join(escaped_args)
-        query = f"SELECT {CATALOG}.{SCHEMA}.{function_name}({args_str}) as result"
-        
-        result = w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=query,
-            wait_timeout="50s"
-        )
-        
-        if result.status.state.value == "SUCCEEDED":
-            if result.result and result.result.data_array:
-                data = result.result.data_array[0][0]
-                
-                if isinstance(data, str):
-                    try:
-                        parsed = json.loads(data)
-                        return parsed
-                    except:
-                        return data
-                elif isinstance(data, dict):
-                    return data
-                elif isinstance(data, (list, tuple)):
-                    return data
-                else:
-                    return data
-            return None
-        else:
-            if show_debug:
-                st.error(f"Query failed: {result.status.state.value}")
-            return None
-    
-    except Exception as e:
-        if show_debug:
-            st.error(f"Error calling UC function {function_name}: {e}")
-        return None
-
 def search_fraud_cases_vector(query: str, num_results: int = 3):
     """Search for similar fraud cases using vector search"""
     try:
-        body = {
-            "columns": ["doc_id", "doc_type", "title", "content"],
-            "num_results": num_results,
-            "query_text": query
-        }
-        
-        response = w.api_client.do(
-            'POST',
-            f'/api/2.0/vector-search/indexes/{VECTOR_INDEX}/query',
-            body=body
-        )
-        
-        if isinstance(response, dict) and 'error_code' in response:
-            return []
-        
-        data_array = response.get('result', {}).get('data_array', [])
-        
-        if data_array:
-            formatted = []
-            for row in data_array:
-                formatted.append({
-                    "doc_id": row[0],
-                    "doc_type": row[1],
-                    "title": row[2],
-                    "content": row[3][:200]
-                })
-            return formatted
-        return []
+        data_array = query_index(query, num_results=num_results, index_name=VECTOR_INDEX, w=w)
+        return [format_fraud_case(row) for row in data_array]
     except Exception as e:
         return []
 
-def process_claim(claim_row, analysis_depth):
-    """Process single claim based on depth selection"""
+def format_fraud_case(row):
+    """Vector search result row -> similar case dict"""
+    return {
+        "doc_id": row[0],
+        "doc_type": row[1],
+        "title": row[2],
+        "content": row[3][:200]
+    }
+
+def search_fraud_cases_batch(queries, num_results: int = 3):
+    """Similar fraud cases for many queries: batched embedding calls, concurrent lookups"""
+    try:
+        rows_per_query = query_index_many(queries, num_results=num_results, index_name=VECTOR_INDEX, w=w)
+        return [[format_fraud_case(row) for row in rows] for rows in rows_per_query]
+    except Exception as e:
+        return [[] for _ in queries]
+
+def build_claim_result(claim_row, analysis_depth, classify_result, extract_result=None, similar_cases=None,
+                       explanation_result=None, decision_path=DECISION_LLM):
+    """Assemble the result row for one claim from its UC function outputs"""
     result = {
         'claim_id': claim_row.get('claim_id', 'N/A'),
         'claim_text': claim_row.get('claim_text', '')[:100] + '...',
-        'claim_amount': claim_row.get('claim_amount', 0)
+        'claim_amount': claim_row.get('claim_amount', 0),
+        'decision_path': decision_path
     }
     
-    # Always classify
-    classify_result = call_uc_function("fraud_classify", claim_row['claim_text'])
-    
     if classify_result:
         result['is_fraudulent'] = bool(classify_result.get('is_fraudulent', False))
         result['fraud_probability'] = float(classify_result.get('fraud_probability', 0.0))
@@ -276,7 +213,6 @@ def process_claim(claim_row, analysis_depth):
     
     # Standard: Add extraction
     if analysis_depth in ["Standard", "Deep"]:
-        extract_result = call_uc_function("fraud_extract_indicators", claim_row['claim_text'])
         if extract_result:
             result['risk_score'] = extract_result.get('risk_score', 0)
             result['red_flags'] = extract_result.get('red_flags', [])
@@ -284,14 +220,112 @@ def process_claim(claim_row, analysis_depth):
     
     # Deep: Add vector search
     if analysis_depth == "Deep":
-        similar_cases = search_fraud_cases_vector(claim_row['claim_text'][:500], num_results=2)
+        similar_cases = similar_cases or []
         result['similar_cases_count'] = len(similar_cases)
         result['similar_cases'] = [case['title'] for case in similar_cases]
     
+    # Single-pass analysis also returns an explanation at no extra cost
+    if explanation_result:
+        result['explanation'] = explanation_result.get('explanation', '')
+    
     return result
 
+def unpack_uc_outputs(outputs):
+    """Split UC function outputs into (classify, extract, explanation) results"""
+    full = outputs.get("fraud_analyze_full")
+    if full:
+        return full.get("classification"), full.get("indicators"), full.get("explanation")
+    return outputs.get("fraud_classify"), outputs.get("fraud_extract_indicators"), None
+
+def prescreen_claims(claim_rows, allow_legit=False):
+    """Run the deterministic pre-screen rules over every claim, in order"""
+    screener = PreScreener(allow_legit=allow_legit)
+    screens = []
+    for row in claim_rows:
+        amount = pd.to_numeric(row.get('claim_amount'), errors='coerce')
+        claim_type = row.get('claim_type')
+        screens.append(screener.screen(
+            row.get('claim_text', ''),
+            claim_type=None if pd.isna(claim_type) else claim_type,
+            claim_amount=None if pd.isna(amount) else float(amount)
+        ))
+    return screens
+
+def rules_outputs(screen):
+    """UC-function-shaped outputs for a claim decided by the pre-screen rules"""
+    return {"fraud_classify": screen['classification'], "fraud_extract_indicators": screen['indicators']}
+
+def process_claim(claim_row, analysis_depth, single_pass=False, screen=None, similar_cases=None, deadline=None):
+    """Process single claim based on depth selection (similar_cases may be prefetched in batch)
+
+    With a deadline (time.time() value), UC statements are cancelled once it passes so the worker is freed.
+    """
+    def uc(function_name):
+        kwargs = {"timeout": remaining_seconds(deadline)} if deadline is not None else {}
+        return call_uc_function(function_name, claim_row['claim_text'], **kwargs)
+    
+    if analysis_depth == "Deep" and similar_cases is None:
+        similar_cases = search_fraud_cases_vector(claim_row['claim_text'][:500], num_results=2)
+    
+    if screen and screen['decision_path'] != DECISION_LLM:
+        # Decided by the pre-screen rules - no model calls
+        classify_result, extract_result, _ = unpack_uc_outputs(rules_outputs(screen))
+        return build_claim_result(claim_row, analysis_depth, classify_result, extract_result, similar_cases,
+                                  decision_path=screen['decision_path'])
+    
+    if single_pass and analysis_depth == "Deep":
+        # One model call returns classification, indicators and explanation
+        full_result = uc("fraud_analyze_full")
+        classify_result, extract_result, explanation_result = unpack_uc_outputs({"fraud_analyze_full": full_result})
+        return build_claim_result(claim_row, analysis_depth, classify_result, extract_result, similar_cases,
+                                  explanation_result)
+    
+    # Always classify
+    classify_result = uc("fraud_classify")
+    
+    extract_result = None
+    if analysis_depth in ["Standard", "Deep"]:
+        extract_result = uc("fraud_extract_indicators")
+    
+    return build_claim_result(claim_row, analysis_depth, classify_result, extract_result, similar_cases)
+
+def uc_functions_for_depth(analysis_depth, single_pass=False):
+    """UC functions to evaluate for a given analysis depth"""
+    if single_pass and analysis_depth == "Deep":
+        return ["fraud_analyze_full"]
+    if analysis_depth in ["Standard", "Deep"]:
+        return ["fraud_classify", "fraud_extract_indicators"]
+    return ["fraud_classify"]
+
+def failed_claim_result(claim_row, verdict):
+    """Placeholder result for a claim that errored or timed out"""
+    return {
+        'claim_id': claim_row.get('claim_id', 'N/A'),
+        'claim_text': claim_row.get('claim_text', '')[:100] + '...',
+        'claim_amount': claim_row.get('claim_amount', 0),
+        'is_fraudulent': False,
+        'fraud_probability': 0.0,
+        'fraud_type': 'Error',
+        'confidence': 0.0,
+        'verdict': verdict,
+        'decision_path': DECISION_LLM
+    }
+
+# Columns written to the batch_results table (processed_at is set by the warehouse)
+BATCH_RESULT_COLUMNS = [
+    ("claim_id", "STRING"),
+    ("claim_text", "STRING"),
+    ("claim_amount", "DOUBLE"),
+    ("is_fraudulent", "BOOLEAN"),
+    ("fraud_probability", "DOUBLE"),
+    ("fraud_type", "STRING"),
+    ("confidence", "DOUBLE"),
+    ("verdict", "STRING"),
+    ("decision_path", "STRING"),
+]
+
 def save_results_to_table(results_df, table_name):
-    """Save results DataFrame to Databricks table"""
+    """Save results DataFrame to Databricks table, returns rows written (None on failure)"""
     try:
         # Create table if not exists
         create_sql = f"""
@@ -304,42 +338,31 @@ def save_results_to_table(results_df, table_name):
             fraud_type STRING,
             confidence DOUBLE,
             verdict STRING,
-            processed_at TIMESTAMP
+            processed_at TIMESTAMP,
+            decision_path STRING
         )
         """
         
-        w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=create_sql,
-            wait_timeout="30s"
-        )
+        execute_statement(create_sql, wait_timeout="30s", label="create_results_table")
         
-        # Insert data (simplified - in production use proper DataFrame write)
-        for _, row in results_df.iterrows():
-            insert_sql = f"""
-            INSERT INTO {table_name} VALUES (
-                '{row['claim_id']}',
-                '{row['claim_text'].replace("'", "''")}',
-                {row.get('claim_amount', 0)},
-                {str(row['is_fraudulent']).lower()},
-                {row['fraud_probability']},
-                '{row['fraud_type']}',
-                {row['confidence']},
-                '{row['verdict']}',
-                current_timestamp()
-            )
-            """
-            
-            w.statement_execution.execute_statement(
-                warehouse_id=WAREHOUSE_ID,
-                statement=insert_sql,
-                wait_timeout="30s"
-            )
+        # Tables created before the pre-screen existed lack the audit column
+        existing_columns = {row[0] for row in run_query(f"DESCRIBE TABLE {table_name}", label="describe_results_table")}
+        if "decision_path" not in existing_columns:
+            execute_statement(f"ALTER TABLE {table_name} ADD COLUMNS (decision_path STRING)",
+                              wait_timeout="30s", label="add_decision_path_column", retries=0)
         
-        return True
+        # Upsert all rows in one MERGE commit (idempotent on claim_id)
+        return merge_rows(
+            w, WAREHOUSE_ID, table_name,
+            results_df.to_dict('records'),
+            columns=BATCH_RESULT_COLUMNS,
+            key="claim_id",
+            extra_columns=[("processed_at", "current_timestamp()")],
+            runner=get_statement_runner()
+        )
     except Exception as e:
         st.error(f"Error saving to table: {e}")
-        return False
+        return None
 
 # Initialize session state
 if 'batch_claims' not in st.session_state:
@@ -471,6 +494,54 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
             - Deep: Full analysis with similar case search (~6s per claim)
             """
         )
+        
+        single_pass = False
+        if analysis_depth.startswith("Deep"):
+            single_pass = st.checkbox(
+                "Single-pass analysis (fraud_analyze_full)",
+                value=False,
+                help="Classify, extract indicators and explain in ONE model call per claim instead of three"
+            )
+    
+        execution_mode = st.radio(
+            "Execution mode:",
+            ["Set-based: One statement per chunk", "Per-claim: Parallel workers"],
+            help="""
+            - Set-based: Sends chunks of claims as a single SQL statement; the warehouse runs the AI calls in parallel
+            - Per-claim: One statement per claim and function, spread over parallel workers
+            """
+        )
+        
+        use_prescreen = st.checkbox(
+            "Pre-screen obvious claims with rules",
+            value=True,
+            help="Deterministic rules (amount vs. claim type range, fraud pattern keywords, duplicates) "
+                 "decide clear-cut fraud without calling the model"
+        )
+        prescreen_legit = st.checkbox(
+            "Let rules clear low-risk claims",
+            value=RULES_LEGIT,
+            disabled=not use_prescreen,
+            help="Also mark claims legitimate without a model call when the amount is in the low band "
+                 "for the claim type and nothing in the text hints at a billing concern"
+        )
+        
+        with st.expander("⚙️ Concurrency Settings"):
+            max_workers = st.slider(
+                "Parallel workers:",
+                min_value=1,
+                max_value=32,
+                value=DEFAULT_MAX_WORKERS,
+                help="Number of claims analyzed at the same time"
+            )
+            claim_timeout = st.number_input(
+                "Per-claim timeout (seconds):",
+                min_value=10,
+                max_value=600,
+                value=int(DEFAULT_CLAIM_TIMEOUT),
+                step=10,
+                help="Claims that take longer are marked TIMEOUT and skipped"
+            )
     
     with col2:
         st.metric("Claims to Process", len(st.session_state.batch_claims))
@@ -482,7 +553,8 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
             "Deep: All Tools": 6
         }
         depth_key = analysis_depth
-        est_time = len(st.session_state.batch_claims) * depth_mapping[depth_key]
+        waves = -(-len(st.session_state.batch_claims) // max_workers)
+        est_time = waves * depth_mapping[depth_key]
         st.metric("Est. Time", f"{est_time}s")
     
     # Processing Section
@@ -518,47 +590,150 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
             st.markdown("### 📊 Live Processing Feed")
             live_results_placeholder = st.empty()
         
-        results = []
-        total_claims = len(st.session_state.batch_claims)
+        claim_rows = [row for _, row in st.session_state.batch_claims.iterrows()]
+        total_claims = len(claim_rows)
+        # Timed from here so pre-screening and the similar-case prefetch count toward throughput
         start_time = time.time()
-        fraud_count = 0
+        if use_prescreen:
+            screens = prescreen_claims(claim_rows, allow_legit=prescreen_legit)
+        else:
+            screens = [{'decision_path': DECISION_LLM} for _ in claim_rows]
+        llm_indices = [idx for idx, screen in enumerate(screens) if screen['decision_path'] == DECISION_LLM]
+        completed = []
+        
+        # Deep: look up similar cases for every claim up front (batched embeddings, parallel lookups)
+        similar_by_idx = [None] * total_claims
+        if depth_value == "Deep":
+            status_text.markdown(f"**Searching similar cases for {total_claims} claims...**")
+            similar_by_idx = search_fraud_cases_batch(
+                [row['claim_text'][:500] for row in claim_rows], num_results=2
+            )
+        live_counts = {'fraud': 0}
         
-        for idx, row in st.session_state.batch_claims.iterrows():
+        status_text.markdown(f"""
+        <div style='text-align: center; padding: 0.5rem; background: #f8f9fa; border-radius: 8px; margin: 0.5rem 0;'>
+            <strong>Processing {total_claims} claims with {max_workers} parallel workers...</strong>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        def on_claim_done(index, result):
+            """Update live progress as each claim finishes (runs on the script thread)"""
+            completed.append(result)
+            
+            # Update fraud count
+            if result.get('is_fraudulent'):
+                live_counts['fraud'] += 1
+            fraud_count = live_counts['fraud']
+            
+            done_count = len(completed)
             current_time = time.time() - start_time
             
-            # Update status
             status_text.markdown(f"""
             <div style='text-align: center; padding: 0.5rem; background: #f8f9fa; border-radius: 8px; margin: 0.5rem 0;'>
-                <strong>Processing claim {idx+1}/{total_claims}:</strong> {row['claim_id']}
+                <strong>Finished claim {done_count}/{total_claims}:</strong> {result['claim_id']}
             </div>
             """, unsafe_allow_html=True)
             
-            # Process claim
-            result = process_claim(row, depth_value)
-            results.append(result)
-            
-            # Update fraud count
-            if result.get('is_fraudulent'):
-                fraud_count += 1
-            
             # Update progress
-            progress = (idx + 1) / total_claims
-            progress_bar.progress(progress)
+            progress_bar.progress(done_count / total_claims)
             
             # Update live metrics
-            processed_metric.metric("✅ Processed", f"{idx+1}/{total_claims}")
+            processed_metric.metric("✅ Processed", f"{done_count}/{total_claims}")
             fraud_metric.metric("⚠️ Fraud", fraud_count)
-            legitimate_metric.metric("✓ Legitimate", (idx+1) - fraud_count)
+            legitimate_metric.metric("✓ Legitimate", done_count - fraud_count)
             time_metric.metric("⏱️ Time", f"{current_time:.1f}s")
             
-            # Show live preview
-            if len(results) > 0:
-                preview_df = pd.DataFrame(results)
-                live_results_placeholder.dataframe(
-                    preview_df[['claim_id', 'verdict', 'fraud_probability', 'fraud_type']].tail(5),
-                    use_container_width=True,
-                    hide_index=True
+            # Show live preview (most recently finished claims)
+            preview_df = pd.DataFrame(completed)
+            live_results_placeholder.dataframe(
+                preview_df[['claim_id', 'verdict', 'fraud_probability', 'fraud_type']].tail(5),
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        if execution_mode.startswith("Set-based"):
+            # One statement per chunk; chunk size adapts to statement size and latency
+            function_names = uc_functions_for_depth(depth_value, single_pass)
+            results = [None] * total_claims
+            
+            def on_chunk(chunk_results, done_count, total_count):
+                if depth_value == "Deep":
+                    # Results are assembled in the second phase - progress is driven from there
+                    status_text.markdown(f"**Scored {done_count}/{total_count} claims...**")
+                    return
+                for key, outputs in chunk_results.items():
+                    idx = int(key)
+                    classify_result, extract_result, _ = unpack_uc_outputs(outputs)
+                    results[idx] = build_claim_result(
+                        claim_rows[idx], depth_value, classify_result, extract_result
+                    )
+                    on_claim_done(idx, results[idx])
+            
+            # Claims decided by the rules skip the warehouse entirely
+            rules_results = {
+                str(idx): rules_outputs(screen)
+                for idx, screen in enumerate(screens) if screen['decision_path'] != DECISION_LLM
+            }
+            if depth_value != "Deep":
+                for key, outputs in rules_results.items():
+                    idx = int(key)
+                    classify_result, extract_result, _ = unpack_uc_outputs(outputs)
+                    results[idx] = build_claim_result(
+                        claim_rows[idx], depth_value, classify_result, extract_result,
+                        decision_path=screens[idx]['decision_path']
+                    )
+                    on_claim_done(idx, results[idx])
+            
+            try:
+                uc_results = call_uc_functions_batched(
+                    w, WAREHOUSE_ID, CATALOG, SCHEMA, function_names,
+                    [(idx, claim_rows[idx]['claim_text']) for idx in llm_indices],
+                    chunker=AdaptiveChunker(target_seconds=min(claim_timeout, 45)),
+                    on_chunk=on_chunk,
+                    cache=get_shared_cache(w, WAREHOUSE_ID, CATALOG, SCHEMA),
+                    runner=get_statement_runner()
+                )
+            except UCBatchAborted as e:
+                # Every chunk would fail the same way (missing function, permissions) - stop here
+                progress_container.empty()
+                st.error(f"❌ Batch stopped: {e}")
+                st.stop()
+            
+            uc_results.update(rules_results)
+            
+            if depth_value == "Deep":
+                def finish_claim(idx):
+                    outputs = uc_results.get(str(idx), {})
+                    row = claim_rows[idx]
+                    similar_cases = similar_by_idx[idx]
+                    classify_result, extract_result, explanation_result = unpack_uc_outputs(outputs)
+                    return build_claim_result(
+                        row, depth_value, classify_result, extract_result, similar_cases, explanation_result,
+                        decision_path=screens[idx]['decision_path']
+                    )
+                
+                results = run_concurrently(
+                    range(total_claims),
+                    finish_claim,
+                    max_workers=max_workers,
+                    item_timeout=claim_timeout,
+                    on_result=on_claim_done,
+                    on_timeout=lambda index, idx: failed_claim_result(claim_rows[idx], "TIMEOUT"),
+                    on_error=lambda index, idx, e: failed_claim_result(claim_rows[idx], "ERROR")
                 )
+        else:
+            # Process claims on a bounded worker pool; results come back in upload order
+            results = run_concurrently(
+                range(total_claims),
+                lambda idx, deadline: process_claim(claim_rows[idx], depth_value, single_pass, screens[idx],
+                                                    similar_by_idx[idx], deadline=deadline),
+                max_workers=max_workers,
+                item_timeout=claim_timeout,
+                pass_deadline=True,
+                on_result=on_claim_done,
+                on_timeout=lambda index, idx: failed_claim_result(claim_rows[idx], "TIMEOUT"),
+                on_error=lambda index, idx, e: failed_claim_result(claim_rows[idx], "ERROR")
+            )
         
         elapsed_time = time.time() - start_time
         
@@ -566,6 +741,7 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
         st.session_state.batch_results = pd.DataFrame(results)
         st.session_state.processing_complete = True
         st.session_state.processing_time = elapsed_time
+        st.session_state.rules_decided = total_claims - len(llm_indices)
         
         # Clear progress container
         progress_container.empty()
@@ -634,6 +810,21 @@ if st.session_state.processing_complete and st.session_state.batch_results is no
         </div>
         """.format(avg_time), unsafe_allow_html=True)
     
+    if w:
+        cache_stats = get_shared_cache(w, WAREHOUSE_ID, CATALOG, SCHEMA).stats()
+        st.caption(
+            f"🗄️ LLM result cache: {cache_stats['hit_rate']*100:.0f}% hit rate "
+            f"({cache_stats['memory_hits']} memory + {cache_stats['delta_hits']} Delta hits, "
+            f"{cache_stats['misses']} misses) | Est. saved: ${cache_stats['cost_saved']:.4f}"
+        )
+    
+    rules_decided = st.session_state.get('rules_decided', 0)
+    if rules_decided:
+        st.caption(
+            f"📏 Pre-screen rules decided {rules_decided} of {total_claims} claims "
+            f"without a model call (see the decision_path column)"
+        )
+    
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Visualizations
@@ -756,10 +947,10 @@ if st.session_state.processing_complete and st.session_state.batch_results is no
             table_name = f"{CATALOG}.{SCHEMA}.batch_results"
             
             with st.spinner(f"Saving to {table_name}..."):
-                success = save_results_to_table(results_df, table_name)
+                rows_written = save_results_to_table(results_df, table_name)
                 
-                if success:
-                    st.success(f"✅ Results saved to table: {table_name}")
+                if rows_written is not None:
+                    st.success(f"✅ Saved {rows_written} rows to table: {table_name}")
                 else:
                     st.error("❌ Failed to save results")
 
@@ -786,6 +977,21 @@ with st.expander("ℹ️ How to Use Batch Processing"):
     - **Quick**: Fast classification only - good for large batches
     - **Standard**: Adds detailed fraud indicator extraction
     - **Deep**: Full analysis including similar case search
+      - Tick *Single-pass analysis* to classify, extract and explain with one model call per claim
+    
+    ### Pre-screen
+    - Clear-cut claims are decided by deterministic rules before any model call:
+      amount far above the normal range for the claim type, fraud pattern keywords, duplicate claim text
+    - With *Let rules clear low-risk claims* ticked, claims in the bottom quarter of their type's amount range
+      with no red flags are also marked legitimate (default: `PRESCREEN_RULES_LEGIT` in app.yaml, off)
+    - Everything else goes to the model
+    - `decision_path` records who decided each claim: `rules_legit`, `rules_fraud` or `llm`
+    - Thresholds: `PRESCREEN_LEGIT_THRESHOLD` / `PRESCREEN_FRAUD_THRESHOLD` in app.yaml
+    
+    ### Concurrency
+    - Claims are analyzed in parallel (default 8 workers, set `BATCH_MAX_WORKERS` in app.yaml)
+    - Each claim has its own timeout; slow claims are marked **TIMEOUT** instead of stalling the batch
+    - The live feed shows claims as they finish, final results keep the upload order
     
     ### Results
     - View summary metrics at the top
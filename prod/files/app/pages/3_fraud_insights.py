@@ -6,13 +6,12 @@ Enhanced with Advanced Visualizations and Interactive Charts
 
 import streamlit as st
 import os
-from databricks import sql
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.core import Config
+from utils.databricks_client import get_workspace_client, run_query, render_query_metrics
+from utils.genie_client import get_genie_client, GENIE_STATUS_LABELS
+from utils.insights_data import get_insights, render_refresh_control, INSIGHTS_CACHE_TTL
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import time
 from datetime import datetime
 
 # Page configuration
@@ -100,94 +99,50 @@ CATALOG = os.getenv("CATALOG_NAME", "fraud_detection_dev")
 SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "159828d8fa91cd28")  # From app.yaml
 
-# Initialize clients
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
-# Initialize clients
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
-def get_sql_connection():
-    """Create Databricks SQL connection - called lazily when needed"""
-    try:
-        # Check if WAREHOUSE_ID is set
-        if not WAREHOUSE_ID:
-            st.error("❌ **SQL Connection Error**: WAREHOUSE_ID not configured")
-            st.info("""
-            **To fix this:**
-            1. Set `DATABRICKS_WAREHOUSE_ID` in your `app.yaml`
-            2. Or set it as environment variable
-            3. Get warehouse ID from: SQL Warehouses → Copy ID
-            """)
-            return None
-        
-        cfg = Config()
-        
-        # Check if we have valid config
-        if not cfg.host:
-            st.error("❌ **SQL Connection Error**: Databricks host not configured")
-            st.info("""
-            **To fix this:**
-            - Ensure you're running in Databricks Apps environment
-            - Or configure authentication in `~/.databrickscfg`
-            """)
-            return None
-        
-        return sql.connect(
-            server_hostname=cfg.host,
-            http_path=f"/sql/1.0/warehouses/{WAREHOUSE_ID}",
-            credentials_provider=lambda: cfg.authenticate,
-        )
-    except Exception as e:
-        error_msg = str(e)
-        st.error(f"❌ **SQL Connection Error**: {error_msg}")
-        
-        # Provide specific troubleshooting based on error type
-        if "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
-            st.warning("""
-            **🔐 Authentication Issue:**
-            - Ensure the app's service principal has permissions
-            - Run: `./grant_permissions.sh dev`
-            - Check SQL Warehouse permissions
-            """)
-        elif "not found" in error_msg.lower():
-            st.warning(f"""
-            **📍 Warehouse Not Found:**
-            - Warehouse ID: `{WAREHOUSE_ID}`
-            - Verify warehouse exists and is running
-            - Check warehouse ID in `app.yaml`
-            """)
-        elif "timeout" in error_msg.lower():
-            st.warning("""
-            **⏱️ Connection Timeout:**
-            - Check if SQL Warehouse is running
-            - Try starting the warehouse manually
-            - Check network connectivity
-            """)
-        else:
-            st.info("""
-            **💡 General Troubleshooting:**
-            - Check SQL Warehouse is running
-            - Verify permissions are granted
-            - Check `app.yaml` configuration
-            - Review app logs in Databricks
-            """)
-        
-        return None
+def show_sql_error(e):
+    """Show a SQL error with troubleshooting hints based on its type"""
+    error_msg = str(e)
+    st.error(f"❌ **SQL Connection Error**: {error_msg}")
+    
+    # Provide specific troubleshooting based on error type
+    if "not configured" in error_msg.lower():
+        st.info("""
+        **To fix this:**
+        1. Set `DATABRICKS_WAREHOUSE_ID` in your `app.yaml`
+        2. Ensure you're running in Databricks Apps environment
+        3. Or configure authentication in `~/.databrickscfg`
+        """)
+    elif "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
+        st.warning("""
+        **🔐 Authentication Issue:**
+        - Ensure the app's service principal has permissions
+        - Run: `./grant_permissions.sh dev`
+        - Check SQL Warehouse permissions
+        """)
+    elif "not found" in error_msg.lower() or "does not exist" in error_msg.lower():
+        st.info("""
+        **📊 Table Not Found:**
+        The fraud insights tables may not exist yet.
+        - Run batch processing first to populate data
+        - Then run `setup/11_refresh_insights_aggregates.py` (part of the setup job)
+        """)
+    elif "timeout" in error_msg.lower():
+        st.warning("""
+        **⏱️ Connection Timeout:**
+        - Check if SQL Warehouse is running
+        - Try starting the warehouse manually
+        - Check network connectivity
+        """)
+    else:
+        st.info("""
+        **💡 General Troubleshooting:**
+        - Check SQL Warehouse is running
+        - Verify permissions are granted
+        - Check `app.yaml` configuration
+        - Review app logs in Databricks
+        """)
 
+# Shared Databricks client (pooled connections, retries, latency metrics)
 w = get_workspace_client()
 
 # Get Genie Space ID - Try multiple sources in order
@@ -206,17 +161,13 @@ def get_genie_space_id():
     
     # Fall back to querying config_genie table
     try:
-        sql_conn = get_sql_connection()
-        if sql_conn:
-            with sql_conn.cursor() as cursor:
-                cursor.execute(f"""
-                    SELECT config_value 
-                    FROM {CATALOG}.{SCHEMA}.config_genie 
-                    WHERE config_key = 'genie_space_id'
-                """)
-                result = cursor.fetchone()
-                if result and result[0]:
-                    return result[0]
+        rows = run_query(f"""
+            SELECT config_value 
+            FROM {CATALOG}.{SCHEMA}.config_genie 
+            WHERE config_key = 'genie_space_id'
+        """, label="genie_space_id")
+        if rows and rows[0][0]:
+            return rows[0][0]
     except Exception as e:
         # Silently fail - will show warning in UI
         pass
@@ -225,128 +176,20 @@ def get_genie_space_id():
 
 GENIE_SPACE_ID = get_genie_space_id()
 
-# SQL Query Functions
-@st.cache_data(ttl=300)
-def get_fraud_statistics():
-    """Get overall fraud statistics"""
-    sql_conn = get_sql_connection()
-    if not sql_conn:
-        st.warning("⚠️ Cannot fetch statistics: SQL connection unavailable")
-        return None
-    
-    try:
-        with sql_conn.cursor() as cursor:
-            cursor.execute(f"""
-                SELECT 
-                    COUNT(*) as total_claims,
-                    SUM(CASE WHEN is_fraudulent THEN 1 ELSE 0 END) as fraud_cases,
-                    ROUND(AVG(CASE WHEN is_fraudulent THEN 1.0 ELSE 0.0 END) * 100, 2) as fraud_rate,
-                    ROUND(AVG(risk_score), 2) as avg_risk_score
-                FROM {CATALOG}.{SCHEMA}.fraud_analysis
-            """)
-            result = cursor.fetchone()
-            if result:
-                return {
-                    "total_claims": result[0] or 0,
-                    "fraud_cases": result[1] or 0,
-                    "fraud_rate": result[2] or 0.0,
-                    "avg_risk_score": result[3] or 0.0
-                }
-    except Exception as e:
-        st.error(f"❌ Error fetching statistics: {e}")
-        if "not found" in str(e).lower() or "does not exist" in str(e).lower():
-            st.info("""
-            **📊 Table Not Found:**
-            The fraud_analysis table may not exist yet.
-            - Run batch processing first to populate data
-            - Or run setup notebooks to create tables
-            """)
-    return None
-
-@st.cache_data(ttl=300)
-def get_fraud_by_type():
-    """Get fraud breakdown by type"""
-    sql_conn = get_sql_connection()
-    if not sql_conn:
-        return None  # Error already shown by get_sql_connection
-    
-    try:
-        with sql_conn.cursor() as cursor:
-            cursor.execute(f"""
-                SELECT 
-                    fraud_type,
-                    COUNT(*) as count
-                FROM {CATALOG}.{SCHEMA}.fraud_analysis
-                WHERE is_fraudulent = TRUE
-                GROUP BY fraud_type
-                ORDER BY count DESC
-            """)
-            results = cursor.fetchall()
-            if results:
-                return pd.DataFrame(results, columns=["Fraud Type", "Count"])
-    except Exception as e:
-        st.warning(f"⚠️ Cannot fetch fraud types: {e}")
-    return None
-
-@st.cache_data(ttl=300)
-def get_top_indicators():
-    """Get top fraud indicators"""
-    sql_conn = get_sql_connection()
-    if not sql_conn:
-        return None  # Error already shown by get_sql_connection
-    
-    try:
-        with sql_conn.cursor() as cursor:
-            cursor.execute(f"""
-                SELECT 
-                    explode(red_flags) as indicator
-                FROM {CATALOG}.{SCHEMA}.fraud_analysis
-                WHERE is_fraudulent = TRUE AND red_flags IS NOT NULL
-            """)
-            results = cursor.fetchall()
-            if results:
-                indicators = [r[0] for r in results]
-                indicator_counts = pd.Series(indicators).value_counts().head(10)
-                return pd.DataFrame({
-                    "Indicator": indicator_counts.index,
-                    "Count": indicator_counts.values
-                })
-    except Exception as e:
-        st.warning(f"⚠️ Cannot fetch indicators: {e}")
-    return None
-
-@st.cache_data(ttl=300)
-def get_fraud_trends():
-    """Get fraud detection trends over time"""
-    sql_conn = get_sql_connection()
-    if not sql_conn:
-        return None  # Error already shown by get_sql_connection
-    
-    try:
-        with sql_conn.cursor() as cursor:
-            cursor.execute(f"""
-                SELECT 
-                    DATE(analysis_timestamp) as date,
-                    COUNT(*) as total_claims,
-                    SUM(CASE WHEN is_fraudulent THEN 1 ELSE 0 END) as fraud_cases
-                FROM {CATALOG}.{SCHEMA}.fraud_analysis
-                GROUP BY DATE(analysis_timestamp)
-                ORDER BY date
-            """)
-            results = cursor.fetchall()
-            if results:
-                return pd.DataFrame(results, columns=["Date", "Total Claims", "Fraud Cases"])
-    except Exception as e:
-        st.warning(f"⚠️ Cannot fetch trends: {e}")
-    return None
-
 # Main Dashboard
 st.markdown("---")
 
+# All dashboard queries run concurrently and are cached together
+with st.spinner("Loading fraud insights..."):
+    insights = get_insights()
+render_refresh_control(insights)
+if "stats" in insights.errors:
+    show_sql_error(insights.errors["stats"])
+
 # Key Metrics with enhanced styling
 st.markdown("### 📊 Key Performance Indicators")
 
-stats = get_fraud_statistics()
+stats = insights.stats
 if stats:
     col1, col2, col3, col4 = st.columns(4)
     
@@ -400,7 +243,9 @@ with col1:
     # Fraud Type Breakdown with enhanced styling
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.markdown("### 🎯 Fraud Type Distribution")
-    fraud_types = get_fraud_by_type()
+    fraud_types = insights.fraud_types
+    if "fraud_types" in insights.errors:
+        st.warning(f"⚠️ Cannot fetch fraud types: {insights.errors['fraud_types']}")
     if fraud_types is not None and not fraud_types.empty:
         fig = go.Figure(data=[go.Pie(
             labels=fraud_types["Fraud Type"],
@@ -442,7 +287,9 @@ with col2:
     # Top Fraud Indicators with enhanced styling
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.markdown("### 🚩 Top Fraud Red Flags")
-    indicators = get_top_indicators()
+    indicators = insights.indicators
+    if "indicators" in insights.errors:
+        st.warning(f"⚠️ Cannot fetch indicators: {insights.errors['indicators']}")
     if indicators is not None and not indicators.empty:
         fig = px.bar(
             indicators,
@@ -479,7 +326,9 @@ with col2:
 st.markdown("---")
 st.markdown('<div class="chart-container">', unsafe_allow_html=True)
 st.markdown("### 📈 Fraud Detection Trends Over Time")
-trends = get_fraud_trends()
+trends = insights.trends
+if "trends" in insights.errors:
+    st.warning(f"⚠️ Cannot fetch trends: {insights.errors['trends']}")
 if trends is not None and not trends.empty:
     # Create dual-axis chart with area fills
     fig = go.Figure()
@@ -561,6 +410,73 @@ st.markdown('</div>', unsafe_allow_html=True)
 st.markdown("---")
 
 # Genie Natural Language Interface
+GENIE_UI_REFRESH_SECONDS = 1.0
+
+def render_genie_result(request):
+    """Render a finished Genie request (answer text, SQL, rows and chart)"""
+    try:
+        result = request.result()
+    except Exception as e:
+        st.error(f"Error executing Genie query: {e}")
+        st.info("💡 Make sure you've granted **Can Run** permissions to the app's service principal on the Genie Space.")
+        return
+    
+    if result["cached"]:
+        st.caption("⚡ Answered from cache (fraud_analysis unchanged since this question was last asked)")
+    elif result["coalesced"]:
+        st.caption("🔗 Joined an identical question that was already running")
+    
+    if result["status"] == "COMPLETED":
+        if result["text"]:
+            st.success("**Genie's Response:**")
+            st.markdown(result["text"])
+        
+        if result["sql"]:
+            with st.expander("🔍 View Generated SQL"):
+                st.code(result["sql"], language="sql")
+        
+        if result["error"]:
+            st.warning(result["error"])
+        elif result["rows"] and result["columns"]:
+            df = pd.DataFrame(result["rows"], columns=result["columns"])
+            
+            st.success(f"✅ Found {len(df)} results")
+            st.dataframe(df, use_container_width=True)
+            
+            # Auto-generate chart if applicable
+            if len(df.columns) == 2 and len(df) > 1 and len(df) < 50:
+                st.markdown("**📊 Visualization:**")
+                fig = px.bar(df, x=df.columns[0], y=df.columns[1])
+                st.plotly_chart(fig, use_container_width=True)
+        elif result["sql"]:
+            st.info("Query executed successfully but returned no results.")
+        elif not result["text"]:
+            st.info("Query completed but no results available.")
+    elif result["status"] == "FAILED":
+        st.error(f"Query failed: {result['error']}")
+    elif result["status"] == "CANCELLED":
+        st.warning("Query was cancelled")
+    else:
+        st.warning("Query timed out. Please try a simpler question.")
+
+@st.fragment(run_every=GENIE_UI_REFRESH_SECONDS)
+def genie_progress():
+    """Live status of the pending Genie request; only this fragment reruns while it waits"""
+    request = st.session_state.get("genie_request")
+    if request is None:
+        return
+    if request.done():
+        st.rerun()  # Full rerun renders the final answer outside the fragment
+    
+    label = GENIE_STATUS_LABELS.get(request.status, request.status.replace("_", " ").title())
+    st.info(f"🤔 Genie is working: **{label}** ({request.elapsed:.0f}s, {request.polls} polls)")
+    if request.partial["sql"]:
+        with st.expander("🔍 Generated SQL (running)"):
+            st.code(request.partial["sql"], language="sql")
+    if request.partial["text"]:
+        st.markdown(request.partial["text"])
+    st.caption("The rest of the dashboard stays usable while Genie works.")
+
 st.markdown("---")
 st.markdown("""
 <div style='text-align: center; padding: 2rem; background: linear-gradient(135deg, #43e97b 0%, #38f9d7 100%); border-radius: 12px; margin: 2rem 0; color: white;'>
@@ -599,122 +515,32 @@ if GENIE_SPACE_ID:
     st.markdown("**Quick Questions:**")
     col1, col2, col3 = st.columns(3)
     
+    # Only a new question starts a conversation - reruns (including the progress fragment's) don't
+    asked = None
+    if user_question and user_question != st.session_state.get("genie_last_input"):
+        asked = user_question
+    st.session_state.genie_last_input = user_question
+    
     for i, question in enumerate(example_questions):
         col_idx = i % 3
         with [col1, col2, col3][col_idx]:
             if st.button(question, key=f"q_{i}", use_container_width=True):
-                user_question = question
+                asked = question
     
-    if user_question:
-        with st.spinner("🤔 Genie is thinking..."):
-            try:
-                # Start conversation using official Genie API pattern
-                start_response = w.api_client.do(
-                    'POST',
-                    f'/api/2.0/genie/spaces/{GENIE_SPACE_ID}/start-conversation',
-                    body={'content': user_question}
-                )
-                
-                conversation_id = start_response.get('conversation_id')
-                message_id = start_response.get('message_id')
-                
-                if not conversation_id or not message_id:
-                    st.error("Failed to start Genie conversation")
-                else:
-                    # Poll for result
-                    max_attempts = 30  # 30 * 2 = 60 seconds max
-                    attempt = 0
-                    
-                    while attempt < max_attempts:
-                        time.sleep(2)  # Wait 2 seconds between polls
-                        attempt += 1
-                        
-                        # Get message status
-                        message_response = w.api_client.do(
-                            'GET',
-                            f'/api/2.0/genie/spaces/{GENIE_SPACE_ID}/conversations/{conversation_id}/messages/{message_id}'
-                        )
-                        
-                        status = message_response.get('status')
-                        
-                        if status == 'COMPLETED':
-                            # Extract results
-                            attachments = message_response.get('attachments', [])
-                            
-                            if attachments:
-                                attachment = attachments[0]
-                                text_response = attachment.get('text', {}).get('content', '')
-                                query = attachment.get('query', {}).get('query', '')
-                                
-                                # Display text response
-                                if text_response:
-                                    st.success("**Genie's Response:**")
-                                    st.markdown(text_response)
-                                
-                                # Display generated SQL
-                                if query:
-                                    with st.expander("🔍 View Generated SQL"):
-                                        st.code(query, language="sql")
-                                    
-                                    # Get query results
-                                    try:
-                                        attachment_id = attachment.get('query', {}).get('attachment_id') or attachment.get('attachment_id')
-                                        if attachment_id:
-                                            result_response = w.api_client.do(
-                                                'GET',
-                                                f'/api/2.0/genie/spaces/{GENIE_SPACE_ID}/conversations/{conversation_id}/messages/{message_id}/query-result/{attachment_id}'
-                                            )
-                                            
-                                            # Extract data from statement_response (correct path from notebook)
-                                            stmt_response = result_response.get('statement_response', {})
-                                            
-                                            if stmt_response:
-                                                # Get schema from manifest
-                                                manifest = stmt_response.get('manifest', {})
-                                                schema = manifest.get('schema', {})
-                                                columns = schema.get('columns', [])
-                                                column_names = [col.get('name') for col in columns]
-                                                
-                                                # Get data rows from result
-                                                result_obj = stmt_response.get('result', {})
-                                                data_array = result_obj.get('data_array', [])
-                                                
-                                                if data_array and column_names:
-                                                    # Create DataFrame
-                                                    df = pd.DataFrame(data_array, columns=column_names)
-                                                    
-                                                    st.success(f"✅ Found {len(df)} results")
-                                                    st.dataframe(df, use_container_width=True)
-                                                    
-                                                    # Auto-generate chart if applicable
-                                                    if len(df.columns) == 2 and len(df) > 1 and len(df) < 50:
-                                                        st.markdown("**📊 Visualization:**")
-                                                        fig = px.bar(df, x=df.columns[0], y=df.columns[1])
-                                                        st.plotly_chart(fig, use_container_width=True)
-                                                else:
-                                                    st.info("Query executed successfully but returned no results.")
-                                            else:
-                                                st.warning("No statement_response in query result")
-                                    except Exception as e:
-                                        st.warning(f"Could not fetch query results: {e}")
-                            else:
-                                st.info("Query completed but no results available.")
-                            break
-                            
-                        elif status == 'FAILED':
-                            error = message_response.get('error', {})
-                            st.error(f"Query failed: {error}")
-                            break
-                        elif status == 'CANCELLED':
-                            st.warning("Query was cancelled")
-                            break
-                    
-                    if attempt >= max_attempts:
-                        st.warning("Query timed out. Please try a simpler question.")
-                    
-            except Exception as e:
-                st.error(f"Error executing Genie query: {e}")
-                st.info("💡 Make sure you've granted **Can Run** permissions to the app's service principal on the Genie Space.")
+    if asked:
+        try:
+            st.session_state.genie_request = get_genie_client(GENIE_SPACE_ID, w=w).submit(asked)
+        except Exception as e:
+            st.session_state.genie_request = None
+            st.error(f"Error executing Genie query: {e}")
+    
+    request = st.session_state.get("genie_request")
+    if request is not None:
+        st.markdown(f"**Question:** {request.question}")
+        if request.done():
+            render_genie_result(request)
+        else:
+            genie_progress()
 else:
     st.warning("⚠️ Genie Space not configured. The Genie natural language interface is currently unavailable.")
     st.markdown("""
@@ -756,4 +582,6 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 st.markdown("<br>", unsafe_allow_html=True)
-st.caption("💡 **Dashboard refreshes every 5 minutes** | Built with Unity Catalog + Plotly + Genie API")
+st.caption(f"💡 **Dashboard refreshes every {INSIGHTS_CACHE_TTL // 60} minutes** | Built with Unity Catalog + Plotly + Genie API")
+
+render_query_metrics()
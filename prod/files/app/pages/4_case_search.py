@@ -5,9 +5,9 @@ Find similar historical fraud cases using vector similarity search
 
 import streamlit as st
 import os
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.core import Config
-from databricks import sql
+from utils.databricks_client import get_workspace_client, run_query, render_query_metrics
+from utils.vector_search import VectorSearchError, render_vector_cache_metrics
+from utils.hybrid_search import hybrid_search
 import pandas as pd
 
 # Page configuration
@@ -28,116 +28,53 @@ VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
 CLAIMS_TABLE = f"{CATALOG}.{SCHEMA}.claims_data"
 FRAUD_ANALYSIS_TABLE = f"{CATALOG}.{SCHEMA}.fraud_analysis"
 
-# Initialize WorkspaceClient
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
-def get_sql_connection():
-    """Create Databricks SQL connection"""
-    try:
-        cfg = Config()
-        return sql.connect(
-            server_hostname=cfg.host,
-            http_path=f"/sql/1.0/warehouses/{WAREHOUSE_ID}",
-            credentials_provider=lambda: cfg.authenticate,
-        )
-    except Exception as e:
-        st.error(f"SQL Connection error: {e}")
-        return None
-
+# Shared Databricks client (pooled connections, retries, latency metrics)
 w = get_workspace_client()
 
 # Helper Functions
 def get_claim_description_by_id(claim_id: str) -> str:
     """Lookup claim description from claims_data table by claim_id"""
-    sql_conn = get_sql_connection()
-    if not sql_conn:
-        return None
-    
     try:
-        with sql_conn.cursor() as cursor:
-            # Query the claims_data table to get claim information
-            cursor.execute(f"""
-                SELECT claim_id, claim_type, claimant_info, provider_info
-                FROM {CLAIMS_TABLE}
-                WHERE claim_id = '{claim_id}'
-                LIMIT 1
-            """)
-            result = cursor.fetchone()
-            if result:
-                # Create a search query from the claim details
-                claim_type = result[1]
-                claimant_info = result[2] if result[2] else ""
-                provider_info = result[3] if result[3] else ""
-                
-                # Construct a descriptive search query
-                search_text = f"{claim_type} claim"
-                if claimant_info:
-                    search_text += f" involving {claimant_info}"
-                if provider_info:
-                    search_text += f" from provider {provider_info}"
-                
-                return search_text
-            return None
+        # Query the claims_data table to get claim information
+        rows = run_query(f"""
+            SELECT claim_id, claim_type, claimant_info, provider_info
+            FROM {CLAIMS_TABLE}
+            WHERE claim_id = :claim_id
+            LIMIT 1
+        """, parameters={"claim_id": claim_id}, label="claim_lookup")
+        result = rows[0] if rows else None
+        if result:
+            # Create a search query from the claim details
+            claim_type = result[1]
+            claimant_info = result[2] if result[2] else ""
+            provider_info = result[3] if result[3] else ""
+            
+            # Construct a descriptive search query
+            search_text = f"{claim_type} claim"
+            if claimant_info:
+                search_text += f" involving {claimant_info}"
+            if provider_info:
+                search_text += f" from provider {provider_info}"
+            
+            return search_text
+        return None
     except Exception as e:
         st.error(f"Error fetching claim: {e}")
         return None
 
-def search_similar_cases(query_text: str, num_results: int = 5):
-    """Search for similar cases using vector similarity"""
+def search_similar_cases(query_text: str, num_results: int = 3):
+    """Search for similar cases with hybrid keyword + vector ranking"""
     if not w:
         st.error("WorkspaceClient not initialized")
         return None
     
     try:
-        body = {
-            "columns": ["doc_id", "doc_type", "title", "content"],
-            "num_results": num_results,
-            "query_text": query_text
-        }
-        
-        response = w.api_client.do(
-            'POST',
-            f'/api/2.0/vector-search/indexes/{VECTOR_INDEX}/query',
-            body=body
-        )
-        
-        if isinstance(response, dict) and 'error_code' in response:
-            error_msg = response.get('message', 'Unknown error')
-            st.error(f"Vector Search error: {error_msg}")
-            return None
-        
-        # Extract results with similarity scores
-        result_data = response.get('result', {})
-        data_array = result_data.get('data_array', [])
-        
-        if data_array:
-            # Note: Vector search returns results sorted by similarity
-            # Scores are typically between 0 and 1, we'll convert to percentage
-            results = []
-            for idx, row in enumerate(data_array):
-                # The similarity score is implicit in the ranking
-                # More similar results appear first
-                # We'll create a pseudo-score based on ranking (100%, 90%, 80%, etc.)
-                similarity_score = 100 - (idx * 10)  # Simple ranking-based score
-                
-                results.append({
-                    "doc_id": row[0],
-                    "doc_type": row[1],
-                    "title": row[2],
-                    "content": row[3],
-                    "similarity": similarity_score
-                })
-            return results
-        
-        return []
-        
+        # Blends BM25 over content/keywords with the index's similarity score;
+        # repeated vector queries are served from the shared cache
+        return hybrid_search(query_text, num_results=num_results, index_name=VECTOR_INDEX, w=w)
+    except VectorSearchError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error searching cases: {e}")
         return None
@@ -269,7 +206,7 @@ if search_button:
     # Perform search if we have a query
     if query_to_use:
         with st.spinner("🔍 Searching for similar cases..."):
-            results = search_similar_cases(query_to_use, num_results=5)
+            results = search_similar_cases(query_to_use, num_results=3)
         
         if results is None:
             st.error("Search failed. Please try again.")
@@ -294,8 +231,11 @@ if search_button:
                     with col_b:
                         st.metric("Similarity", f"{similarity}%")
                     
-                    # Doc type badge
-                    st.caption(f"📁 Type: **{result['doc_type']}** | 🆔 ID: {result['doc_id']}")
+                    # Doc type badge and score breakdown
+                    st.caption(
+                        f"📁 Type: **{result['doc_type']}** | 🆔 ID: {result['doc_id']} | "
+                        f"🧭 Semantic: {result['vector_score']*100:.0f}% | 🔤 Keyword: {result['keyword_score']*100:.0f}%"
+                    )
                     
                     # Content preview
                     content_preview = result['content'][:300]
@@ -329,6 +269,7 @@ else:
         - System will automatically extract the claim details and search for matches
         
         ### Interpreting Results
+        - Similarity blends semantic (vector) similarity with keyword (BM25) relevance over the case text and its keywords
         - **🟢 Green (80%+)**: Highly similar cases - strong pattern match
         - **🟡 Yellow (60-80%)**: Moderately similar - review for relevance
         - **🔴 Red (<60%)**: Lower similarity - may still provide useful context
@@ -342,3 +283,6 @@ else:
 
 st.markdown("---")
 st.caption("💡 **Tip:** Use Case Search to learn from past fraud investigations and identify emerging patterns!")
+
+render_vector_cache_metrics()
+render_query_metrics()
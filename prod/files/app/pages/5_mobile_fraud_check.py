@@ -7,10 +7,10 @@ import streamlit as st
 import os
 import json
 import time
-from databricks.sdk import WorkspaceClient
 import base64
 from PIL import Image
 import io
+from utils.databricks_client import get_workspace_client, call_uc_function
 
 # Page configuration optimized for mobile
 st.set_page_config(
@@ -105,16 +105,7 @@ SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "159828d8fa91cd28")
 VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
 
-# Initialize Databricks client
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
+# Shared Databricks client (pooled connections, retries, latency metrics)
 w = get_workspace_client()
 
 def encode_image_to_base64(image_bytes):
@@ -201,40 +192,6 @@ Format your response as JSON with these fields:
         st.error(f"Error analyzing image: {e}")
         return None
 
-def call_uc_function(function_name, *args):
-    """Call UC fraud detection functions"""
-    try:
-        escaped_args = []
-        for arg in args:
-            if isinstance(arg, str):
-                escaped_arg = arg.replace("'", "''")
-                escaped_args.append(f"'{escaped_arg}'")
-            else:
-                escaped_args.append(str(arg))
-        
-        args_str = ', '.join(escaped_args)
-        query = f"SELECT {CATALOG}.{SCHEMA}.{function_name}({args_str}) as result"
-        
-        result = w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=query,
-            wait_timeout="50s"
-        )
-        
-        if result.status.state.value == "SUCCEEDED":
-            if result.result and result.result.data_array:
-                data = result.result.data_array[0][0]
-                if isinstance(data, str):
-                    try:
-                        return json.loads(data)
-                    except:
-                        return data
-                return data
-        return None
-    except Exception as e:
-        st.error(f"Error calling function: {e}")
-        return None
-
 # Main UI
 st.markdown("## 📷 Capture or Upload Document")
 
@@ -0,0 +1,60 @@
+import json
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from utils.fast_path import FastPathPipeline, _parse
+
+
+class FakeTool:
+    """Stands in for a LangChain tool: records its calls and returns a fixed output"""
+
+    def __init__(self, name, output):
+        self.name = name
+        self.output = output
+        self.calls = []
+
+    def invoke(self, args):
+        self.calls.append(args)
+        return self.output
+
+
+def _pipeline(classification):
+    # The agent's tools used to json.dumps the already-JSON UC result, so cover both encodings
+    classify = FakeTool("classify_claim", json.dumps(json.dumps(classification)))
+    extract = FakeTool("extract_fraud_indicators", json.dumps({"red_flags": ["Upcoding"], "risk_score": 0.8}))
+    search = FakeTool("search_fraud_cases", json.dumps([{"doc_id": "case-1"}]))
+    explain = FakeTool("generate_explanation", json.dumps({"explanation": "Billed above the visit level"}))
+    return FastPathPipeline(classify, extract, search, explain), search, explain
+
+
+def test_parse_decodes_nested_json():
+    assert _parse(json.dumps(json.dumps({"is_fraudulent": True}))) == {"is_fraudulent": True}
+    assert _parse(json.dumps([1, 2])) == {"results": [1, 2]}
+    assert _parse("not json") == {}
+    assert _parse(None) == {}
+
+
+def test_fraudulent_claim_reaches_explain_stage():
+    pipeline, search, explain = _pipeline({"is_fraudulent": True, "fraud_probability": 0.9, "fraud_type": "Upcoding"})
+
+    messages = pipeline.invoke("Billed CPT 99215 for a routine check-up")["messages"]
+
+    assert len(search.calls) == 1
+    assert explain.calls == [{
+        "claim_text": "Billed CPT 99215 for a routine check-up",
+        "is_fraudulent": True,
+        "fraud_type": "Upcoding",
+    }]
+    final = messages[-1].content
+    assert "**Verdict:** FRAUD" in final
+    assert "Billed above the visit level" in final
+
+
+def test_legitimate_claim_skips_explain_stage():
+    pipeline, search, explain = _pipeline({"is_fraudulent": False, "fraud_probability": 0.1, "fraud_type": "None"})
+
+    messages = pipeline.invoke("Routine check-up, $120")["messages"]
+
+    assert search.calls == [] and explain.calls == []
+    assert "**Verdict:** LEGITIMATE" in messages[-1].content
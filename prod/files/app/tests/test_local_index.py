@@ -0,0 +1,131 @@
+import time
+import pytest
+
+pytest.importorskip("numpy")
+
+from utils.local_index import LocalIndexMirror, LocalVectorIndex, endpoint_score
+
+COLUMNS = ["doc_id", "title", "content"]
+ROWS = [
+    ["kb-1", "Upcoding", "billed higher complexity visit"],
+    ["kb-2", "Phantom", "service never rendered"],
+    ["kb-3", "Duplicate", "same claim resubmitted"],
+]
+# One axis per document, so a query's nearest neighbours are known exactly
+EMBEDDINGS = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+
+
+def fake_embed(texts):
+    """Deterministic embedding: the axis of the matching document, or the diagonal"""
+    vectors = []
+    for text in texts:
+        matches = [EMBEDDINGS[i] for i, row in enumerate(ROWS) if row[2] == text]
+        vectors.append(matches[0] if matches else [1.0, 1.0, 1.0])
+    return vectors
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("condition not met before timeout")
+        time.sleep(0.01)
+
+
+def test_search_returns_top_k_in_score_order():
+    index = LocalVectorIndex(COLUMNS, ROWS, EMBEDDINGS)
+
+    results = index.search([0.9, 0.4, 0.1], num_results=2)
+
+    assert [row[0] for row in results] == ["kb-1", "kb-2"]
+    assert results[0][-1] > results[1][-1]
+
+
+def test_search_projects_columns_and_appends_score():
+    index = LocalVectorIndex(COLUMNS, ROWS, EMBEDDINGS)
+
+    results = index.search([0.0, 0.0, 2.0], num_results=1, columns=["title", "doc_id"])
+
+    assert results == [["Duplicate", "kb-3", pytest.approx(1.0)]]
+
+
+def test_scores_use_the_endpoint_scale():
+    index = LocalVectorIndex(COLUMNS, ROWS, EMBEDDINGS)
+
+    # Orthogonal unit vectors: squared L2 distance 2, so 1 / (1 + 2) like the remote index
+    results = index.search([1.0, 0.0, 0.0], num_results=3, columns=["doc_id"])
+
+    assert results[0] == ["kb-1", pytest.approx(1.0)]
+    assert results[1][-1] == pytest.approx(1.0 / 3.0)
+    assert endpoint_score(-1.0) == pytest.approx(0.2)
+
+
+def test_num_results_larger_than_corpus():
+    index = LocalVectorIndex(COLUMNS, ROWS, EMBEDDINGS)
+
+    assert len(index.search([1.0, 1.0, 1.0], num_results=10)) == len(ROWS)
+
+
+def test_empty_corpus():
+    index = LocalVectorIndex(COLUMNS, [], [])
+
+    assert len(index) == 0
+    assert index.search([1.0, 0.0, 0.0]) == []
+
+
+def test_mismatched_rows_and_embeddings():
+    with pytest.raises(ValueError):
+        LocalVectorIndex(COLUMNS, ROWS, EMBEDDINGS[:2])
+
+
+def test_mirror_is_stale_until_loaded_then_refreshes_on_version_change():
+    state = {"version": 1, "loads": 0}
+
+    def load_rows():
+        state["loads"] += 1
+        return COLUMNS, ROWS
+
+    mirror = LocalIndexMirror(load_rows, fake_embed, lambda: state["version"], version_check_seconds=0)
+
+    # Nothing loaded yet - callers fall back while the first build runs in the background
+    assert mirror.search("service never rendered") is None
+    wait_for(lambda: mirror.stats()["refreshes"] == 1)
+
+    results = mirror.search("service never rendered", num_results=1, columns=["doc_id"])
+    assert results == [["kb-2", pytest.approx(1.0)]]
+
+    # The source table changed - the version check runs in the background and triggers a rebuild
+    state["version"] = 2
+    mirror.search("service never rendered")
+    wait_for(lambda: mirror.stats()["refreshes"] == 2)
+
+    assert mirror.search("service never rendered", num_results=1, columns=["doc_id"]) is not None
+    stats = mirror.stats()
+    assert stats["version"] == 2 and not stats["stale"]
+    assert state["loads"] == 2
+
+
+def test_mirror_waits_after_a_failed_refresh():
+    calls = {"version": 0}
+
+    def version():
+        calls["version"] += 1
+        raise RuntimeError("warehouse unavailable")
+
+    mirror = LocalIndexMirror(lambda: (COLUMNS, ROWS), fake_embed, version, version_check_seconds=60)
+
+    assert mirror.search("service never rendered") is None
+    wait_for(lambda: mirror.stats()["refresh_errors"] == 1)
+
+    # Within version_check_seconds of the failure, searches fall back without retrying
+    for _ in range(5):
+        assert mirror.search("service never rendered") is None
+    time.sleep(0.05)
+    assert calls["version"] == 1
+
+
+def test_mirror_falls_back_for_unknown_columns():
+    mirror = LocalIndexMirror(lambda: (COLUMNS, ROWS), fake_embed, lambda: 1)
+    mirror.refresh()
+
+    assert mirror.search("same claim resubmitted", columns=["doc_type"]) is None
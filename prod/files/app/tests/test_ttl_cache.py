@@ -0,0 +1,54 @@
+import time
+
+from utils.ttl_cache import VersionedTTLCache
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("condition not met before timeout")
+        time.sleep(0.01)
+
+
+def test_lru_and_ttl_without_version():
+    cache = VersionedTTLCache(ttl_seconds=60, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_version_is_read_in_the_background():
+    state = {"version": 1, "reads": 0}
+
+    def slow_version():
+        state["reads"] += 1
+        time.sleep(0.2)
+        return state["version"]
+
+    cache = VersionedTTLCache(ttl_seconds=60, max_entries=10, version_check_seconds=0, version_fn=slow_version)
+
+    started = time.time()
+    assert cache.get("a") is None
+    assert time.time() - started < 0.1
+    wait_for(lambda: cache.stats()["version"] == 1)
+
+    cache.put("a", "old")
+    assert cache.get("a") == "old"
+
+    # The data changed - entries from before the change are dropped once the new token is read
+    state["version"] = 2
+    # Each get() starts a check when one is due
+    wait_for(lambda: cache.get("b") is None and cache.stats()["version"] == 2)
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] >= 1
@@ -0,0 +1,139 @@
+"""
+Agent Stream Utility - Progressive events from a LangGraph agent run
+
+agent.invoke() returns only after every tool call and the final answer are
+done. stream_agent_events() runs the same graph with
+
+    agent.stream(inputs, stream_mode=["updates", "messages"])
+
+and turns the raw chunks into simple event dicts the page can render as they
+arrive:
+
+- {"type": "token", "text": ...}                      model text as it is generated
+- {"type": "tool_call", "id", "name", "args"}         the model decided to call a tool
+- {"type": "tool_result", "id", "name", "content", "duration_ms"}
+- {"type": "final", "content": ...}                   the answer (last AI message without tool calls)
+
+A StreamTimings object records time-to-first-output and per-step timings
+(each model turn and each tool call) while the events are consumed.
+"""
+
+import time
+
+# Node names used by langgraph.prebuilt.create_react_agent
+AGENT_NODE = "agent"
+TOOLS_NODE = "tools"
+
+
+def message_text(content) -> str:
+    """Plain text of a message/chunk content (string or list of content blocks)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+    return ""
+
+
+def _message_type(msg) -> str:
+    return getattr(msg, "type", None) or type(msg).__name__.lower()
+
+
+class StreamTimings:
+    """Time-to-first-output and per-step timings for one streamed agent run"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.first_output = None
+        self.steps = []
+        self._step_started = self.started
+        self._tool_started = {}
+
+    def mark_output(self):
+        if self.first_output is None:
+            self.first_output = time.time()
+
+    def model_step_done(self, label):
+        now = time.time()
+        self.steps.append({"step": label, "kind": "model",
+                           "duration_ms": (now - self._step_started) * 1000})
+        self._step_started = now
+
+    def tool_started(self, call_id):
+        self._tool_started[call_id] = time.time()
+
+    def tool_done(self, call_id, name) -> float:
+        now = time.time()
+        duration_ms = (now - self._tool_started.pop(call_id, self._step_started)) * 1000
+        self.steps.append({"step": name, "kind": "tool", "duration_ms": duration_ms})
+        self._step_started = now
+        return duration_ms
+
+    @property
+    def ttfo_ms(self):
+        """Milliseconds until the first token or tool call (None if nothing was output)"""
+        return (self.first_output - self.started) * 1000 if self.first_output else None
+
+    @property
+    def total_ms(self):
+        return (time.time() - self.started) * 1000
+
+
+def stream_agent_events(agent, inputs, timings=None, config=None):
+    """
+    Run a LangGraph agent and yield render-ready events as they happen.
+
+    Args:
+        agent: compiled graph (e.g. from create_react_agent)
+        inputs: graph input, e.g. {"messages": [...]}
+        timings: optional StreamTimings to fill in
+
+    Yields:
+        event dicts (see module docstring)
+    """
+    timings = timings or StreamTimings()
+    model_turns = 0
+    final_content = None
+
+    for mode, chunk in agent.stream(inputs, config=config, stream_mode=["updates", "messages"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != AGENT_NODE:
+                continue
+            text = message_text(getattr(message, "content", ""))
+            if text:
+                timings.mark_output()
+                yield {"type": "token", "text": text}
+            continue
+
+        # "updates": {node_name: state_update} after each node finishes
+        for node, update in (chunk or {}).items():
+            for msg in (update or {}).get("messages", []):
+                msg_type = _message_type(msg)
+                if node == AGENT_NODE and "ai" in msg_type:
+                    model_turns += 1
+                    timings.model_step_done(f"model turn {model_turns}")
+                    tool_calls = getattr(msg, "tool_calls", None) or []
+                    for tc in tool_calls:
+                        timings.mark_output()
+                        timings.tool_started(tc.get("id"))
+                        yield {"type": "tool_call", "id": tc.get("id"),
+                               "name": tc.get("name", "unknown"), "args": tc.get("args", {})}
+                    if not tool_calls:
+                        final_content = message_text(getattr(msg, "content", ""))
+                elif node == TOOLS_NODE and "tool" in msg_type:
+                    name = getattr(msg, "name", None) or "unknown"
+                    call_id = getattr(msg, "tool_call_id", None)
+                    duration_ms = timings.tool_done(call_id, name)
+                    yield {"type": "tool_result", "id": call_id, "name": name,
+                           "content": message_text(getattr(msg, "content", "")),
+                           "duration_ms": duration_ms}
+
+    if final_content is not None:
+        timings.mark_output()
+        yield {"type": "final", "content": final_content}
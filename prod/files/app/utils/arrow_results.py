@@ -0,0 +1,129 @@
+"""
+Arrow Results Utility - Typed, complete statement results via Arrow external links
+
+With the default JSON_ARRAY / INLINE format a statement result is a
+data_array of strings (numbers and dates arrive as text) split into chunks,
+and readers that only look at response.result.data_array silently drop
+every chunk after the first. Statements run with ARROW_RESULT_OPTIONS
+(format=ARROW_STREAM, disposition=EXTERNAL_LINKS) instead return one
+presigned link per chunk. fetch_arrow_table():
+
+1. Downloads every chunk in parallel (links for later chunks are requested
+   by the worker that downloads them)
+2. Reads each chunk as an Arrow IPC stream straight from the downloaded
+   buffer, keeping the warehouse's column types
+3. Concatenates the chunks in order into one pyarrow.Table
+
+Presigned links are fetched without the Databricks auth header, and a link
+that has expired is requested again once.
+"""
+
+import os
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+from databricks.sdk.service.sql import Disposition, Format
+
+# Defaults can be overridden via app_env in config.yaml
+ARROW_FETCH_WORKERS = int(os.getenv("ARROW_FETCH_WORKERS", "8"))
+ARROW_DOWNLOAD_TIMEOUT = float(os.getenv("ARROW_DOWNLOAD_TIMEOUT", "120"))
+
+# Extra execute_statement arguments for Arrow results
+ARROW_RESULT_OPTIONS = {"format": Format.ARROW_STREAM, "disposition": Disposition.EXTERNAL_LINKS}
+
+# Column types for an empty result (no chunk carries an Arrow schema)
+_EMPTY_COLUMN_TYPES = {
+    "BOOLEAN": pa.bool_(),
+    "BYTE": pa.int8(),
+    "SHORT": pa.int16(),
+    "INT": pa.int32(),
+    "LONG": pa.int64(),
+    "FLOAT": pa.float32(),
+    "DOUBLE": pa.float64(),
+    "DATE": pa.date32(),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+}
+
+_fetch_executor = ThreadPoolExecutor(max_workers=ARROW_FETCH_WORKERS, thread_name_prefix="arrow-fetch")
+
+
+def _empty_table(manifest) -> pa.Table:
+    columns = manifest.schema.columns if manifest and manifest.schema and manifest.schema.columns else []
+    return pa.schema([
+        (col.name, _EMPTY_COLUMN_TYPES.get(col.type_name.value if col.type_name else "", pa.string()))
+        for col in columns
+    ]).empty_table()
+
+
+def _download(link) -> bytes:
+    request = urllib.request.Request(link.external_link, headers=dict(link.http_headers or {}))
+    with urllib.request.urlopen(request, timeout=ARROW_DOWNLOAD_TIMEOUT) as response:
+        return response.read()
+
+
+def _chunk_link(w, statement_id, chunk_index):
+    chunk = w.statement_execution.get_statement_result_chunk_n(statement_id, chunk_index)
+    if not chunk.external_links:
+        raise RuntimeError(f"Statement {statement_id} returned no link for chunk {chunk_index}")
+    return chunk.external_links[0]
+
+
+def _fetch_chunk(w, statement_id, chunk_index, link=None) -> pa.Table:
+    """Download one chunk and read it as an Arrow table"""
+    link = link or _chunk_link(w, statement_id, chunk_index)
+    try:
+        data = _download(link)
+    except urllib.error.HTTPError as e:
+        if e.code not in (403, 404):
+            raise
+        # Presigned links expire (~15 minutes) - ask for a fresh one
+        data = _download(_chunk_link(w, statement_id, chunk_index))
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+
+
+def fetch_arrow_table(w, response) -> pa.Table:
+    """
+    All rows of a SUCCEEDED statement run with ARROW_RESULT_OPTIONS, as one table.
+
+    Raises:
+        ValueError if the statement was not run with EXTERNAL_LINKS
+    """
+    manifest = response.manifest
+    if manifest and manifest.format and manifest.format != Format.ARROW_STREAM:
+        raise ValueError(f"Statement result format is {manifest.format.value}, expected ARROW_STREAM")
+
+    chunk_count = manifest.total_chunk_count if manifest and manifest.total_chunk_count else 0
+    if chunk_count == 0:
+        return _empty_table(manifest)
+
+    # The first response already carries the links for the leading chunk(s)
+    known_links = {}
+    if response.result and response.result.external_links:
+        known_links = {link.chunk_index: link for link in response.result.external_links}
+
+    futures = [
+        _fetch_executor.submit(_fetch_chunk, w, response.statement_id, i, known_links.get(i))
+        for i in range(chunk_count)
+    ]
+    tables = [future.result() for future in futures]
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+
+def arrow_to_pandas(table):
+    """pandas DataFrame from an Arrow table, avoiding a second in-memory copy where possible"""
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def dataframe_to_ipc(df) -> bytes:
+    """pandas DataFrame as an Arrow IPC stream (column types kept, index dropped)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_to_dataframe(data):
+    """pandas DataFrame from dataframe_to_ipc() output"""
+    return arrow_to_pandas(pa.ipc.open_stream(pa.py_buffer(data)).read_all())
@@ -0,0 +1,90 @@
+"""
+Batch Executor Utility - Bounded worker pool for concurrent claim processing
+"""
+
+import os
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Defaults can be overridden via app_env in config.yaml
+DEFAULT_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+DEFAULT_CLAIM_TIMEOUT = float(os.getenv("BATCH_CLAIM_TIMEOUT", "120"))
+
+
+def remaining_seconds(deadline, minimum=1.0) -> float:
+    """Seconds left before a run_concurrently deadline (at least minimum)"""
+    return max(minimum, deadline - time.time())
+
+
+def run_concurrently(items, fn, max_workers=DEFAULT_MAX_WORKERS, item_timeout=DEFAULT_CLAIM_TIMEOUT,
+                     on_result=None, on_timeout=None, on_error=None, pass_deadline=False):
+    """
+    Run fn(item) for every item on a bounded thread pool.
+
+    Results are returned in submission order, but on_result(index, result) is
+    called on the caller's thread as soon as each item finishes, so Streamlit
+    widgets can be updated in completion order.
+
+    An item that runs longer than item_timeout seconds is abandoned and its
+    slot filled with on_timeout(index, item). An item that raises is filled
+    with on_error(index, item, exc). Both default to None.
+
+    A thread cannot be stopped from outside, so an abandoned item keeps its
+    worker until fn returns. With pass_deadline, fn is called as
+    fn(item, deadline) and should bound its own work (e.g. statement
+    timeouts) by that time.time() value so the worker is freed. The batch as
+    a whole is also bounded: items still queued or running once every worker
+    has had item_timeout per round of items are timed out too.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if not items:
+        return results
+
+    started_at = {}
+    lock = threading.Lock()
+    workers = max(1, max_workers)
+    batch_deadline = time.time() + item_timeout * math.ceil(len(items) / workers)
+
+    def run(index, item):
+        start = time.time()
+        with lock:
+            started_at[index] = start
+        return fn(item, start + item_timeout) if pass_deadline else fn(item)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="claim-worker")
+    try:
+        pending = {executor.submit(run, i, item): i for i, item in enumerate(items)}
+
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = on_error(index, items[index], e) if on_error else None
+                results[index] = result
+                if on_result:
+                    on_result(index, result)
+
+            # Abandon items running longer than the per-item timeout, and anything left past the batch deadline
+            now = time.time()
+            for future, index in list(pending.items()):
+                with lock:
+                    start = started_at.get(index)
+                if (start is not None and now - start > item_timeout) or now > batch_deadline:
+                    future.cancel()
+                    pending.pop(future)
+                    result = on_timeout(index, items[index]) if on_timeout else None
+                    results[index] = result
+                    if on_result:
+                        on_result(index, result)
+    finally:
+        # Don't block the page on abandoned (timed out) workers
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
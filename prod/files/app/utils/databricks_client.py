@@ -1,39 +1,432 @@
 """
-Databricks Client Utility
+Databricks Client Utility - Shared, pooled access to Databricks for all app pages
+
+One place for:
+- The WorkspaceClient (created once per app process)
+- A thread-safe pool of databricks-sql connections, so queries reuse an open
+  session instead of paying a TLS handshake + session open every call
+- Statement Execution API calls and UC function calls (submitted and polled
+  by a StatementRunner, so slow AI_QUERY calls are not cut off at 50s)
+- Typed DataFrames from Arrow results (every chunk, fetched in parallel)
+- Uniform retries, timeouts and per-call latency metrics
 """
 
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, deque
+from contextlib import contextmanager
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.sql import StatementState
+from databricks.sdk.core import Config
+from databricks import sql
 import pandas as pd
 import streamlit as st
+from utils.llm_cache import get_shared_cache
+from utils.statement_runner import StatementRunner, StatementFailed
+from utils.arrow_results import ARROW_RESULT_OPTIONS, fetch_arrow_table, arrow_to_pandas
+
+CATALOG = os.getenv("CATALOG_NAME", "fraud_detection_dev")
+SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
+WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "159828d8fa91cd28")  # From app.yaml
+
+# Defaults can be overridden via app_env in config.yaml
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "4"))
+SQL_QUERY_TIMEOUT = int(os.getenv("SQL_QUERY_TIMEOUT", "60"))
+SQL_MAX_RETRIES = int(os.getenv("SQL_MAX_RETRIES", "2"))
+UC_CALL_TIMEOUT = float(os.getenv("UC_CALL_TIMEOUT", "300"))
+UC_MAX_IN_FLIGHT = int(os.getenv("UC_MAX_IN_FLIGHT", "16"))
+
+# Idle sessions older than this are closed instead of reused (warehouse sessions expire)
+SQL_MAX_IDLE_SECONDS = 600
+
+
+# ===== WORKSPACE CLIENT =====
+
+def _host_url(host):
+    return host if host.startswith("http") else f"https://{host}"
+
 
 @st.cache_resource
 def get_workspace_client():
-    """Get cached WorkspaceClient"""
-    return WorkspaceClient()
+    """Initialize Databricks WorkspaceClient (automatically authenticated in Databricks Apps)"""
+    try:
+        # Check for OAuth credentials
+        client_id = os.getenv("DATABRICKS_CLIENT_ID")
+        client_secret = os.getenv("DATABRICKS_CLIENT_SECRET")
+        host = os.getenv("DATABRICKS_HOST")
 
-def execute_sql(cfg, query: str) -> pd.DataFrame:
-    """Execute SQL query and return DataFrame"""
+        if client_id and client_secret and host:
+            # OAuth authentication with service principal
+            return WorkspaceClient(host=_host_url(host), client_id=client_id, client_secret=client_secret)
+        elif host:
+            # Try with host only (will use other auth methods)
+            return WorkspaceClient(host=_host_url(host))
+        else:
+            # Default initialization (works in Databricks Apps)
+            return WorkspaceClient()
+    except Exception as e:
+        if "default auth: cannot configure default credentials" in str(e):
+            st.warning("⚠️ Running in local dev mode. Deploy to Databricks Apps for full functionality.")
+        else:
+            st.error(f"Failed to initialize Databricks client: {e}")
+        return None
+
+
+# ===== LATENCY METRICS =====
+
+class QueryMetrics:
+    """Rolling per-label latency and error counts for Databricks calls"""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._retries = defaultdict(int)
+
+    def record(self, label, elapsed, ok=True, retries=0):
+        with self._lock:
+            self._latencies[label].append(elapsed)
+            self._calls[label] += 1
+            self._retries[label] += retries
+            if not ok:
+                self._errors[label] += 1
+
+    def summary(self) -> dict:
+        """label -> {calls, errors, retries, avg_ms, p50_ms, p95_ms}"""
+        with self._lock:
+            summary = {}
+            for label, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                summary[label] = {
+                    "calls": self._calls[label],
+                    "errors": self._errors[label],
+                    "retries": self._retries[label],
+                    "avg_ms": sum(ordered) / len(ordered) * 1000,
+                    "p50_ms": ordered[len(ordered) // 2] * 1000,
+                    "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                }
+            return summary
+
+
+_metrics = QueryMetrics()
+
+
+def get_query_metrics() -> QueryMetrics:
+    """Process-wide metrics shared by every page"""
+    return _metrics
+
+
+def render_query_metrics():
+    """Show per-call latency metrics for this app process in an expander"""
+    summary = _metrics.summary()
+    if not summary:
+        return
+    with st.expander("⏱️ Databricks Call Latency"):
+        st.dataframe(
+            pd.DataFrame([
+                {"Call": label, "Calls": m["calls"], "Errors": m["errors"], "Retries": m["retries"],
+                 "Avg (ms)": round(m["avg_ms"]), "p50 (ms)": round(m["p50_ms"]), "p95 (ms)": round(m["p95_ms"])}
+                for label, m in sorted(summary.items())
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+
+def _with_retries(label, fn, retries, is_retryable):
+    """Run fn() with exponential backoff, recording latency under label"""
+    start = time.time()
+    attempt = 0
+    while True:
+        try:
+            result = fn()
+            _metrics.record(label, time.time() - start, ok=True, retries=attempt)
+            return result
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                _metrics.record(label, time.time() - start, ok=False, retries=attempt)
+                raise
+            time.sleep(min(0.5 * (2 ** attempt), 8))
+            attempt += 1
+
+
+# ===== SQL CONNECTION POOL =====
+
+def _is_transient_sql_error(error) -> bool:
+    """Connection / transport failures are worth retrying; SQL errors are not"""
+    return not isinstance(error, sql.exc.ServerOperationError)
+
+
+class SQLConnectionPool:
+    """
+    Thread-safe pool of databricks-sql connections to one warehouse.
+
+    At most max_size connections are open at once; callers beyond that wait
+    for a free one. Connections that fail at the transport level are closed
+    instead of being returned to the pool.
+    """
+
+    def __init__(self, warehouse_id, max_size=SQL_POOL_SIZE, query_timeout=SQL_QUERY_TIMEOUT,
+                 max_idle_seconds=SQL_MAX_IDLE_SECONDS):
+        self.warehouse_id = warehouse_id
+        self.max_size = max_size
+        self.query_timeout = query_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self._idle = []  # (connection, returned_at)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._cfg = None
+
+    def _connect(self):
+        if not self.warehouse_id:
+            raise RuntimeError("WAREHOUSE_ID not configured - set DATABRICKS_WAREHOUSE_ID in app.yaml")
+        if self._cfg is None:
+            self._cfg = Config()
+        if not self._cfg.host:
+            raise RuntimeError("Databricks host not configured - run in Databricks Apps or configure ~/.databrickscfg")
+        cfg = self._cfg
+        return sql.connect(
+            server_hostname=cfg.host,
+            http_path=f"/sql/1.0/warehouses/{self.warehouse_id}",
+            credentials_provider=lambda: cfg.authenticate,
+            session_configuration={"STATEMENT_TIMEOUT": str(self.query_timeout)},
+        )
+
+    def _checkout(self):
+        now = time.time()
+        with self._lock:
+            while self._idle:
+                conn, returned_at = self._idle.pop()
+                if now - returned_at <= self.max_idle_seconds:
+                    return conn
+                self._close(conn)
+        return self._connect()
+
+    def _checkin(self, conn):
+        with self._lock:
+            self._idle.append((conn, time.time()))
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self, acquire_timeout=None):
+        """Borrow a connection for the duration of the with-block"""
+        acquire_timeout = acquire_timeout if acquire_timeout is not None else self.query_timeout
+        if not self._slots.acquire(timeout=acquire_timeout):
+            raise TimeoutError(f"No SQL connection available within {acquire_timeout}s")
+        conn = None
+        healthy = True
+        try:
+            conn = self._checkout()
+            yield conn
+        except Exception as e:
+            healthy = not _is_transient_sql_error(e)
+            raise
+        finally:
+            if conn is not None:
+                if healthy:
+                    self._checkin(conn)
+                else:
+                    self._close(conn)
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+@st.cache_resource
+def get_sql_pool(warehouse_id=WAREHOUSE_ID) -> SQLConnectionPool:
+    """Process-wide connection pool for the configured warehouse"""
+    return SQLConnectionPool(warehouse_id)
+
+
+def run_query(query, parameters=None, label="sql", retries=SQL_MAX_RETRIES, as_dataframe=False,
+              warehouse_id=WAREHOUSE_ID):
+    """
+    Run a query on a pooled databricks-sql connection.
+
+    Transport failures are retried with backoff on a fresh connection; SQL
+    errors (missing table, syntax) are raised immediately.
+
+    Returns:
+        list of rows, or a DataFrame if as_dataframe=True
+    """
+    pool = get_sql_pool(warehouse_id)
+
+    def execute():
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, parameters)
+                if as_dataframe:
+                    # Arrow batches straight from the connector - typed columns, no per-row objects
+                    return arrow_to_pandas(cursor.fetchall_arrow())
+                return cursor.fetchall()
+
+    return _with_retries(label, execute, retries, _is_transient_sql_error)
+
+
+# ===== STATEMENT EXECUTION API =====
+
+def execute_statement(statement, parameters=None, wait_timeout="50s", label="statement",
+                      retries=SQL_MAX_RETRIES, warehouse_id=WAREHOUSE_ID, w=None, **kwargs):
+    """Statement Execution API call with retries on request failures and latency metrics"""
+    w = w or get_workspace_client()
+    return _with_retries(
+        label,
+        lambda: w.statement_execution.execute_statement(
+            warehouse_id=warehouse_id,
+            statement=statement,
+            parameters=parameters,
+            wait_timeout=wait_timeout,
+            **kwargs
+        ),
+        retries,
+        lambda e: True
+    )
+
+
+@st.cache_resource
+def get_statement_runner(warehouse_id=WAREHOUSE_ID) -> StatementRunner:
+    """Process-wide submit-and-poll runner for long statements (UC AI functions)"""
+    return StatementRunner(get_workspace_client(), warehouse_id, max_in_flight=UC_MAX_IN_FLIGHT,
+                           default_timeout=UC_CALL_TIMEOUT)
+
+
+def _format_uc_arg(arg):
+    """Render a UC function argument as a SQL literal"""
+    if isinstance(arg, str):
+        escaped_arg = arg.replace("'", "''")
+        return f"'{escaped_arg}'"
+    return str(arg)
+
+
+def _parse_uc_result(function_name, data):
+    """Parse a UC function result cell (STRUCT values arrive as JSON strings)"""
+    if isinstance(data, str):
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+    if isinstance(data, (list, tuple)) and function_name == "fraud_generate_explanation" and len(data) >= 3:
+        # For STRUCT types returned as arrays
+        return {
+            'summary': data[0],
+            'key_findings': data[1] if data[1] else [],
+            'recommendations': data[2] if data[2] else []
+        }
+    return data
+
+
+def call_uc_function_uncached(function_name, *args, timeout=UC_CALL_TIMEOUT, show_debug=False,
+                              catalog=CATALOG, schema=SCHEMA, warehouse_id=WAREHOUSE_ID):
+    """Call a Unity Catalog function, polling until it finishes or timeout seconds pass"""
+    if not get_workspace_client():
+        return None
+    runner = get_statement_runner(warehouse_id)
+    try:
+        args_str = ', '.join(_format_uc_arg(arg) for arg in args)
+        query = f"SELECT {catalog}.{schema}.{function_name}({args_str}) as result"
+
+        if show_debug:
+            st.info(f"🔍 Executing: {function_name}(...) on warehouse {warehouse_id}")
+
+        # Retry request failures only; a FAILED or timed-out statement is final
+        result = _with_retries(
+            function_name,
+            lambda: runner.run(query, timeout=timeout),
+            SQL_MAX_RETRIES,
+            lambda e: not isinstance(e, StatementFailed)
+        )
+
+        if result.result and result.result.data_array:
+            return _parse_uc_result(function_name, result.result.data_array[0][0])
+        return None
+
+    except StatementFailed as e:
+        if show_debug:
+            st.error(f"Query failed: {e.state.value if e.state else 'UNKNOWN'}")
+            st.error(f"Error: {e}")
+        return None
+    except Exception as e:
+        if show_debug:
+            st.error(f"Error calling UC function {function_name}: {e}")
+        return None
+
+
+def call_uc_function(function_name, *args, **kwargs):
+    """Call a Unity Catalog function, serving repeated calls from the shared LLM result cache"""
     w = get_workspace_client()
-    
-    response = w.statement_execution.execute_statement(
-        warehouse_id=cfg.warehouse_id,
-        statement=query,
-        wait_timeout='30s'
+    if not w:
+        return None
+    cache = get_shared_cache(w, WAREHOUSE_ID, CATALOG, SCHEMA)
+    result = cache.get_or_call(
+        function_name, args,
+        lambda: call_uc_function_uncached(function_name, *args, **kwargs)
     )
-    
-    if response.status.state == StatementState.SUCCEEDED:
-        if response.result and response.result.data_array:
-            columns = [col.name for col in response.manifest.schema.columns]
-            data = response.result.data_array
-            return pd.DataFrame(data, columns=columns)
-    
-    return pd.DataFrame()
+    # Entries written as raw JSON strings by older FraudAgent runs are parsed on the way out
+    return _parse_uc_result(function_name, result)
+
+
+_uc_executor = ThreadPoolExecutor(max_workers=UC_MAX_IN_FLIGHT, thread_name_prefix="uc-call")
+
+
+def submit_uc_function(function_name, *args, **kwargs):
+    """Start a (cached) UC function call in the background; returns a concurrent.futures.Future"""
+    return _uc_executor.submit(call_uc_function, function_name, *args, **kwargs)
+
+
+async def call_uc_function_async(function_name, *args, **kwargs):
+    """Await a (cached) UC function call from asyncio code"""
+    return await asyncio.wrap_future(submit_uc_function(function_name, *args, **kwargs))
+
+
+# ===== DATAFRAME HELPERS =====
+
+def fetch_arrow(query, parameters=None, label="arrow_query", timeout=SQL_QUERY_TIMEOUT,
+                warehouse_id=WAREHOUSE_ID, w=None):
+    """
+    Run a statement and return every result row as a typed pyarrow.Table.
+
+    Results come back as Arrow external links, so numbers and dates keep
+    their types and results of any size are read in full (all chunks,
+    downloaded in parallel).
+
+    Raises:
+        StatementFailed if the statement does not succeed
+    """
+    w = w or get_workspace_client()
+    runner = get_statement_runner(warehouse_id)
+
+    def execute():
+        response = runner.run(query, parameters=parameters, timeout=timeout, **ARROW_RESULT_OPTIONS)
+        return fetch_arrow_table(w, response)
+
+    return _with_retries(label, execute, SQL_MAX_RETRIES, lambda e: not isinstance(e, StatementFailed))
+
+
+def execute_sql(cfg, query: str) -> pd.DataFrame:
+    """Execute SQL query and return a typed DataFrame (empty if the statement fails)"""
+    try:
+        return arrow_to_pandas(fetch_arrow(query, label="execute_sql", warehouse_id=cfg.warehouse_id))
+    except StatementFailed:
+        return pd.DataFrame()
 
 def get_fraud_statistics(cfg) -> dict:
     """Get fraud statistics from claims table"""
     query = f"""
-    SELECT 
+    SELECT
         COUNT(*) as total_claims,
         SUM(CASE WHEN is_fraud = TRUE THEN 1 ELSE 0 END) as fraud_claims,
         ROUND(AVG(CASE WHEN is_fraud = TRUE THEN 1.0 ELSE 0.0 END) * 100, 2) as fraud_rate,
@@ -41,7 +434,7 @@ def get_fraud_statistics(cfg) -> dict:
         ROUND(SUM(CASE WHEN is_fraud = TRUE THEN claim_amount ELSE 0 END), 2) as total_fraud_amount
     FROM {cfg.claims_table}
     """
-    
+
     df = execute_sql(cfg, query)
     if not df.empty:
         return df.iloc[0].to_dict()
@@ -56,5 +449,3 @@ def get_recent_claims(cfg, limit: int = 10) -> pd.DataFrame:
     LIMIT {limit}
     """
     return execute_sql(cfg, query)
-
-
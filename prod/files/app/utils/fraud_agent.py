@@ -2,27 +2,33 @@
 Fraud Agent Utility - Core agent logic for Streamlit app
 """
 
-from databricks.sdk import WorkspaceClient
 from databricks_langchain import ChatDatabricks
-from databricks.vector_search.client import VectorSearchClient
-from databricks.sdk.service.sql import StatementState
-from langchain_core.tools import Tool
-from langchain_core.messages import SystemMessage
-from langgraph.prebuilt import create_react_agent
+from langchain_core.tools import Tool, StructuredTool
+from utils.agent_graph import build_parallel_agent
 from pydantic import BaseModel, Field
 import json
-import time
-import backoff
 import streamlit as st
+from utils.llm_cache import get_shared_cache
+from utils.databricks_client import get_workspace_client, get_statement_runner, _parse_uc_result
+from utils.statement_runner import StatementFailed
+from utils.agent_stream import stream_agent_events
+from utils.vector_search import query_index
+from utils.genie_client import get_genie_client
+from utils.fast_path import FastPathPipeline, benchmark_modes, MODE_AGENT, MODE_FAST_PATH
+
+
+def _tool_json(result) -> str:
+    """Tool output as a single layer of JSON (UC results may already be JSON strings)"""
+    return result if isinstance(result, str) else json.dumps(result, indent=2)
+
 
 class FraudAgent:
     """Fraud detection agent wrapper for Streamlit"""
     
     def __init__(self, cfg):
         self.cfg = cfg
-        self.w = WorkspaceClient()
+        self.w = get_workspace_client()
         self.llm = ChatDatabricks(endpoint=cfg.llm_endpoint)
-        self.vsc = VectorSearchClient(disable_notice=True)
         
         # Get Genie Space ID from Spark
         from pyspark.sql import SparkSession
@@ -33,10 +39,18 @@ class FraudAgent:
         
         self.tools = self._create_tools()
         self.agent = self._create_agent()
+        self.fast_path = self._create_fast_path()
     
-    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
     def call_uc_function(self, function_name: str, parameters: dict) -> dict:
-        """Call UC function via Statement Execution API"""
+        """Call UC function, serving repeated calls from the shared LLM result cache"""
+        cache = get_shared_cache(self.w, self.cfg.warehouse_id, self.cfg.catalog, self.cfg.schema)
+        return cache.get_or_call(
+            function_name, list(parameters.values()),
+            lambda: self._execute_uc_function(function_name, parameters)
+        )
+    
+    def _execute_uc_function(self, function_name: str, parameters: dict) -> dict:
+        """Call UC function via Statement Execution API (submit, then poll until done)"""
         param_values = []
         for key, value in parameters.items():
             if isinstance(value, str):
@@ -46,25 +60,27 @@ class FraudAgent:
                 param_values.append(str(value))
         
         query = f"SELECT {self.cfg.catalog}.{self.cfg.schema}.{function_name}({', '.join(param_values)}) as result"
-        response = self.w.statement_execution.execute_statement(
-            warehouse_id=self.cfg.warehouse_id,
-            statement=query,
-            wait_timeout='30s'
-        )
+        try:
+            response = get_statement_runner(self.cfg.warehouse_id).run(query)
+        except StatementFailed:
+            return None
         
-        if response.status.state == StatementState.SUCCEEDED and response.result and response.result.data_array:
-            return response.result.data_array[0][0]
+        # Parse like the pages do - the cached value is shared with them
+        if response.result and response.result.data_array:
+            return _parse_uc_result(function_name, response.result.data_array[0][0])
         return None
     
     def search_fraud_cases(self, query: str, num_results: int = 3) -> str:
         """Search knowledge base using Vector Search"""
         try:
-            results = self.vsc.get_index(self.cfg.vector_index).similarity_search(
-                query_text=query,
+            # Shared cache across pages and agents; invalidated when the KB / index changes
+            docs = query_index(
+                query,
                 columns=["doc_id", "doc_type", "title", "content"],
-                num_results=num_results
+                num_results=num_results,
+                index_name=self.cfg.vector_index,
+                w=self.w
             )
-            docs = results.get('result', {}).get('data_array', [])
             formatted = [
                 {
                     "doc_id": d[0],
@@ -79,28 +95,16 @@ class FraudAgent:
             return json.dumps({"error": str(e)})
     
     def query_genie(self, question: str) -> str:
-        """Query Genie for fraud statistics"""
+        """Query Genie for fraud statistics (cached and coalesced with the Insights page)"""
         try:
-            conv = self.w.genie.start_conversation(
-                space_id=self.genie_space_id,
-                content=question
-            )
-            
-            for _ in range(15):
-                msg = self.w.genie.get_message(
-                    space_id=self.genie_space_id,
-                    conversation_id=conv.conversation_id,
-                    message_id=conv.message_id
-                )
-                
-                if msg.status == 'COMPLETED':
-                    return json.dumps({"response": msg.content})
-                elif msg.status == 'FAILED':
-                    return json.dumps({"error": "Query failed"})
-                
-                time.sleep(2)
-            
-            return json.dumps({"error": "Timeout"})
+            result = get_genie_client(self.genie_space_id, w=self.w).ask(question)
+            if result["status"] != "COMPLETED":
+                return json.dumps({"error": result["error"] or f"Query {result['status'].lower()}"})
+            return json.dumps({
+                "response": result["text"],
+                "sql": result["sql"],
+                "rows": [dict(zip(result["columns"], row)) for row in result["rows"][:20]]
+            })
         except Exception as e:
             return json.dumps({"error": str(e)})
     
@@ -123,13 +127,13 @@ class FraudAgent:
             Tool(
                 name="classify_claim",
                 description="Classifies claim as fraudulent or legitimate. Use FIRST.",
-                func=lambda text: json.dumps(self.call_uc_function("fraud_classify", {"claim_text": text}), indent=2),
+                func=lambda text: _tool_json(self.call_uc_function("fraud_classify", {"claim_text": text})),
                 args_schema=ClassifyInput
             ),
             Tool(
                 name="extract_fraud_indicators",
                 description="Extracts fraud red flags. Use when suspicious.",
-                func=lambda text: json.dumps(self.call_uc_function("fraud_extract_indicators", {"claim_text": text}), indent=2),
+                func=lambda text: _tool_json(self.call_uc_function("fraud_extract_indicators", {"claim_text": text})),
                 args_schema=ExtractInput
             ),
             Tool(
@@ -147,8 +151,8 @@ class FraudAgent:
         ]
     
     def _create_agent(self):
-        """Create LangGraph ReAct agent"""
-        system_message = SystemMessage(content="""You are an expert fraud detection agent.
+        """Create LangGraph agent (independent tool calls run in parallel)"""
+        system_prompt = """You are an expert fraud detection agent.
 
 Strategy:
 - SIMPLE claims: Use classify_claim only
@@ -156,17 +160,61 @@ Strategy:
 - COMPLEX: Add search_fraud_cases
 - TRENDS: Use query_fraud_trends
 
-Always explain reasoning and cite evidence.""")
+Tools that only need the claim text (classify_claim, extract_fraud_indicators, search_fraud_cases)
+are independent - request every one you need TOGETHER in a single turn so they run in parallel.
+
+Always explain reasoning and cite evidence."""
         
-        return create_react_agent(self.llm, self.tools, messages_modifier=system_message)
+        return build_parallel_agent(self.llm, self.tools, system_prompt=system_prompt)
     
-    def analyze_claim(self, claim_text: str):
-        """Analyze a claim and return structured result"""
+    def _create_fast_path(self):
+        """Fixed classify || extract -> search || explain pipeline over the agent's tools"""
+        tools = {tool.name: tool for tool in self.tools}
+        
+        def explain(claim_text: str, is_fraudulent: bool, fraud_type: str = "none") -> str:
+            return _tool_json(self.call_uc_function("fraud_generate_explanation", {
+                "claim_text": claim_text,
+                "is_fraudulent": is_fraudulent,
+                "fraud_type": fraud_type
+            }))
+        
+        explain_tool = StructuredTool.from_function(
+            func=explain,
+            name="generate_explanation",
+            description="Explains a fraud classification."
+        )
+        return FastPathPipeline(
+            tools["classify_claim"], tools["extract_fraud_indicators"],
+            tools["search_fraud_cases"], explain_tool
+        )
+    
+    def analyze_claim(self, claim_text: str, mode: str = MODE_AGENT):
+        """Analyze a claim and return structured result (mode: 'agent' or 'fast_path')"""
+        if mode == MODE_FAST_PATH:
+            return self.fast_path.invoke(claim_text)
+        
         result = self.agent.invoke({
             "messages": [("user", f"Analyze this claim for fraud:\n{claim_text}")]
         })
         
         return result
+    
+    def stream_claim(self, claim_text: str, timings=None, mode: str = MODE_AGENT):
+        """Analyze a claim, yielding tool calls, tool results and tokens as they happen"""
+        if mode == MODE_FAST_PATH:
+            return self.fast_path.stream(claim_text, timings=timings)
+        return stream_agent_events(self.agent, {
+            "messages": [("user", f"Analyze this claim for fraud:\n{claim_text}")]
+        }, timings=timings)
+    
+    def benchmark(self, claim_texts, repeats: int = 1):
+        """Latency / tool call / planner token comparison of agent vs fast path"""
+        return benchmark_modes(
+            lambda text: self.analyze_claim(text, MODE_AGENT),
+            lambda text: self.analyze_claim(text, MODE_FAST_PATH),
+            claim_texts,
+            repeats=repeats
+        )
 
 
 @st.cache_resource
@@ -0,0 +1,303 @@
+"""
+Genie Client Utility - Cached, coalesced questions to the fraud Genie space
+
+Fraud Insights, FraudAgent.query_genie and the example-question buttons used
+to start a new Genie conversation for every question, and each one costs
+10-60 seconds. GenieClient.ask() instead:
+
+- Serves repeated questions from a process-wide cache keyed on
+  (space ID, normalized question). Entries expire after GENIE_CACHE_TTL
+  seconds, and the whole cache is dropped when the fraud_analysis Delta
+  version changes (checked in the background every GENIE_CACHE_VERSION_CHECK
+  seconds), so answers never outlive the data they were computed from.
+- Coalesces concurrent identical questions. The first caller runs the
+  conversation and everyone else asking the same thing waits on that result
+  instead of starting their own.
+
+Only completed answers are cached; failures and timeouts are retried on the
+next ask.
+
+Conversations run on a background executor, so nothing blocks the Streamlit
+script thread. submit() returns a GenieRequest right away. Its status and
+partial answer (generated SQL, then the text) update while it runs, and the
+page polls it from a fragment. Polling backs off adaptively: it starts at
+GENIE_POLL_INITIAL seconds and grows 1.2x per poll up to GENIE_POLL_MAX.
+Once the message completes, its text and SQL are published on the request
+before the query-result attachment is fetched, so the page renders the
+answer while the rows are still loading.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.databricks_client import CATALOG, SCHEMA, get_workspace_client, get_query_metrics, run_query
+from utils.ttl_cache import VersionedTTLCache
+
+FRAUD_ANALYSIS_TABLE = f"{CATALOG}.{SCHEMA}.fraud_analysis"
+
+# Defaults can be overridden via app_env in config.yaml
+GENIE_CACHE_TTL = float(os.getenv("GENIE_CACHE_TTL", "900"))
+GENIE_CACHE_VERSION_CHECK = float(os.getenv("GENIE_CACHE_VERSION_CHECK", "60"))
+GENIE_CACHE_MAX_ENTRIES = int(os.getenv("GENIE_CACHE_MAX_ENTRIES", "256"))
+GENIE_TIMEOUT = float(os.getenv("GENIE_TIMEOUT", "60"))
+GENIE_POLL_INITIAL = float(os.getenv("GENIE_POLL_INITIAL", "1.0"))
+GENIE_POLL_MAX = float(os.getenv("GENIE_POLL_MAX", "10"))
+GENIE_POLL_GROWTH = 1.2
+GENIE_MAX_WORKERS = int(os.getenv("GENIE_MAX_WORKERS", "8"))
+
+STATUS_COMPLETED = "COMPLETED"
+STATUS_FAILED = "FAILED"
+STATUS_CANCELLED = "CANCELLED"
+STATUS_TIMEOUT = "TIMEOUT"
+
+# Genie message statuses as shown while a question is pending
+GENIE_STATUS_LABELS = {
+    "SUBMITTED": "Submitted",
+    "FETCHING_METADATA": "Reading table metadata",
+    "FILTERING_CONTEXT": "Finding relevant tables",
+    "ASKING_AI": "Writing SQL",
+    "PENDING_WAREHOUSE": "Waiting for the SQL warehouse",
+    "EXECUTING_QUERY": "Running the query",
+    "FETCHING_RESULTS": "Fetching result rows",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class GenieError(RuntimeError):
+    """The Genie API could not start or read a conversation"""
+
+
+def normalize_question(question) -> str:
+    """Lower-case, whitespace-collapsed question without trailing punctuation"""
+    return _WHITESPACE.sub(" ", str(question or "")).strip().lower().rstrip("?.! ")
+
+
+def genie_cache_key(space_id, question) -> str:
+    """Cache key for one Genie question"""
+    payload = json.dumps([space_id, normalize_question(question)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def table_version(table=FRAUD_ANALYSIS_TABLE):
+    """Current Delta version of a table (None if it has no history yet)"""
+    rows = run_query(f"DESCRIBE HISTORY {table} LIMIT 1", label="table_version", retries=0)
+    return rows[0][0] if rows else None
+
+
+def parse_statement_response(statement_response):
+    """(column names, rows) from a Genie query-result statement_response"""
+    columns = statement_response.get('manifest', {}).get('schema', {}).get('columns', [])
+    rows = statement_response.get('result', {}).get('data_array', []) or []
+    return [col.get('name') for col in columns], rows
+
+
+class GenieRequest:
+    """Handle for one question running (or answered) in the background"""
+
+    coalesced = False
+
+    def __init__(self, question):
+        self.question = question
+        self.started_at = time.time()
+        self.status = "SUBMITTED"
+        self.partial = {"text": "", "sql": ""}
+        self.polls = 0
+        self._future = Future()
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.started_at
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self, timeout=None) -> dict:
+        """Final answer dict (see GenieClient.ask); raises if the conversation failed to start"""
+        return dict(self._future.result(timeout=timeout), coalesced=self.coalesced)
+
+    @classmethod
+    def completed(cls, question, result):
+        request = cls(question)
+        request.status = result["status"]
+        request.partial = {"text": result["text"], "sql": result["sql"]}
+        request._future.set_result(result)
+        return request
+
+
+class _JoinedRequest:
+    """A second caller's view of an identical request that is already running"""
+
+    coalesced = True
+
+    def __init__(self, running):
+        self._running = running
+
+    def __getattr__(self, name):
+        return getattr(self._running, name)
+
+    def result(self, timeout=None) -> dict:
+        return dict(self._running._future.result(timeout=timeout), coalesced=True)
+
+
+def _extract_attachments(message):
+    """(text, sql, query attachment_id) across all of a message's attachments"""
+    text, sql, attachment_id = "", "", None
+    for attachment in message.get('attachments', []) or []:
+        text = text or attachment.get('text', {}).get('content', '')
+        query = attachment.get('query') or {}
+        if query and not sql:
+            sql = query.get('query', '')
+            attachment_id = query.get('attachment_id') or attachment.get('attachment_id')
+    return text, sql, attachment_id
+
+
+class GenieClient:
+    """Genie conversations for one space, with a shared answer cache and in-flight coalescing"""
+
+    def __init__(self, space_id, w=None, ttl_seconds=GENIE_CACHE_TTL, max_entries=GENIE_CACHE_MAX_ENTRIES,
+                 version_check_seconds=GENIE_CACHE_VERSION_CHECK, version_fn=table_version,
+                 timeout=GENIE_TIMEOUT):
+        self.space_id = space_id
+        self.w = w or get_workspace_client()
+        self.timeout = timeout
+        # Same LRU + TTL + version-invalidation cache as vector search, versioned on fraud_analysis
+        self.cache = VersionedTTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries,
+                                       version_check_seconds=version_check_seconds, version_fn=version_fn)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._coalesced = 0
+        self._executor = ThreadPoolExecutor(max_workers=GENIE_MAX_WORKERS, thread_name_prefix="genie")
+
+    def _path(self, suffix=""):
+        return f"/api/2.0/genie/spaces/{self.space_id}{suffix}"
+
+    def _run(self, request) -> dict:
+        """Start a conversation, poll with adaptive backoff and fetch its query result"""
+        start_response = self.w.api_client.do('POST', self._path('/start-conversation'),
+                                              body={'content': request.question})
+        conversation_id = start_response.get('conversation_id')
+        message_id = start_response.get('message_id')
+        if not conversation_id or not message_id:
+            raise GenieError("Failed to start Genie conversation")
+
+        message_path = self._path(f'/conversations/{conversation_id}/messages/{message_id}')
+        result = {"status": STATUS_TIMEOUT, "text": "", "sql": "", "columns": [], "rows": [], "error": None,
+                  "conversation_id": conversation_id, "message_id": message_id}
+        interval = GENIE_POLL_INITIAL
+
+        while request.elapsed < self.timeout:
+            time.sleep(min(interval, max(self.timeout - request.elapsed, 0)))
+            interval = min(interval * GENIE_POLL_GROWTH, GENIE_POLL_MAX)
+            request.polls += 1
+            try:
+                message = self.w.api_client.do('GET', message_path)
+            except Exception:
+                continue  # Transient poll error - try again after the next backoff
+            status = message.get('status') or request.status
+            request.status = status
+
+            text, sql, attachment_id = _extract_attachments(message)
+            request.partial = {"text": text, "sql": sql}
+            if status == STATUS_FAILED:
+                result.update(status=STATUS_FAILED, error=str(message.get('error', {})))
+                break
+            if status == STATUS_CANCELLED:
+                result.update(status=STATUS_CANCELLED)
+                break
+            if status != STATUS_COMPLETED:
+                continue
+
+            # Rows come from a second endpoint - the text is already visible via request.partial
+            result.update(status=STATUS_COMPLETED, text=text, sql=sql)
+            if sql and attachment_id:
+                request.status = "FETCHING_RESULTS"
+                try:
+                    query_result = self.w.api_client.do('GET', f"{message_path}/query-result/{attachment_id}")
+                    result["columns"], result["rows"] = parse_statement_response(
+                        query_result.get('statement_response', {})
+                    )
+                except Exception as e:
+                    result["error"] = f"Could not fetch query results: {e}"
+                request.status = STATUS_COMPLETED
+            break
+
+        result["elapsed"] = request.elapsed
+        return result
+
+    def _execute(self, request, key):
+        """Executor task: run the conversation and settle everyone waiting on it"""
+        try:
+            result = self._run(request)
+            if result["status"] == STATUS_COMPLETED and not result["error"]:
+                self.cache.put(key, result)
+            request._future.set_result(dict(result, cached=False))
+            get_query_metrics().record("genie", request.elapsed, ok=result["status"] == STATUS_COMPLETED)
+        except Exception as e:
+            request.status = "ERROR"
+            request._future.set_exception(e)
+            get_query_metrics().record("genie", request.elapsed, ok=False)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def submit(self, question, use_cache=True) -> GenieRequest:
+        """
+        Start answering a question in the background and return immediately.
+
+        Cache hits come back already done. An identical question that is
+        already running is joined rather than started again.
+        """
+        key = genie_cache_key(self.space_id, question)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return GenieRequest.completed(question, dict(cached, cached=True))
+
+        with self._lock:
+            running = self._inflight.get(key)
+            if running is not None:
+                self._coalesced += 1
+                return _JoinedRequest(running)
+            request = GenieRequest(question)
+            self._inflight[key] = request
+
+        self._executor.submit(self._execute, request, key)
+        return request
+
+    def ask(self, question, use_cache=True) -> dict:
+        """
+        Answer a question, blocking until done (for tools and notebooks).
+
+        Returns:
+            dict with status, text, sql, columns, rows, error, elapsed and
+            cached / coalesced flags
+
+        Raises:
+            GenieError if the conversation could not be started
+        """
+        return self.submit(question, use_cache=use_cache).result(timeout=self.timeout + 30)
+
+    def stats(self) -> dict:
+        """Cache stats plus coalesced and in-flight counts"""
+        stats = self.cache.stats()
+        with self._lock:
+            stats["coalesced"] = self._coalesced
+            stats["in_flight"] = len(self._inflight)
+        return stats
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_genie_client(space_id, w=None) -> GenieClient:
+    """Process-wide GenieClient for a space, shared by all sessions and FraudAgent"""
+    with _clients_lock:
+        if space_id not in _clients:
+            _clients[space_id] = GenieClient(space_id, w=w)
+        return _clients[space_id]
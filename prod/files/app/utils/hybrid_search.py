@@ -0,0 +1,222 @@
+"""
+Hybrid Search Utility - Keyword (BM25) + vector ranking with calibrated scores
+
+Case Search used to show 100, 90, 80... by rank position. hybrid_search()
+instead blends two real signals for each knowledge base chunk:
+
+- vector: the similarity score the Vector Search index returns (0-1); the
+  local mirror (LOCAL_VECTOR_INDEX) reports the same scale
+- keyword: BM25 over the chunk content plus its `keywords` column (computed by
+  extract_keywords in setup/06a_chunk_knowledge_base.py, counted twice),
+  mapped to 0-1 with s / (s + BM25_SATURATION)
+
+Candidates come from both retrievers. They are fused either by a weighted sum
+of the two calibrated scores (default, so the score shown is the one used to
+rank) or by reciprocal rank fusion. The result's `similarity` is 0-100.
+
+The BM25 corpus is loaded from fraud_cases_kb once and reloaded when the
+table's Delta version changes.
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from collections import Counter
+from utils.databricks_client import run_query
+from utils.vector_search import (
+    VECTOR_INDEX, KNOWLEDGE_BASE_TABLE, DEFAULT_COLUMNS, VECTOR_CACHE_VERSION_CHECK,
+    query_index, kb_table_version
+)
+
+# Defaults can be overridden via app_env in config.yaml
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.6"))
+BM25_SATURATION = float(os.getenv("BM25_SATURATION", "6.0"))
+RRF_K = 60
+
+FUSION_WEIGHTED = "weighted"
+FUSION_RRF = "rrf"
+
+# Same stop words as extract_keywords (plus short function words)
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been',
+    'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'should', 'could', 'may', 'might', 'must', 'can', 'this', 'that',
+    'these', 'those', 'not', 'what', 'which', 'who', 'when', 'where', 'why', 'how',
+    'fraud', 'claim', 'claims', 'detection', 'pattern', 'patterns', 'it', 'as', 'its'
+}
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lower-case word tokens without stop words"""
+    return [t for t in _TOKEN.findall(str(text or "").lower()) if t not in STOP_WORDS and len(t) > 1]
+
+
+def doc_key(doc_id, content):
+    """Identity of one chunk (several chunks share a doc_id)"""
+    return (doc_id, (content or "")[:200])
+
+
+class BM25Index:
+    """Okapi BM25 over a small in-memory corpus"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """documents: list of token lists"""
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs = [Counter(tokens) for tokens in documents]
+        self.doc_lens = [len(tokens) for tokens in documents]
+        self.avg_len = (sum(self.doc_lens) / len(documents)) if documents else 0.0
+        df = Counter()
+        for freqs in self.doc_freqs:
+            df.update(freqs.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def score(self, query_tokens, i) -> float:
+        freqs = self.doc_freqs[i]
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lens[i] / (self.avg_len or 1.0))
+        total = 0.0
+        for term in set(query_tokens):
+            tf = freqs.get(term)
+            if tf:
+                total += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return total
+
+    def top(self, query_tokens, n):
+        """[(doc_position, score)] for the n best-scoring documents with score > 0"""
+        scored = [(i, self.score(query_tokens, i)) for i in range(len(self.doc_freqs))]
+        scored = [item for item in scored if item[1] > 0]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:n]
+
+
+class KeywordCorpus:
+    """BM25 index over fraud_cases_kb, reloaded when the Delta version changes"""
+
+    def __init__(self, kb_table=KNOWLEDGE_BASE_TABLE, version_check_seconds=VECTOR_CACHE_VERSION_CHECK):
+        self.kb_table = kb_table
+        self.version_check_seconds = version_check_seconds
+        self.rows = []
+        self.positions = {}
+        self.bm25 = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, version):
+        rows = run_query(
+            f"SELECT {', '.join(DEFAULT_COLUMNS)}, keywords FROM {self.kb_table}", label="kb_keywords"
+        )
+        self.rows = [list(row) for row in rows]
+        # Keywords are the chunk's most frequent terms - count them twice
+        documents = [
+            tokenize(row[3]) + 2 * tokenize(" ".join(list(row[4]) if row[4] is not None else []))
+            for row in self.rows
+        ]
+        self.bm25 = BM25Index(documents)
+        self.positions = {doc_key(row[0], row[3]): i for i, row in enumerate(self.rows)}
+        self._version = version
+
+    def ensure_loaded(self):
+        with self._lock:
+            # Also throttles retries after a failed load - callers rank on vector scores meanwhile
+            if time.time() - self._checked_at < self.version_check_seconds:
+                return
+            self._checked_at = time.time()
+            try:
+                version = kb_table_version(self.kb_table)
+            except Exception:
+                version = self._version
+            if self.bm25 is None or version != self._version:
+                self._load(version)
+
+
+_corpus = None
+_corpus_lock = threading.Lock()
+
+
+def get_keyword_corpus() -> KeywordCorpus:
+    """Process-wide BM25 corpus shared by all sessions"""
+    global _corpus
+    with _corpus_lock:
+        if _corpus is None:
+            _corpus = KeywordCorpus()
+        return _corpus
+
+
+def calibrate_bm25(score) -> float:
+    """Map an unbounded BM25 score to 0-1 (BM25_SATURATION maps to 0.5)"""
+    return score / (score + BM25_SATURATION) if score > 0 else 0.0
+
+
+def hybrid_search(query_text, num_results=3, candidates=None, vector_weight=HYBRID_VECTOR_WEIGHT,
+                  fusion=FUSION_WEIGHTED, index_name=VECTOR_INDEX, w=None):
+    """
+    Rank knowledge base chunks by blended keyword and vector relevance.
+
+    Returns:
+        list of dicts with doc_id, doc_type, title, content, similarity (0-100),
+        vector_score and keyword_score (0-1), best first
+    """
+    candidates = candidates or max(num_results * 3, 10)
+
+    # Vector rows carry the similarity score after the requested columns
+    vector_rows = query_index(query_text, columns=DEFAULT_COLUMNS, num_results=candidates,
+                              index_name=index_name, w=w)
+    results = {}
+    for rank, row in enumerate(vector_rows):
+        score = float(row[len(DEFAULT_COLUMNS)]) if len(row) > len(DEFAULT_COLUMNS) else 0.0
+        key = doc_key(row[0], row[3])
+        results[key] = {"row": row[:len(DEFAULT_COLUMNS)], "vector_score": min(max(score, 0.0), 1.0),
+                        "vector_rank": rank, "keyword_score": 0.0, "keyword_rank": None}
+
+    query_tokens = tokenize(query_text)
+    try:
+        corpus = get_keyword_corpus()
+        corpus.ensure_loaded()
+    except Exception:
+        corpus = None  # Keyword side unavailable - rank on vector scores alone
+
+    if corpus is not None and corpus.bm25 is not None and query_tokens:
+        for rank, (i, raw) in enumerate(corpus.bm25.top(query_tokens, candidates)):
+            row = corpus.rows[i]
+            key = doc_key(row[0], row[3])
+            entry = results.setdefault(key, {
+                "row": row[:len(DEFAULT_COLUMNS)], "vector_score": None, "vector_rank": None
+            })
+            entry["keyword_score"] = calibrate_bm25(raw)
+            entry["keyword_rank"] = rank
+        for key, entry in results.items():
+            if entry["keyword_rank"] is None and key in corpus.positions:
+                entry["keyword_score"] = calibrate_bm25(corpus.bm25.score(query_tokens, corpus.positions[key]))
+
+    # Keyword-only candidates were not in the vector top-k: assume no better than the weakest vector hit
+    vector_floor = min((e["vector_score"] for e in results.values() if e["vector_score"] is not None), default=0.0)
+    for entry in results.values():
+        if entry["vector_score"] is None:
+            entry["vector_score"] = vector_floor
+        entry["similarity"] = 100 * (vector_weight * entry["vector_score"] +
+                                     (1 - vector_weight) * entry["keyword_score"])
+        if fusion == FUSION_RRF:
+            entry["fused"] = sum(1.0 / (RRF_K + r + 1) for r in (entry.get("vector_rank"), entry.get("keyword_rank"))
+                                 if r is not None)
+        else:
+            entry["fused"] = entry["similarity"]
+
+    ranked = sorted(results.values(), key=lambda e: e["fused"], reverse=True)[:num_results]
+    return [
+        {
+            "doc_id": e["row"][0],
+            "doc_type": e["row"][1],
+            "title": e["row"][2],
+            "content": e["row"][3],
+            "similarity": round(e["similarity"], 1),
+            "vector_score": round(e["vector_score"], 3),
+            "keyword_score": round(e["keyword_score"], 3),
+        }
+        for e in ranked
+    ]
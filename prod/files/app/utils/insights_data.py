@@ -0,0 +1,209 @@
+"""
+Insights Data Utility - One concurrent load for the Fraud Insights dashboard
+
+The dashboard used to run its KPI, fraud type, red flag and trend queries one
+after another, each behind its own st.cache_data entry, so a cold page load
+took the sum of the four query times and the sections could expire and show
+data from different moments. load_insights() instead submits all four queries
+at once on the pooled SQL connections and returns a single InsightsBundle:
+
+- stats: KPI dict (total_claims, fraud_cases, fraud_rate, avg_risk_score)
+- fraud_types / indicators / trends: DataFrames ready for the charts
+- errors: query name -> exception text for any query that failed
+
+get_insights() caches the whole bundle as one entry in the shared cache
+(utils/shared_cache.py), so app restarts and other replicas start warm and an
+expired bundle is refreshed in the background while the old one is shown.
+Bundles are stored as JSON (stats, errors, timings) with each DataFrame as
+an Arrow IPC stream - see InsightsBundle.dumps / loads.
+render_refresh_control() clears it for every section at once. A bundle with
+errors is not kept, so a transient failure is retried on the next rerun.
+
+All queries read the aggregate tables maintained by
+setup/11_refresh_insights_aggregates.py.
+"""
+
+import os
+import json
+import time
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import streamlit as st
+from utils.databricks_client import CATALOG, SCHEMA, SQL_POOL_SIZE, run_query
+from utils.shared_cache import shared_cached, get_shared_data_cache
+from utils.arrow_results import dataframe_to_ipc, ipc_to_dataframe
+
+# Pre-aggregated by setup/11_refresh_insights_aggregates.py - the dashboard never scans fraud_analysis
+INSIGHTS_DAILY_TABLE = f"{CATALOG}.{SCHEMA}.fraud_insights_daily"
+INSIGHTS_BY_TYPE_TABLE = f"{CATALOG}.{SCHEMA}.fraud_insights_by_type"
+INSIGHTS_INDICATORS_TABLE = f"{CATALOG}.{SCHEMA}.fraud_insights_indicators"
+
+# Defaults can be overridden via app_env in config.yaml
+INSIGHTS_CACHE_TTL = int(os.getenv("INSIGHTS_CACHE_TTL", "300"))
+
+# name -> (label for latency metrics, SQL)
+INSIGHTS_QUERIES = {
+    "stats": ("fraud_statistics", f"""
+        SELECT
+            SUM(total_claims) as total_claims,
+            SUM(fraud_cases) as fraud_cases,
+            ROUND(SUM(fraud_cases) * 100.0 / NULLIF(SUM(total_claims), 0), 2) as fraud_rate,
+            ROUND(SUM(risk_score_sum) / NULLIF(SUM(risk_score_count), 0), 2) as avg_risk_score
+        FROM {INSIGHTS_DAILY_TABLE}
+    """),
+    "fraud_types": ("fraud_by_type", f"""
+        SELECT fraud_type, fraud_cases
+        FROM {INSIGHTS_BY_TYPE_TABLE}
+        WHERE fraud_cases > 0
+        ORDER BY fraud_cases DESC
+    """),
+    "indicators": ("top_indicators", f"""
+        SELECT indicator, occurrences
+        FROM {INSIGHTS_INDICATORS_TABLE}
+        WHERE occurrences > 0
+        ORDER BY occurrences DESC
+        LIMIT 10
+    """),
+    "trends": ("fraud_trends", f"""
+        SELECT analysis_date, total_claims, fraud_cases
+        FROM {INSIGHTS_DAILY_TABLE}
+        WHERE total_claims > 0
+        ORDER BY analysis_date
+    """),
+}
+
+# Chart column names per DataFrame query
+INSIGHTS_COLUMNS = {
+    "fraud_types": ["Fraud Type", "Count"],
+    "indicators": ["Indicator", "Count"],
+    "trends": ["Date", "Total Claims", "Fraud Cases"],
+}
+FRAME_SECTIONS = tuple(INSIGHTS_COLUMNS)
+
+# One worker per query, but never more than the pool can serve at once
+_executor = ThreadPoolExecutor(max_workers=max(1, min(len(INSIGHTS_QUERIES), SQL_POOL_SIZE)),
+                               thread_name_prefix="insights")
+
+
+class InsightsBundle:
+    """Everything the Fraud Insights dashboard shows, loaded together"""
+
+    def __init__(self, stats: dict = None, fraud_types: pd.DataFrame = None, indicators: pd.DataFrame = None,
+                 trends: pd.DataFrame = None, errors: dict = None, elapsed: float = 0.0,
+                 query_seconds: dict = None):
+        self.stats = stats
+        self.fraud_types = fraud_types
+        self.indicators = indicators
+        self.trends = trends
+        self.errors = errors or {}
+        self.elapsed = elapsed
+        self.query_seconds = query_seconds or {}
+        self.loaded_at = time.time()
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def dumps(self) -> bytes:
+        """Shared cache encoding: JSON, with each DataFrame as a base64 Arrow IPC stream"""
+        payload = {
+            "stats": self.stats,
+            "errors": self.errors,
+            "elapsed": self.elapsed,
+            "query_seconds": self.query_seconds,
+            "loaded_at": self.loaded_at,
+            "frames": {
+                name: base64.b64encode(dataframe_to_ipc(getattr(self, name))).decode("ascii")
+                for name in FRAME_SECTIONS if getattr(self, name) is not None
+            },
+        }
+        return json.dumps(payload, default=_json_scalar).encode("utf-8")
+
+    @classmethod
+    def loads(cls, data: bytes) -> "InsightsBundle":
+        """Inverse of dumps()"""
+        payload = json.loads(data.decode("utf-8"))
+        frames = {name: ipc_to_dataframe(base64.b64decode(encoded))
+                  for name, encoded in payload.get("frames", {}).items()}
+        bundle = cls(stats=payload["stats"], errors=payload["errors"], elapsed=payload["elapsed"],
+                     query_seconds=payload["query_seconds"], **frames)
+        bundle.loaded_at = payload["loaded_at"]
+        return bundle
+
+
+def _json_scalar(value):
+    """Decimal / NumPy values from query results as JSON numbers"""
+    return value.item() if hasattr(value, "item") else float(value)
+
+
+def _parse_stats(rows):
+    if not rows:
+        return None
+    result = rows[0]
+    return {
+        "total_claims": result[0] or 0,
+        "fraud_cases": result[1] or 0,
+        "fraud_rate": result[2] or 0.0,
+        "avg_risk_score": result[3] or 0.0
+    }
+
+
+def _timed_query(label, query):
+    start = time.time()
+    rows = run_query(query, label=label)
+    return rows, time.time() - start
+
+
+def load_insights() -> InsightsBundle:
+    """
+    Run all dashboard queries concurrently and collect them into one bundle.
+
+    A failing query leaves its section empty and its error in bundle.errors;
+    the other sections still load.
+    """
+    start = time.time()
+    futures = {
+        name: _executor.submit(_timed_query, label, query)
+        for name, (label, query) in INSIGHTS_QUERIES.items()
+    }
+
+    sections, errors, query_seconds = {}, {}, {}
+    for name, future in futures.items():
+        try:
+            rows, seconds = future.result()
+        except Exception as e:
+            errors[name] = str(e)
+            continue
+        query_seconds[name] = seconds
+        if name == "stats":
+            sections[name] = _parse_stats(rows)
+        elif rows:
+            sections[name] = pd.DataFrame([tuple(r) for r in rows], columns=INSIGHTS_COLUMNS[name])
+
+    return InsightsBundle(errors=errors, elapsed=time.time() - start, query_seconds=query_seconds, **sections)
+
+
+@shared_cached("fraud_insights", ttl=INSIGHTS_CACHE_TTL, cacheable=lambda bundle: bundle.ok,
+               dumps=InsightsBundle.dumps, loads=InsightsBundle.loads)
+def get_insights() -> InsightsBundle:
+    """Dashboard bundle, cached as one unit (bundles with failed queries are not kept)"""
+    return load_insights()
+
+
+def render_refresh_control(bundle: InsightsBundle):
+    """Last-updated caption plus one refresh button for every dashboard section"""
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        age = max(0, int(time.time() - bundle.loaded_at))
+        slowest = max(bundle.query_seconds.values(), default=0.0)
+        stats = get_shared_data_cache().stats()
+        st.caption(
+            f"🕒 Updated {age}s ago • loaded {len(INSIGHTS_QUERIES)} queries in {bundle.elapsed:.2f}s "
+            f"(slowest {slowest:.2f}s) • refreshes every {INSIGHTS_CACHE_TTL // 60} minutes "
+            f"• {stats['backend']} cache"
+        )
+    with col2:
+        if st.button("🔄 Refresh", key="insights_refresh", use_container_width=True):
+            get_insights.clear()
+            st.rerun()
@@ -0,0 +1,298 @@
+"""
+LLM Result Cache - Content-addressed cache for the UC AI functions
+
+fraud_classify, fraud_extract_indicators and fraud_generate_explanation each
+run a full AI_QUERY. Results are cached under
+
+    sha2('function_name|function_version|normalized_arg_1|...', 256)
+
+where function_version is a hash of the function's SQL body (so editing a
+prompt in setup/03-05 invalidates old entries) and arguments are
+whitespace-normalized. Two tiers:
+
+- In-process LRU shared by every page and FraudAgent in the app process
+- Durable Delta table (llm_result_cache) shared with 09_batch_analyze_claims
+
+The key is also available as a SQL expression (cache_key_sql) so the batch
+notebook can join against the Delta tier without leaving Spark.
+"""
+
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from databricks.sdk.service.sql import StatementParameterListItem
+from utils.result_writer import merge_rows
+from utils.statement_runner import StatementRunner
+
+CACHE_TABLE_NAME = "llm_result_cache"
+CACHED_FUNCTIONS = ("fraud_classify", "fraud_extract_indicators", "fraud_generate_explanation",
+                    "fraud_analyze_full")
+
+# Rough per-call cost of one AI_QUERY (same estimate as the Claim Analysis page)
+EST_COST_PER_CALL = 0.0005
+
+# Lookups sit in front of an AI call, so they give up sooner than DDL and writes
+LOOKUP_TIMEOUT = 30.0
+STATEMENT_TIMEOUT = 120.0
+
+# Same character set as Java's \s so Python and Spark SQL keys agree
+_WHITESPACE = re.compile(r"[ \t\n\x0b\f\r]+")
+
+
+def normalize_arg(value) -> str:
+    """Normalize one function argument for hashing"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return _WHITESPACE.sub(" ", str(value)).strip(" ")
+
+
+def cache_key(function_name, function_version, args) -> str:
+    """Content-addressed key for a UC function call"""
+    parts = [function_name, function_version] + [normalize_arg(a) for a in args]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def cache_key_sql(function_name, function_version, arg_exprs) -> str:
+    """
+    SQL expression that computes cache_key() inside Spark / Databricks SQL.
+
+    Args:
+        arg_exprs: list of (sql_expression, kind) where kind is 'string' or 'boolean'
+    """
+    parts = [f"'{function_name}'", f"'{function_version}'"]
+    for expr, kind in arg_exprs:
+        if kind == "boolean":
+            parts.append(f"CASE WHEN {expr} THEN 'true' WHEN NOT {expr} THEN 'false' ELSE '' END")
+        else:
+            parts.append(f"TRIM(REGEXP_REPLACE(COALESCE(CAST({expr} AS STRING), ''), '[ \\\\t\\\\n\\\\x0B\\\\f\\\\r]+', ' '))")
+    return f"SHA2(CONCAT_WS('|', {', '.join(parts)}), 256)"
+
+
+def cache_table_ddl(table_name) -> str:
+    """DDL for the durable cache tier"""
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        cache_key STRING NOT NULL,
+        function_name STRING,
+        function_version STRING,
+        result_json STRING,
+        created_at TIMESTAMP
+    )
+    USING DELTA
+    COMMENT 'Content-addressed cache of UC AI function results'
+    """
+
+
+def function_versions_sql(catalog, schema) -> str:
+    """Query returning (function_name, version) for the cached UC functions"""
+    names = ", ".join(f"'{fn}'" for fn in CACHED_FUNCTIONS)
+    return f"""
+    SELECT routine_name, SUBSTRING(SHA2(routine_definition, 256), 1, 16) AS version
+    FROM {catalog}.information_schema.routines
+    WHERE routine_schema = '{schema}' AND routine_name IN ({names})
+    """
+
+
+class LLMResultCache:
+    """Two-tier (LRU + Delta) cache for UC AI function results"""
+
+    def __init__(self, w, warehouse_id, catalog, schema, max_entries=2048,
+                 version_ttl_seconds=600, cost_per_call=EST_COST_PER_CALL):
+        self.w = w
+        self.warehouse_id = warehouse_id
+        self.catalog = catalog
+        self.schema = schema
+        self.table_name = f"{catalog}.{schema}.{CACHE_TABLE_NAME}"
+        self.max_entries = max_entries
+        self.version_ttl_seconds = version_ttl_seconds
+        self.cost_per_call = cost_per_call
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._versions_loaded_at = 0.0
+        self._table_ready = False
+        self._runner = StatementRunner(w, warehouse_id, max_in_flight=2, default_timeout=STATEMENT_TIMEOUT)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache-writer")
+        self._stats = {"memory_hits": 0, "delta_hits": 0, "misses": 0, "delta_errors": 0}
+
+    # ----- statement helpers -----
+
+    def _execute(self, statement, parameters=None, timeout=None):
+        """Rows of a finished statement; raises StatementFailed / StatementTimeout otherwise"""
+        return self._runner.fetch_rows(self._runner.run(statement, parameters, timeout=timeout))
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            self._execute(cache_table_ddl(self.table_name))
+            # Only once the CREATE succeeded - a failed one is retried by the next lookup or write
+            self._table_ready = True
+
+    # ----- versions -----
+
+    def function_version(self, function_name) -> str:
+        """Hash of the function's current SQL body, refreshed every version_ttl_seconds"""
+        if time.time() - self._versions_loaded_at > self.version_ttl_seconds:
+            try:
+                rows = self._execute(function_versions_sql(self.catalog, self.schema), timeout=LOOKUP_TIMEOUT)
+                self._versions = {row[0]: row[1] for row in rows}
+            except Exception:
+                pass
+            self._versions_loaded_at = time.time()
+        return self._versions.get(function_name, "v0")
+
+    # ----- LRU tier -----
+
+    def _lru_get(self, key):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+        return None
+
+    def _lru_put(self, key, value):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    # ----- Delta tier -----
+
+    def _delta_get_many(self, keys):
+        if not keys:
+            return {}
+        try:
+            self._ensure_table()
+            markers = ", ".join(f":k{i}" for i in range(len(keys)))
+            rows = self._execute(
+                f"SELECT cache_key, result_json FROM {self.table_name} WHERE cache_key IN ({markers})",
+                [StatementParameterListItem(name=f"k{i}", value=key) for i, key in enumerate(keys)],
+                timeout=LOOKUP_TIMEOUT
+            )
+            return {row[0]: json.loads(row[1]) for row in rows if row[1]}
+        except Exception:
+            # Counted apart from misses so a failing Delta tier shows up in stats()
+            self._count("delta_errors")
+            return {}
+
+    def _delta_put(self, entries):
+        """entries: list of (cache_key, function_name, function_version, result)"""
+        try:
+            self._ensure_table()
+            merge_rows(
+                self.w, self.warehouse_id, self.table_name,
+                [
+                    {"cache_key": key, "function_name": fn, "function_version": version,
+                     "result_json": json.dumps(result)}
+                    for key, fn, version, result in entries
+                ],
+                columns=[("cache_key", "STRING"), ("function_name", "STRING"),
+                         ("function_version", "STRING"), ("result_json", "STRING")],
+                key="cache_key",
+                extra_columns=[("created_at", "current_timestamp()")],
+                runner=self._runner
+            )
+        except Exception:
+            # The durable tier is best-effort; the LRU still holds the result
+            self._count("delta_errors")
+
+    # ----- public API -----
+
+    def get_or_call(self, function_name, args, call_fn):
+        """Return the cached result for function_name(*args), calling call_fn() on a miss"""
+        key = cache_key(function_name, self.function_version(function_name), args)
+
+        result = self._lru_get(key)
+        if result is not None:
+            self._count("memory_hits")
+            return result
+
+        result = self._delta_get_many([key]).get(key)
+        if result is not None:
+            self._count("delta_hits")
+            self._lru_put(key, result)
+            return result
+
+        self._count("misses")
+        result = call_fn()
+        if result is not None and not (isinstance(result, dict) and "error" in result):
+            self.put(function_name, args, result)
+        return result
+
+    def get_many(self, function_name, args_list):
+        """Look up many calls at once; returns {index: result} for the hits only"""
+        version = self.function_version(function_name)
+        keys = [cache_key(function_name, version, args) for args in args_list]
+
+        found = {}
+        missing = []
+        for i, key in enumerate(keys):
+            result = self._lru_get(key)
+            if result is not None:
+                found[i] = result
+                self._count("memory_hits")
+            else:
+                missing.append(i)
+
+        delta = self._delta_get_many([keys[i] for i in missing])
+        for i in missing:
+            result = delta.get(keys[i])
+            if result is not None:
+                found[i] = result
+                self._lru_put(keys[i], result)
+                self._count("delta_hits")
+            else:
+                self._count("misses")
+        return found
+
+    def put(self, function_name, args, result):
+        """Store a fresh result in both tiers (Delta write happens in the background)"""
+        self.put_many(function_name, [(args, result)])
+
+    def put_many(self, function_name, items):
+        """items: list of (args, result)"""
+        version = self.function_version(function_name)
+        entries = []
+        for args, result in items:
+            if result is None:
+                continue
+            key = cache_key(function_name, version, args)
+            self._lru_put(key, result)
+            entries.append((key, function_name, version, result))
+        if entries:
+            self._writer.submit(self._delta_put, entries)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        """Hit counts, hit rate and estimated AI_QUERY cost saved"""
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats["memory_hits"] + stats["delta_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["cost_saved"] = hits * self.cost_per_call
+        stats["entries"] = len(self._lru)
+        return stats
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache(w, warehouse_id, catalog, schema) -> LLMResultCache:
+    """Process-wide cache instance shared by all pages and FraudAgent"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMResultCache(w, warehouse_id, catalog, schema)
+        return _shared_cache
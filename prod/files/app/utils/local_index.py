@@ -0,0 +1,228 @@
+"""
+Local Index Utility - In-process nearest-neighbour mirror of the fraud knowledge base
+
+The knowledge base (fraud_cases_kb) is a few hundred chunks, so every remote
+vector search spends most of its 200-800ms on the network. LocalIndexMirror
+keeps a copy of the chunk embeddings in memory:
+
+- LocalVectorIndex: exact cosine search over a normalized NumPy matrix, or an
+  HNSW graph (hnswlib, if installed) once the corpus passes hnsw_threshold.
+  Scores are reported on the Vector Search endpoint's scale (see endpoint_score)
+  so local and remote results rank and display alike
+- LocalIndexMirror: builds the index from injected loader / embedder /
+  version functions, checks the Delta version and rebuilds in a background
+  thread, and returns None while stale so callers fall back to the remote index
+
+Nothing here talks to Databricks directly - utils/vector_search wires in the
+real loader and embedding endpoint. This module also runs against a
+synthetic corpus with no network.
+"""
+
+import time
+import threading
+import numpy as np
+
+try:
+    import hnswlib
+    HNSW_AVAILABLE = True
+except ImportError:
+    hnswlib = None
+    HNSW_AVAILABLE = False
+
+DEFAULT_HNSW_THRESHOLD = 5000
+DEFAULT_VERSION_CHECK_SECONDS = 60.0
+
+
+def endpoint_score(cosine) -> float:
+    """
+    Cosine similarity on the Vector Search endpoint's scale.
+
+    The endpoint scores an L2 index as 1 / (1 + squared L2 distance); for
+    unit vectors the squared distance is 2 - 2 * cosine.
+    """
+    return 1.0 / (1.0 + max(2.0 - 2.0 * cosine, 0.0))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """Cosine-similarity search over an in-memory set of rows and embeddings"""
+
+    def __init__(self, columns, rows, embeddings, hnsw_threshold=DEFAULT_HNSW_THRESHOLD):
+        if len(rows) != len(embeddings):
+            raise ValueError(f"{len(rows)} rows but {len(embeddings)} embeddings")
+        self.columns = list(columns)
+        self.rows = [list(row) for row in rows]
+        self.matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32)) if len(rows) else \
+            np.zeros((0, 0), dtype=np.float32)
+        self.backend = "numpy"
+        self._hnsw = None
+        if HNSW_AVAILABLE and len(rows) >= hnsw_threshold:
+            self._hnsw = hnswlib.Index(space="cosine", dim=self.matrix.shape[1])
+            self._hnsw.init_index(max_elements=len(rows), ef_construction=200, M=16)
+            self._hnsw.add_items(self.matrix, np.arange(len(rows)))
+            self._hnsw.set_ef(64)
+            self.backend = "hnsw"
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search(self, query_vector, num_results=3, columns=None):
+        """
+        Top matches for one query embedding.
+
+        Returns:
+            list of rows (values for columns, then endpoint_score of the cosine
+            similarity) - the same shape and scale as a remote query's data_array
+        """
+        if not self.rows:
+            return []
+        columns = list(columns or self.columns)
+        positions = [self.columns.index(col) for col in columns]
+        k = min(num_results, len(self.rows))
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(query, k=k)
+            matches = [(int(i), 1.0 - float(d)) for i, d in zip(labels[0], distances[0])]
+        else:
+            scores = self.matrix @ query
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            matches = [(int(i), float(scores[i])) for i in top]
+
+        return [[self.rows[i][p] for p in positions] + [endpoint_score(score)] for i, score in matches]
+
+
+class LocalIndexMirror:
+    """
+    A LocalVectorIndex kept in sync with its source table.
+
+    Args:
+        load_rows: () -> (columns, rows) for every chunk
+        embed: (list of texts) -> list of vectors; used for chunks and queries
+        version: () -> token that changes when the source table changes
+        text_column: column whose text is embedded
+    """
+
+    def __init__(self, load_rows, embed, version, text_column="content",
+                 version_check_seconds=DEFAULT_VERSION_CHECK_SECONDS, hnsw_threshold=DEFAULT_HNSW_THRESHOLD):
+        self.load_rows = load_rows
+        self.embed = embed
+        self.version = version
+        self.text_column = text_column
+        self.version_check_seconds = version_check_seconds
+        self.hnsw_threshold = hnsw_threshold
+
+        self._index = None
+        self._index_version = None
+        self._latest_version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._stats = {"local_hits": 0, "fallbacks": 0, "refreshes": 0, "refresh_errors": 0}
+        self.last_refresh_seconds = None
+
+    def refresh(self):
+        """Rebuild the index from the source table (blocking)"""
+        started = time.time()
+        version = self.version()
+        columns, rows = self.load_rows()
+        text_pos = list(columns).index(self.text_column)
+        embeddings = self.embed([row[text_pos] or "" for row in rows]) if rows else []
+        index = LocalVectorIndex(columns, rows, embeddings, hnsw_threshold=self.hnsw_threshold)
+        with self._lock:
+            self._index = index
+            self._index_version = version
+            self._latest_version = version
+            self._checked_at = time.time()
+            self._stats["refreshes"] += 1
+        self.last_refresh_seconds = time.time() - started
+        return index
+
+    def _sync(self):
+        """Check the source version and rebuild if it moved (runs on the background thread)"""
+        latest = self.version()
+        with self._lock:
+            self._latest_version = latest
+            current = self._index is not None and latest == self._index_version
+        if not current:
+            self.refresh()
+
+    def _sync_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._sync()
+            except Exception:
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+            finally:
+                with self._lock:
+                    # A failed attempt also waits version_check_seconds before the next one
+                    self._checked_at = time.time()
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="local-index-refresh", daemon=True).start()
+
+    def is_fresh(self) -> bool:
+        """
+        True if the loaded index matches the last known source version.
+
+        Never blocks: every version_check_seconds the version check (and any
+        rebuild) starts on a background thread.
+        """
+        with self._lock:
+            due = not self._refreshing and time.time() - self._checked_at >= self.version_check_seconds
+            fresh = self._index is not None and self._latest_version == self._index_version
+        if due:
+            self._sync_in_background()
+        return fresh
+
+    def _usable_index(self, columns):
+        index = self._index
+        if not self.is_fresh() or index is None or any(c not in index.columns for c in (columns or [])):
+            self._count("fallbacks")
+            return None
+        return index
+
+    def search_vector(self, query_vector, num_results=3, columns=None):
+        """Local results for an embedding, or None if the caller should use the remote index"""
+        index = self._usable_index(columns)
+        if index is None:
+            return None
+        self._count("local_hits")
+        return index.search(query_vector, num_results, columns)
+
+    def search(self, query_text, num_results=3, columns=None):
+        """Local results for a text query, or None if the caller should use the remote index"""
+        index = self._usable_index(columns)
+        if index is None:
+            return None
+        self._count("local_hits")
+        return index.search(self.embed([query_text])[0], num_results, columns)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        """Size, backend, version and local-hit / fallback counts"""
+        with self._lock:
+            stats = dict(self._stats)
+            index = self._index
+            stats["version"] = self._index_version
+            stats["stale"] = self._latest_version != self._index_version
+        stats["entries"] = len(index) if index is not None else 0
+        stats["backend"] = index.backend if index is not None else None
+        stats["last_refresh_seconds"] = self.last_refresh_seconds
+        return stats
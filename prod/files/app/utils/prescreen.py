@@ -0,0 +1,353 @@
+"""
+Pre-screen Utility - Deterministic rules that decide obvious claims without an LLM call
+
+A claim is scored locally from:
+- Amount vs. the normal range for its claim type (same ranges as generate_claim
+  in setup/02_generate_sample_data.py). Type and amount are read from the claim
+  text when the columns are missing.
+- Fraud pattern / suspicious phrase keyword hits (FRAUD_PATTERNS)
+- Duplicate submissions (a later copy of the same normalized claim text in the batch)
+
+Claims scoring at or above the fraud threshold are decided FRAUD. Everything
+else goes to fraud_classify, unless the legit short-circuit is enabled
+(PRESCREEN_RULES_LEGIT, off by default): then a claim is decided LEGITIMATE
+only on a positive signal - an amount in the bottom LEGIT_AMOUNT_BAND of its
+type's normal range - with no red flags and none of the LEGIT_BLOCKING_TERMS
+that hint at a billing concern. A keyword miss is not certainty, so rule
+decisions report a confidence below 1.0. The decision_path value
+('rules_legit', 'rules_fraud' or 'llm') is stored with each result for audit.
+
+PreScreener.screen (Batch Processing page) and prescreen_sql (batch notebook)
+are generated from the same rule tables below and must decide the same way.
+"""
+
+import os
+import re
+
+# Thresholds can be overridden in app.yaml
+LEGIT_THRESHOLD = float(os.getenv("PRESCREEN_LEGIT_THRESHOLD", "0.0"))
+FRAUD_THRESHOLD = float(os.getenv("PRESCREEN_FRAUD_THRESHOLD", "0.7"))
+RULES_LEGIT = os.getenv("PRESCREEN_RULES_LEGIT", "false").lower() == "true"
+
+DECISION_LEGIT = "rules_legit"
+DECISION_FRAUD = "rules_fraud"
+DECISION_LLM = "llm"
+
+# Normal amount range per claim type (matched case-insensitively by substring, like generate_claim)
+AMOUNT_BASELINES = {
+    "Inpatient": (5000, 50000),
+    "Outpatient": (500, 5000),
+    "Prescription": (50, 2000),
+    "DME": (200, 10000),
+    "Home Health": (1000, 15000),
+}
+
+FRAUD_PATTERNS = {
+    "Upcoding": ["CPT code inflated", "billed higher complexity", "unwarranted level 5 visit"],
+    "Unbundling": ["separated bundled procedures", "multiple line items for bundled service"],
+    "Phantom": ["service never rendered", "patient denies receiving service"],
+    "Duplicate": ["duplicate billing", "same claim resubmitted", "double billing"],
+    "Unnecessary": ["medically unnecessary procedure", "excessive testing", "overutilization"],
+    "Kickback": ["illegal referral arrangement", "financial incentive for referral"],
+    "Identity": ["stolen patient ID", "deceased patient billed", "identity theft"],
+    "Prescription": ["pill mill pattern", "fake prescription", "controlled substance abuse"]
+}
+
+SUSPICIOUS_PHRASES = [
+    "diagnosis code mismatch with procedure",
+    "out-of-network provider high cost",
+    "multiple claims same day different facilities",
+    "unusual procedure combination",
+    "provider flagged in LEIE database",
+    "geographic anomaly patient-provider",
+    "NPI number suspicious activity"
+]
+
+# Words that do not score but keep a claim away from the legit short-circuit
+LEGIT_BLOCKING_TERMS = [
+    "cpt", "upcod", "complexity", "resubmit", "duplicate", "pattern", "similar",
+    "fraud", "suspicious", "flag", "investigat", "mismatch", "anomal", "unusual",
+    "excessive", "inflated", "referral", "denies", "deceased", "stolen", "never rendered"
+]
+
+# Legit only in the bottom quarter of the type's normal range (e.g. Outpatient $500-$1,625)
+LEGIT_AMOUNT_BAND = 0.25
+
+# Score contributions (the total is capped at 1.0)
+WEIGHT_AMOUNT_ABOVE_RANGE = 0.4
+WEIGHT_AMOUNT_FAR_ABOVE_RANGE = 0.6   # more than 1.5x the top of the range
+WEIGHT_PATTERN_HIT = 0.35
+WEIGHT_SUSPICIOUS_PHRASE = 0.3
+WEIGHT_DUPLICATE = 0.5
+
+# Confidence reported for rule decisions
+RULES_LEGIT_CONFIDENCE = 0.6
+RULES_MAX_CONFIDENCE = 0.9
+
+DUPLICATE_REASON = "Duplicate of an earlier claim in this batch"
+
+_AMOUNT_PATTERN = r"\$\s?([\d,]+(?:\.\d+)?)"
+_AMOUNT_IN_TEXT = re.compile(_AMOUNT_PATTERN)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text) -> str:
+    """Lower-case, whitespace-collapsed text used for keyword and duplicate matching"""
+    return _WHITESPACE.sub(" ", str(text or "")).strip().lower()
+
+
+def amount_baseline(claim_type):
+    """(low, high) normal amount range for a claim type, or None if unknown"""
+    for key, bounds in AMOUNT_BASELINES.items():
+        if claim_type and key.lower() in str(claim_type).lower():
+            return bounds
+    return None
+
+
+def infer_claim_type(text):
+    """Find a known claim type mentioned in the claim text"""
+    lowered = normalize_text(text)
+    for key in AMOUNT_BASELINES:
+        if key.lower() in lowered:
+            return key
+    return None
+
+
+def infer_amount(text):
+    """First dollar amount mentioned in the claim text"""
+    match = _AMOUNT_IN_TEXT.search(str(text or ""))
+    if match:
+        try:
+            return float(match.group(1).replace(",", ""))
+        except ValueError:
+            return None
+    return None
+
+
+def in_legit_band(claim_amount, bounds) -> bool:
+    """Amount within the bottom LEGIT_AMOUNT_BAND of the normal range"""
+    if not bounds or not claim_amount:
+        return False
+    low, high = bounds
+    return low <= claim_amount <= low + (high - low) * LEGIT_AMOUNT_BAND
+
+
+def rules_confidence(decision, score):
+    """Confidence reported for a rule decision (None when the model decides)"""
+    if decision == DECISION_FRAUD:
+        return min(score, RULES_MAX_CONFIDENCE)
+    if decision == DECISION_LEGIT:
+        return RULES_LEGIT_CONFIDENCE
+    return None
+
+
+class PreScreener:
+    """Scores claims with deterministic rules; remembers claim texts to flag duplicates"""
+
+    def __init__(self, legit_threshold=LEGIT_THRESHOLD, fraud_threshold=FRAUD_THRESHOLD, allow_legit=RULES_LEGIT):
+        self.legit_threshold = legit_threshold
+        self.fraud_threshold = fraud_threshold
+        self.allow_legit = allow_legit
+        self._seen = set()
+
+    def screen(self, claim_text, claim_type=None, claim_amount=None) -> dict:
+        """
+        Score one claim.
+
+        Returns:
+            dict with decision_path, prescreen_score, reasons, fraud_type, and
+            (for rule decisions) classification / indicators shaped like the
+            fraud_classify / fraud_extract_indicators results
+        """
+        text = normalize_text(claim_text)
+        claim_type = claim_type or infer_claim_type(claim_text)
+        if claim_amount is None or claim_amount != claim_amount:  # None or NaN
+            claim_amount = infer_amount(claim_text)
+
+        score = 0.0
+        reasons = []
+        pattern_hits = {}
+
+        bounds = amount_baseline(claim_type)
+        if bounds and claim_amount:
+            low, high = bounds
+            if claim_amount > high * 1.5:
+                score += WEIGHT_AMOUNT_FAR_ABOVE_RANGE
+                reasons.append(f"Amount ${claim_amount:,.0f} is over 1.5x the {claim_type} maximum (${high:,})")
+            elif claim_amount > high:
+                score += WEIGHT_AMOUNT_ABOVE_RANGE
+                reasons.append(f"Amount ${claim_amount:,.0f} is above the normal {claim_type} range (${low:,}-${high:,})")
+
+        for fraud_type, phrases in FRAUD_PATTERNS.items():
+            for phrase in phrases:
+                if phrase.lower() in text:
+                    pattern_hits[fraud_type] = pattern_hits.get(fraud_type, 0) + 1
+                    score += WEIGHT_PATTERN_HIT
+                    reasons.append(f"{fraud_type} pattern: {phrase}")
+
+        for phrase in SUSPICIOUS_PHRASES:
+            if phrase.lower() in text:
+                score += WEIGHT_SUSPICIOUS_PHRASE
+                reasons.append(f"Suspicious phrase: {phrase}")
+
+        duplicate = text in self._seen
+        self._seen.add(text)
+        if duplicate:
+            score += WEIGHT_DUPLICATE
+            reasons.append(DUPLICATE_REASON)
+
+        score = min(score, 1.0)
+        fraud_type = max(pattern_hits, key=pattern_hits.get) if pattern_hits else ("Duplicate" if duplicate else "None")
+
+        # Clear-legit needs a positive signal (low amount band) and nothing that hints at a concern
+        blocked = any(term in text for term in LEGIT_BLOCKING_TERMS)
+        if score >= self.fraud_threshold:
+            decision = DECISION_FRAUD
+        elif (self.allow_legit and in_legit_band(claim_amount, bounds) and not reasons and not blocked
+              and score <= self.legit_threshold):
+            decision = DECISION_LEGIT
+        else:
+            decision = DECISION_LLM
+
+        result = {
+            "decision_path": decision,
+            "prescreen_score": round(score, 3),
+            "reasons": reasons,
+            "fraud_type": fraud_type,
+            "classification": None,
+            "indicators": None,
+        }
+        if decision != DECISION_LLM:
+            is_fraud = decision == DECISION_FRAUD
+            result["classification"] = {
+                "is_fraudulent": is_fraud,
+                "fraud_probability": score if is_fraud else 0.0,
+                "fraud_type": fraud_type if is_fraud else "None",
+                "confidence": rules_confidence(decision, score),
+            }
+            result["indicators"] = {
+                "red_flags": reasons,
+                "suspicious_patterns": sorted(pattern_hits),
+                "risk_score": score,
+                "affected_entities": [],
+            }
+        return result
+
+
+# ===== SQL (same rules, for Spark) =====
+
+def _sql_string(value) -> str:
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def _sql_contains(text_expr, phrase):
+    return f"INSTR({text_expr}, {_sql_string(phrase.lower())}) > 0"
+
+
+def _flag(condition, value, default="NULL"):
+    return f"CASE WHEN {condition} THEN {value} ELSE {default} END"
+
+
+def normalized_text_sql(text_col="claim_text") -> str:
+    """SQL equivalent of normalize_text()"""
+    return f"LOWER(TRIM(REGEXP_REPLACE(COALESCE({text_col}, ''), '\\\\s+', ' ')))"
+
+
+def _bound_sql(type_col, index):
+    cases = " ".join(
+        f"WHEN {_sql_contains(f'LOWER({type_col})', key)} THEN {bounds[index]}"
+        for key, bounds in AMOUNT_BASELINES.items()
+    )
+    return f"CASE {cases} END"
+
+
+def prescreen_sql(source="claims_to_process", text_col="claim_text", type_col="claim_type",
+                  amount_col="claim_amount", order_col="claim_id", legit_threshold=LEGIT_THRESHOLD,
+                  fraud_threshold=FRAUD_THRESHOLD, allow_legit=RULES_LEGIT) -> str:
+    """
+    Spark SQL query implementing PreScreener.screen over every row of source.
+
+    Rows are screened together as one batch: a claim is a duplicate when an
+    earlier row (by order_col) has the same normalized text. The query returns
+    the source columns plus prescreen_claim_type, prescreen_amount,
+    duplicate_rank, prescreen_score, prescreen_reasons (ARRAY<STRING>),
+    prescreen_fraud_type, prescreen_confidence and decision_path. Each layer
+    only adds columns computed from the one below it, which keeps the
+    expressions small.
+    """
+    # 1. Normalized text
+    query = f"SELECT *, {normalized_text_sql(text_col)} AS prescreen_text FROM {source}"
+
+    # 2. Claim type / amount (from the text when the columns are empty) and duplicate rank
+    inferred_type = " ".join(
+        f"WHEN {_sql_contains('prescreen_text', key)} THEN {_sql_string(key)}" for key in AMOUNT_BASELINES
+    )
+    inferred_amount = (
+        f"TRY_CAST(REPLACE(NULLIF(REGEXP_EXTRACT(COALESCE({text_col}, ''), {_sql_string(_AMOUNT_PATTERN)}, 1), ''), "
+        f"',', '') AS DOUBLE)"
+    )
+    query = f"""SELECT *,
+        COALESCE(NULLIF({type_col}, ''), CASE {inferred_type} END) AS prescreen_claim_type,
+        COALESCE(CAST({amount_col} AS DOUBLE), {inferred_amount}) AS prescreen_amount,
+        ROW_NUMBER() OVER (PARTITION BY prescreen_text ORDER BY {order_col}) AS duplicate_rank
+    FROM ({query})"""
+
+    # 3. Normal amount range for the type
+    query = f"""SELECT *,
+        {_bound_sql('prescreen_claim_type', 0)} AS prescreen_low,
+        {_bound_sql('prescreen_claim_type', 1)} AS prescreen_high
+    FROM ({query})"""
+
+    # 4. Score, reasons and fraud type
+    amount, low, high = "prescreen_amount", "prescreen_low", "prescreen_high"
+    far_above = f"{amount} > {high} * 1.5"
+    above = f"{amount} > {high}"
+    duplicate = "duplicate_rank > 1"
+    terms = [f"CASE WHEN {far_above} THEN {WEIGHT_AMOUNT_FAR_ABOVE_RANGE} "
+             f"WHEN {above} THEN {WEIGHT_AMOUNT_ABOVE_RANGE} ELSE 0.0 END"]
+    reason_items = [
+        f"CASE WHEN {far_above} THEN CONCAT('Amount $', FORMAT_NUMBER({amount}, 0), ' is over 1.5x the ', "
+        f"prescreen_claim_type, ' maximum ($', FORMAT_NUMBER({high}, 0), ')') "
+        f"WHEN {above} THEN CONCAT('Amount $', FORMAT_NUMBER({amount}, 0), ' is above the normal ', "
+        f"prescreen_claim_type, ' range ($', FORMAT_NUMBER({low}, 0), '-$', FORMAT_NUMBER({high}, 0), ')') END"
+    ]
+    type_hits = []
+    for fraud_type, phrases in FRAUD_PATTERNS.items():
+        hits = " + ".join(_flag(_sql_contains("prescreen_text", p), 1, 0) for p in phrases)
+        type_hits.append((fraud_type, f"({hits})"))
+        terms.append(f"({hits}) * {WEIGHT_PATTERN_HIT}")
+        reason_items.extend(
+            _flag(_sql_contains("prescreen_text", p), _sql_string(f"{fraud_type} pattern: {p}")) for p in phrases
+        )
+    for p in SUSPICIOUS_PHRASES:
+        terms.append(_flag(_sql_contains("prescreen_text", p), WEIGHT_SUSPICIOUS_PHRASE, "0.0"))
+        reason_items.append(_flag(_sql_contains("prescreen_text", p), _sql_string(f"Suspicious phrase: {p}")))
+    terms.append(_flag(duplicate, WEIGHT_DUPLICATE, "0.0"))
+    reason_items.append(_flag(duplicate, _sql_string(DUPLICATE_REASON)))
+
+    most_hits = f"GREATEST({', '.join(hits for _, hits in type_hits)})"
+    best_type = " ".join(
+        f"WHEN {hits} > 0 AND {hits} = {most_hits} THEN '{fraud_type}'" for fraud_type, hits in type_hits
+    )
+    blocked = " OR ".join(_sql_contains("prescreen_text", term) for term in LEGIT_BLOCKING_TERMS)
+    legit_band = f"COALESCE({amount} >= {low} AND {amount} <= {low} + ({high} - {low}) * {LEGIT_AMOUNT_BAND}, FALSE)"
+    query = f"""SELECT *,
+        CAST(LEAST(1.0, {' + '.join(f'({t})' for t in terms)}) AS DOUBLE) AS prescreen_score,
+        FILTER(ARRAY({', '.join(reason_items)}), x -> x IS NOT NULL) AS prescreen_reasons,
+        CASE {best_type} WHEN {duplicate} THEN 'Duplicate' ELSE 'None' END AS prescreen_fraud_type,
+        {legit_band} AND NOT ({blocked}) AS prescreen_legit_signal
+    FROM ({query})"""
+
+    # 5. Decision
+    legit = (
+        f"WHEN prescreen_legit_signal AND SIZE(prescreen_reasons) = 0 "
+        f"AND prescreen_score <= {legit_threshold} THEN '{DECISION_LEGIT}' "
+        if allow_legit else ""
+    )
+    return f"""SELECT *,
+        CASE WHEN prescreen_score >= {fraud_threshold} THEN LEAST(prescreen_score, {RULES_MAX_CONFIDENCE})
+            ELSE {RULES_LEGIT_CONFIDENCE} END AS prescreen_confidence,
+        CASE WHEN prescreen_score >= {fraud_threshold} THEN '{DECISION_FRAUD}' {legit}ELSE '{DECISION_LLM}' END
+            AS decision_path
+    FROM ({query})"""
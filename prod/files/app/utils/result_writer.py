@@ -0,0 +1,148 @@
+"""
+Result Writer Utility - Bulk, idempotent persistence of batch results
+
+Rows are written with a parameterized MERGE keyed on claim_id:
+
+    MERGE INTO target AS t
+    USING (SELECT * FROM VALUES (:claim_id_0, ...), (:claim_id_1, ...) AS v(...)) AS s
+    ON t.claim_id = s.claim_id
+    WHEN MATCHED THEN UPDATE SET *
+    WHEN NOT MATCHED THEN INSERT *
+
+A batch that fits in one statement is written by that single MERGE. Larger
+batches are first inserted into a staging table in bounded chunks and then
+MERGEd from it by one statement, so the target table always receives the
+whole batch as a single Delta commit. Statements are submitted and polled by
+a StatementRunner, so a large MERGE is not abandoned at the 50s wait while it
+may still succeed on the warehouse. Re-saving the same claims updates them in
+place.
+"""
+
+import math
+import uuid
+from databricks.sdk.service.sql import StatementParameterListItem
+from utils.statement_runner import StatementRunner
+
+# Rows per statement (parameter limit) - a typical upload fits in a single MERGE
+DEFAULT_MAX_ROWS_PER_STATEMENT = 1000
+DEFAULT_WRITE_TIMEOUT = 600.0
+
+
+def _param_value(value):
+    """Convert a pandas/numpy cell to a statement parameter string (None = NULL)"""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, bool) or type(value).__name__ == "bool_":
+        return "true" if value else "false"
+    return str(value)
+
+
+def _values_rows(columns, num_rows):
+    """VALUES rows of named parameter markers (:name_0, :name_1, ...)"""
+    return ", ".join(
+        "(" + ", ".join(f"CAST(:{name}_{i} AS {sql_type})" for name, sql_type in columns) + ")"
+        for i in range(num_rows)
+    )
+
+
+def _merge_from(table_name, source_sql, key):
+    return f"""MERGE INTO {table_name} AS t
+USING (
+    {source_sql}
+) AS s
+ON t.{key} = s.{key}
+WHEN MATCHED THEN UPDATE SET *
+WHEN NOT MATCHED THEN INSERT *"""
+
+
+def _extra_select(extra_columns):
+    return "".join(f", {expression} AS {name}" for name, expression in extra_columns or [])
+
+
+def build_merge_statement(table_name, columns, num_rows, key="claim_id", extra_columns=None):
+    """
+    Build a MERGE whose source is an inline VALUES table of named parameter markers.
+
+    Args:
+        columns: list of (column_name, sql_type) bound from parameters
+        extra_columns: list of (column_name, sql_expression) computed per row,
+            e.g. ("processed_at", "current_timestamp()")
+    """
+    column_names = ", ".join(name for name, _ in columns)
+    source = (f"SELECT *{_extra_select(extra_columns)} FROM VALUES\n    {_values_rows(columns, num_rows)}\n"
+              f"    AS v({column_names})")
+    return _merge_from(table_name, source, key)
+
+
+def build_staged_merge_statement(table_name, staging_table, key="claim_id", extra_columns=None):
+    """MERGE the whole staging table into table_name in one statement (one Delta commit)"""
+    return _merge_from(table_name, f"SELECT *{_extra_select(extra_columns)} FROM {staging_table}", key)
+
+
+def _parameters(columns, records):
+    return [
+        StatementParameterListItem(name=f"{name}_{i}", value=_param_value(record.get(name)))
+        for i, record in enumerate(records)
+        for name, _ in columns
+    ]
+
+
+def _rows_affected(response, default):
+    # MERGE returns num_affected_rows as the first column
+    if response.result and response.result.data_array:
+        return int(response.result.data_array[0][0] or 0)
+    return default
+
+
+def merge_rows(w, warehouse_id, table_name, records, columns, key="claim_id",
+               extra_columns=None, max_rows_per_statement=DEFAULT_MAX_ROWS_PER_STATEMENT,
+               runner=None, timeout=DEFAULT_WRITE_TIMEOUT):
+    """
+    Upsert records (list of dicts) into table_name as a single Delta commit.
+
+    Records are de-duplicated on key (last one wins) because MERGE rejects
+    multiple source rows matching the same target row. More records than
+    max_rows_per_statement are staged in a temporary table first (dropped
+    afterwards).
+
+    Returns:
+        Number of rows inserted or updated
+
+    Raises:
+        StatementFailed / StatementTimeout if a statement does not succeed
+    """
+    runner = runner or StatementRunner(w, warehouse_id)
+
+    deduped = {}
+    for record in records:
+        deduped[record.get(key)] = record
+    records = list(deduped.values())
+    if not records:
+        return 0
+
+    if len(records) <= max_rows_per_statement:
+        response = runner.run(
+            build_merge_statement(table_name, columns, len(records), key, extra_columns),
+            parameters=_parameters(columns, records), timeout=timeout
+        )
+        return _rows_affected(response, len(records))
+
+    staging_table = f"{table_name}_staging_{uuid.uuid4().hex[:12]}"
+    column_defs = ", ".join(f"{name} {sql_type}" for name, sql_type in columns)
+    runner.run(f"CREATE TABLE {staging_table} ({column_defs}) USING DELTA", timeout=timeout)
+    try:
+        for start in range(0, len(records), max_rows_per_statement):
+            chunk = records[start:start + max_rows_per_statement]
+            runner.run(f"INSERT INTO {staging_table} VALUES {_values_rows(columns, len(chunk))}",
+                       parameters=_parameters(columns, chunk), timeout=timeout)
+        response = runner.run(
+            build_staged_merge_statement(table_name, staging_table, key, extra_columns), timeout=timeout
+        )
+        return _rows_affected(response, len(records))
+    finally:
+        try:
+            runner.run(f"DROP TABLE IF EXISTS {staging_table}", timeout=timeout)
+        except Exception:
+            pass  # Best-effort cleanup; the staging table holds no data the target lacks
@@ -0,0 +1,394 @@
+"""
+Shared Cache Utility - Cross-session, cross-restart cache for app data functions
+
+st.cache_data lives in one app process, so every restart, redeploy and
+replica starts cold and re-runs the same dashboard queries against the
+warehouse. @shared_cached keeps a data function's results in a pluggable
+backend behind an in-process tier:
+
+- "delta" (default): a Delta table (app_data_cache) reached through the
+  Statement Execution API, shared by every replica and surviving redeploys
+- "sqlite": a SQLite file under SHARED_CACHE_DIR, shared by every process on
+  the host and surviving app restarts
+- "memory": in-process only (same reach as st.cache_data)
+
+Lookups are stale-while-revalidate. A value younger than ttl is returned as
+is. A value older than ttl but within ttl + stale_ttl is returned right away
+while one background refresh per key recomputes it. Only older values, or
+misses, make the caller wait. Before recomputing, the backend is checked
+again, so a replica that finds a value another replica already refreshed
+does not query the warehouse itself.
+
+Durable backends store data, never pickles: each cached function has a
+dumps / loads pair that turns its result into bytes and back (JSON by
+default; InsightsBundle uses JSON plus Arrow IPC for its DataFrames), so a
+cache row can never run code when it is read. An entry that does not decode
+is treated as a miss.
+
+Backend failures are best-effort: the function result is still returned and
+kept in the in-process tier. Delta statements are polled through a
+StatementRunner, so a cold warehouse only fails (and retries) one call. A
+Delta backend whose table the warehouse refuses to create (e.g. the app
+lacks CREATE TABLE - see grant_permissions.sh) is replaced by the memory
+backend instead of retrying every call.
+"""
+
+import os
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from databricks.sdk.service.sql import StatementState, StatementParameterListItem
+from utils.databricks_client import CATALOG, SCHEMA, WAREHOUSE_ID, get_workspace_client
+from utils.result_writer import merge_rows
+from utils.statement_runner import StatementRunner, StatementFailed, StatementTimeout
+
+CACHE_TABLE_NAME = "app_data_cache"
+
+BACKEND_DELTA = "delta"
+BACKEND_SQLITE = "sqlite"
+BACKEND_MEMORY = "memory"
+
+# Defaults can be overridden via app_env in config.yaml
+SHARED_CACHE_BACKEND = os.getenv("SHARED_CACHE_BACKEND", BACKEND_DELTA)
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", "/tmp/fraud_app_cache")
+SHARED_CACHE_STALE_TTL = float(os.getenv("SHARED_CACHE_STALE_TTL", "3600"))
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "256"))
+
+# Polled, so a cold warehouse delays cache statements instead of failing them
+CACHE_STATEMENT_TIMEOUT = 120.0
+
+
+class SharedCacheUnavailable(RuntimeError):
+    """The durable backend cannot be used at all (not a per-call failure)"""
+
+
+def json_dumps(value) -> bytes:
+    """Default value encoder for cached functions returning JSON-compatible data"""
+    return json.dumps(value).encode("utf-8")
+
+
+def json_loads(data):
+    return json.loads(data.decode("utf-8"))
+
+
+def shared_cache_key(namespace, args, kwargs) -> str:
+    """Key for one call of a cached function"""
+    payload = json.dumps([namespace, list(args), sorted(kwargs.items())], default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """No durable tier - entries live only in the in-process tier"""
+
+    name = BACKEND_MEMORY
+
+    def get(self, key):
+        return None
+
+    def put(self, key, namespace, data, stored_at):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class SQLiteBackend:
+    """Encoded entries in a SQLite file shared by every process on the host"""
+
+    name = BACKEND_SQLITE
+
+    def __init__(self, cache_dir=SHARED_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "app_data_cache.sqlite")
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS app_data_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    namespace TEXT,
+                    value BLOB,
+                    stored_at REAL
+                )
+            """)
+
+    def _connect(self):
+        # A short-lived connection per call - sqlite3 connections are not shared across threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at FROM app_data_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def put(self, key, namespace, data, stored_at):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO app_data_cache VALUES (?, ?, ?, ?)",
+                (key, namespace, sqlite3.Binary(data), stored_at)
+            )
+
+    def delete(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM app_data_cache WHERE cache_key = ?", (key,))
+
+
+class DeltaBackend:
+    """Encoded entries (base64) in a Delta table shared by every app replica"""
+
+    name = BACKEND_DELTA
+
+    def __init__(self, w=None, warehouse_id=WAREHOUSE_ID, catalog=CATALOG, schema=SCHEMA):
+        self.w = w or get_workspace_client()
+        if self.w is None:
+            raise RuntimeError("Databricks client not available for the Delta cache backend")
+        self.warehouse_id = warehouse_id
+        self.table_name = f"{catalog}.{schema}.{CACHE_TABLE_NAME}"
+        self._runner = StatementRunner(self.w, warehouse_id, max_in_flight=2,
+                                       default_timeout=CACHE_STATEMENT_TIMEOUT)
+        self._table_ready = False
+
+    def _execute(self, statement, parameters=None):
+        """Run a statement to completion; raises StatementFailed / StatementTimeout"""
+        return self._runner.fetch_rows(self._runner.run(statement, parameters))
+
+    def _ensure_table(self):
+        if self._table_ready:
+            return
+        try:
+            self._execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                cache_key STRING NOT NULL,
+                namespace STRING,
+                value_b64 STRING,
+                stored_at DOUBLE
+            )
+            USING DELTA
+            COMMENT 'Cross-replica cache of Streamlit app data functions (JSON / Arrow IPC values)'
+            """)
+        except StatementTimeout:
+            raise  # Cold or busy warehouse - try again on the next call
+        except StatementFailed as e:
+            if e.state != StatementState.FAILED:
+                raise
+            # The warehouse rejected the DDL (permissions, missing schema) - retrying will not help
+            raise SharedCacheUnavailable(f"Cannot create {self.table_name}: {e}") from e
+        self._table_ready = True
+
+    def get(self, key):
+        self._ensure_table()
+        rows = self._execute(
+            f"SELECT value_b64, stored_at FROM {self.table_name} WHERE cache_key = :key",
+            [StatementParameterListItem(name="key", value=key)]
+        )
+        if not rows or not rows[0][0]:
+            return None
+        return base64.b64decode(rows[0][0]), float(rows[0][1])
+
+    def put(self, key, namespace, data, stored_at):
+        self._ensure_table()
+        merge_rows(
+            self.w, self.warehouse_id, self.table_name,
+            [{"cache_key": key, "namespace": namespace,
+              "value_b64": base64.b64encode(data).decode("ascii"), "stored_at": stored_at}],
+            columns=[("cache_key", "STRING"), ("namespace", "STRING"),
+                     ("value_b64", "STRING"), ("stored_at", "DOUBLE")],
+            key="cache_key",
+            runner=self._runner
+        )
+
+    def delete(self, key):
+        self._ensure_table()
+        self._execute(f"DELETE FROM {self.table_name} WHERE cache_key = :key",
+                      [StatementParameterListItem(name="key", value=key)])
+
+
+def create_backend(name=SHARED_CACHE_BACKEND):
+    """Backend by name; falls back to memory if the durable one cannot be set up"""
+    try:
+        if name == BACKEND_DELTA:
+            return DeltaBackend()
+        if name == BACKEND_SQLITE:
+            return SQLiteBackend()
+    except Exception:
+        pass
+    return MemoryBackend()
+
+
+class SharedCache:
+    """In-process tier over a durable backend, with stale-while-revalidate"""
+
+    def __init__(self, backend, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._local = {}  # key -> (value, stored_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="shared-cache")
+        self._stats = {"hits": 0, "stale_hits": 0, "backend_hits": 0, "misses": 0,
+                       "refreshes": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._local[key] = entry
+            if len(self._local) > self.max_entries:
+                oldest = min(self._local, key=lambda k: self._local[k][1])
+                self._local.pop(oldest)
+
+    def _use_backend(self, method, *args):
+        """Call a backend method; failures are counted, and an unusable backend is swapped for memory"""
+        backend = self.backend
+        try:
+            return getattr(backend, method)(*args)
+        except SharedCacheUnavailable:
+            self._count("errors")
+            with self._lock:
+                if self.backend is backend:
+                    self.backend = MemoryBackend()
+        except Exception:
+            self._count("errors")
+        return None
+
+    def _backend_get(self, key, loads):
+        stored = self._use_backend("get", key)
+        if stored is None:
+            return None
+        try:
+            return loads(stored[0]), stored[1]
+        except Exception:
+            # Written by an older format or another function - recompute
+            self._count("errors")
+            return None
+
+    def _lookup(self, key, ttl, loads):
+        """Freshest of the local and backend entries (backend only read when local is not fresh)"""
+        with self._lock:
+            entry = self._local.get(key)
+        if entry is not None and time.time() - entry[1] < ttl:
+            return entry, False
+        stored = self._backend_get(key, loads)
+        if stored is not None and (entry is None or stored[1] > entry[1]):
+            self._remember(key, stored)
+            return stored, True
+        return entry, False
+
+    def _compute(self, key, namespace, compute, cacheable, dumps):
+        value = compute()
+        if cacheable is None or cacheable(value):
+            stored_at = time.time()
+            self._remember(key, (value, stored_at))
+            try:
+                data = dumps(value)
+            except Exception:
+                self._count("errors")
+            else:
+                self._use_backend("put", key, namespace, data, stored_at)
+        return value
+
+    def _refresh(self, key, namespace, compute, ttl, cacheable, dumps, loads):
+        try:
+            # Another replica may have refreshed it already
+            entry, _ = self._lookup(key, ttl, loads)
+            if entry is None or time.time() - entry[1] >= ttl:
+                self._compute(key, namespace, compute, cacheable, dumps)
+                self._count("refreshes")
+        except Exception:
+            self._count("errors")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_compute(self, key, namespace, compute, ttl, stale_ttl=SHARED_CACHE_STALE_TTL, cacheable=None,
+                       dumps=json_dumps, loads=json_loads):
+        """
+        Cached value for key, computing it with compute() when needed.
+
+        Args:
+            ttl: seconds a value is served without refreshing
+            stale_ttl: further seconds a value is served while it refreshes in the background
+            cacheable: optional predicate - values it rejects are returned but not stored
+            dumps / loads: value <-> bytes for the durable backend
+        """
+        entry, from_backend = self._lookup(key, ttl, loads)
+        age = time.time() - entry[1] if entry is not None else None
+
+        if age is not None and age < ttl:
+            self._count("backend_hits" if from_backend else "hits")
+            return entry[0]
+
+        if age is not None and age < ttl + stale_ttl:
+            self._count("stale_hits")
+            with self._lock:
+                start = key not in self._refreshing
+                self._refreshing.add(key)
+            if start:
+                self._refresher.submit(self._refresh, key, namespace, compute, ttl, cacheable, dumps, loads)
+            return entry[0]
+
+        self._count("misses")
+        return self._compute(key, namespace, compute, cacheable, dumps)
+
+    def invalidate(self, key):
+        """Drop key from both tiers"""
+        with self._lock:
+            self._local.pop(key, None)
+        self._use_backend("delete", key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._local)
+            stats["refreshing"] = len(self._refreshing)
+        stats["backend"] = self.backend.name
+        return stats
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_data_cache() -> SharedCache:
+    """Process-wide cache for @shared_cached functions, on the SHARED_CACHE_BACKEND backend"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SharedCache(create_backend())
+        return _shared_cache
+
+
+def shared_cached(namespace, ttl, stale_ttl=SHARED_CACHE_STALE_TTL, cacheable=None,
+                  dumps=json_dumps, loads=json_loads):
+    """
+    Decorator: cache a data function in the shared cache.
+
+    Arguments must be JSON- or repr-stable since they form the key. Results
+    are stored with dumps / loads (JSON unless the function passes its own). The
+    wrapped function gains clear(*args, **kwargs), which drops that call's
+    entry everywhere, and uncached, the original function.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = shared_cache_key(namespace, args, kwargs)
+            return get_shared_data_cache().get_or_compute(
+                key, namespace, lambda: fn(*args, **kwargs), ttl, stale_ttl=stale_ttl, cacheable=cacheable,
+                dumps=dumps, loads=loads
+            )
+
+        def clear(*args, **kwargs):
+            get_shared_data_cache().invalidate(shared_cache_key(namespace, args, kwargs))
+
+        wrapper.clear = clear
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
@@ -0,0 +1,183 @@
+"""
+Statement Runner Utility - Non-blocking execution of long-running SQL statements
+
+execute_statement(wait_timeout="50s") holds a request open for up to 50s and
+gives up on anything slower. Slow AI_QUERY calls then come back as None. The
+runner instead:
+
+1. Submits with a short wait (most statements finish inside it)
+2. Polls get_statement with exponential backoff until the statement finishes
+3. Cancels the statement on the warehouse on timeout or when asked
+
+Statements can be run blocking (run), as concurrent.futures Futures (submit)
+or awaited from asyncio (run_async), so many can be in flight at once.
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from databricks.sdk.service.sql import StatementState, ExecuteStatementRequestOnWaitTimeout
+
+# Databricks accepts 0s (fully async) or 5s-50s for the initial wait
+DEFAULT_SUBMIT_WAIT = "5s"
+DEFAULT_STATEMENT_TIMEOUT = 300.0
+
+_TERMINAL_STATES = (StatementState.SUCCEEDED, StatementState.FAILED,
+                    StatementState.CANCELED, StatementState.CLOSED)
+
+
+class StatementFailed(RuntimeError):
+    """Statement finished in a state other than SUCCEEDED"""
+
+    def __init__(self, statement_id, state, message=None):
+        self.statement_id = statement_id
+        self.state = state
+        super().__init__(f"Statement {statement_id} {state.value if state else 'UNKNOWN'}: {message or ''}".strip())
+
+
+class StatementTimeout(StatementFailed):
+    """Statement did not finish in time and was cancelled"""
+
+
+class StatementHandle:
+    """A submitted statement: a Future for its response plus warehouse-side cancellation"""
+
+    def __init__(self, runner):
+        self._runner = runner
+        self._statement_id = None
+        self._cancelled = threading.Event()
+        self.future = None
+
+    @property
+    def statement_id(self):
+        return self._statement_id
+
+    def _set_statement_id(self, statement_id):
+        self._statement_id = statement_id
+
+    def cancel(self):
+        """Stop polling and cancel the statement on the warehouse"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+        if self._statement_id:
+            self._runner.cancel(self._statement_id)
+
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def result(self, timeout=None):
+        """Block until the statement finishes; raises StatementFailed on failure"""
+        return self.future.result(timeout)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+
+class StatementRunner:
+    """Submit-and-poll execution of SQL statements on one warehouse"""
+
+    def __init__(self, w, warehouse_id, max_in_flight=16, submit_wait=DEFAULT_SUBMIT_WAIT,
+                 poll_initial=0.5, poll_max=5.0, poll_factor=1.5,
+                 default_timeout=DEFAULT_STATEMENT_TIMEOUT):
+        self.w = w
+        self.warehouse_id = warehouse_id
+        self.max_in_flight = max_in_flight
+        self.submit_wait = submit_wait
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.default_timeout = default_timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                                    thread_name_prefix="statement-poller")
+            return self._executor
+
+    def cancel(self, statement_id):
+        """Cancel a running statement (best-effort)"""
+        try:
+            self.w.statement_execution.cancel_execution(statement_id)
+        except Exception:
+            pass
+
+    def run(self, statement, parameters=None, timeout=None, handle=None, **kwargs):
+        """
+        Execute a statement and wait for it to finish.
+
+        Extra kwargs (e.g. format / disposition) are passed to execute_statement.
+
+        Returns:
+            The final statement response (status, manifest, result)
+
+        Raises:
+            StatementTimeout if it is still running after timeout seconds
+            StatementFailed if it ends FAILED / CANCELED / CLOSED
+        """
+        timeout = timeout if timeout is not None else self.default_timeout
+        deadline = time.time() + timeout
+
+        response = self.w.statement_execution.execute_statement(
+            warehouse_id=self.warehouse_id,
+            statement=statement,
+            parameters=parameters,
+            wait_timeout=self.submit_wait,
+            on_wait_timeout=ExecuteStatementRequestOnWaitTimeout.CONTINUE,
+            **kwargs
+        )
+        statement_id = response.statement_id
+        if handle is not None:
+            handle._set_statement_id(statement_id)
+
+        delay = self.poll_initial
+        while response.status.state not in _TERMINAL_STATES:
+            if handle is not None and handle.cancelled():
+                self.cancel(statement_id)
+                raise StatementFailed(statement_id, StatementState.CANCELED, "cancelled by caller")
+            if time.time() + delay > deadline:
+                self.cancel(statement_id)
+                raise StatementTimeout(statement_id, response.status.state, f"still running after {timeout:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * self.poll_factor, self.poll_max)
+            response = self.w.statement_execution.get_statement(statement_id)
+
+        if response.status.state != StatementState.SUCCEEDED:
+            message = response.status.error.message if response.status.error else None
+            raise StatementFailed(statement_id, response.status.state, message)
+        return response
+
+    def submit(self, statement, parameters=None, timeout=None) -> StatementHandle:
+        """Start a statement in the background; returns a handle with .future and .cancel()"""
+        handle = StatementHandle(self)
+        handle.future = self._pool().submit(self.run, statement, parameters, timeout, handle)
+        return handle
+
+    async def run_async(self, statement, parameters=None, timeout=None):
+        """Await a statement from asyncio code; cancelling the task cancels the statement"""
+        handle = self.submit(statement, parameters, timeout)
+        try:
+            return await asyncio.wrap_future(handle.future)
+        except asyncio.CancelledError:
+            handle.cancel()
+            raise
+
+    def fetch_rows(self, response):
+        """Collect data_array rows across every result chunk"""
+        rows = list(response.result.data_array or []) if response.result else []
+        next_chunk = response.result.next_chunk_index if response.result else None
+        while next_chunk is not None:
+            chunk = self.w.statement_execution.get_statement_result_chunk_n(response.statement_id, next_chunk)
+            rows.extend(chunk.data_array or [])
+            next_chunk = chunk.next_chunk_index
+        return rows
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
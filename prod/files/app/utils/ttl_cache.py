@@ -0,0 +1,101 @@
+"""
+TTL Cache Utility - In-process LRU + TTL cache with version invalidation
+
+Shared by vector search (versioned on fraud_cases_kb and the index sync
+status) and the Genie client (versioned on fraud_analysis). The version
+token is read on a background thread, so lookups never wait on a warehouse
+query.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class VersionedTTLCache:
+    """
+    LRU + TTL cache, cleared when the version of the data behind it changes.
+
+    version_fn runs on a background thread at most every version_check_seconds;
+    get() serves only entries stored under the last version token it returned.
+    With no version_fn, entries only expire by TTL and LRU.
+    """
+
+    def __init__(self, ttl_seconds, max_entries, version_check_seconds=60.0, version_fn=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_check_seconds = version_check_seconds
+        self.version_fn = version_fn
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+        self._checking = False
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+    def _refresh_version(self):
+        try:
+            version = self.version_fn()
+        except Exception:
+            version = None
+        with self._lock:
+            if version is not None:
+                if self._version is not None and version != self._version:
+                    self._entries.clear()
+                    self._stats["invalidations"] += 1
+                self._version = version
+            self._version_checked_at = time.time()
+            self._checking = False
+
+    def _check_version(self):
+        """Start a background version read if one is due (never blocks the caller)"""
+        if self.version_fn is None:
+            return
+        with self._lock:
+            if self._checking or time.time() - self._version_checked_at < self.version_check_seconds:
+                return
+            self._checking = True
+        threading.Thread(target=self._refresh_version, name="cache-version-check", daemon=True).start()
+
+    def get(self, key):
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, version, value = entry
+                if version is not None and version != self._version:
+                    # Computed before the last version change was seen
+                    del self._entries[key]
+                    self._stats["invalidations"] += 1
+                elif time.time() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                else:
+                    del self._entries[key]
+                    self._stats["expired"] += 1
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), self._version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        """Hit / miss counts, hit rate, invalidations, current size and version token"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["version"] = self._version
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
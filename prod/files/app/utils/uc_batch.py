@@ -0,0 +1,217 @@
+"""
+UC Batch Utility - Set-based evaluation of UC AI functions
+
+Sends a chunk of claims to the warehouse as a single statement:
+
+    SELECT t.claim_key,
+           catalog.schema.fraud_classify(t.claim_text) AS fraud_classify,
+           catalog.schema.fraud_extract_indicators(t.claim_text) AS fraud_extract_indicators
+    FROM VALUES ('0', '...'), ('1', '...') AS t(claim_key, claim_text)
+
+The warehouse fans the AI_QUERY calls out in parallel, and we pay statement
+queueing and HTTP overhead once per chunk instead of once per claim. Chunks
+are submitted and polled by a StatementRunner, so a slow chunk is not
+cancelled at the 50s execute_statement limit.
+
+A chunk that times out or fails on a row is retried smaller (a single
+claim that fails is recorded as None). The batch raises UCBatchAborted
+after max_failures failed statements, or right away on a failure that
+would hit every chunk the same way (missing function, no permission).
+"""
+
+import json
+import time
+from utils.statement_runner import StatementRunner, StatementTimeout, DEFAULT_STATEMENT_TIMEOUT
+
+# Databricks SQL rejects statements over 16 MiB - keep headroom for the SELECT list
+MAX_STATEMENT_BYTES = 12 * 1024 * 1024
+
+DEFAULT_MAX_FAILURES = 8
+
+# Error classes that fail every statement alike - a smaller chunk cannot help
+STATEMENT_LEVEL_ERRORS = (
+    "FUNCTION_NOT_FOUND", "ROUTINE_NOT_FOUND", "UNRESOLVED_ROUTINE",
+    "PERMISSION_DENIED", "INSUFFICIENT_PERMISSIONS",
+    "CATALOG_NOT_FOUND", "SCHEMA_NOT_FOUND", "TABLE_OR_VIEW_NOT_FOUND",
+    "PARSE_SYNTAX_ERROR", "UNRESOLVED_COLUMN",
+)
+
+
+class UCBatchAborted(RuntimeError):
+    """The batch stopped: a statement-level error, or too many failed statements"""
+
+
+def is_statement_level_error(exc) -> bool:
+    """True if exc would fail any chunk, whatever claims it holds"""
+    if isinstance(exc, StatementTimeout):
+        return False
+    text = f"{getattr(exc, 'error_code', '') or ''} {exc}".upper()
+    return any(code in text for code in STATEMENT_LEVEL_ERRORS)
+
+
+def sql_literal(value) -> str:
+    """Render a Python value as a Databricks SQL literal"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return str(value)
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def parse_uc_value(data):
+    """Parse a UC function result cell (STRUCT values arrive as JSON strings)"""
+    if isinstance(data, str):
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+    return data
+
+
+class AdaptiveChunker:
+    """
+    Picks how many claims go into the next statement.
+
+    Chunks are capped by the statement byte budget, and the claim count is
+    tuned from observed latency: grow while statements finish well inside
+    target_seconds, shrink when they run long, halve when one times out or
+    fails on a row.
+    """
+
+    def __init__(self, initial_size=20, min_size=1, max_size=200,
+                 target_seconds=30.0, max_bytes=MAX_STATEMENT_BYTES):
+        self.size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+
+    def take(self, claims, start):
+        """Return the end index of the next chunk starting at claims[start]"""
+        end = start
+        used = 0
+        while end < len(claims) and end - start < self.size:
+            row_bytes = len(sql_literal(claims[end][1]).encode("utf-8")) + 64
+            if end > start and used + row_bytes > self.max_bytes:
+                break
+            used += row_bytes
+            end += 1
+        return end
+
+    def record(self, chunk_size, elapsed, succeeded):
+        """Adjust the next chunk size from the last statement's outcome"""
+        if not succeeded:
+            self.size = max(self.min_size, chunk_size // 2)
+        elif elapsed > self.target_seconds:
+            scaled = int(chunk_size * self.target_seconds / elapsed)
+            self.size = max(self.min_size, min(self.size, scaled))
+        elif elapsed < self.target_seconds / 2:
+            self.size = min(self.max_size, max(self.size, int(chunk_size * 1.5) + 1))
+
+
+def build_batch_statement(catalog, schema, function_names, claims) -> str:
+    """Build one SELECT that applies every function to every (key, text) pair"""
+    select_list = ",\n    ".join(
+        f"{catalog}.{schema}.{fn}(t.claim_text) AS {fn}" for fn in function_names
+    )
+    values = ",\n    ".join(
+        f"({sql_literal(str(key))}, {sql_literal(text)})" for key, text in claims
+    )
+    return f"""SELECT
+    t.claim_key,
+    {select_list}
+FROM VALUES
+    {values}
+AS t(claim_key, claim_text)"""
+
+
+def call_uc_functions_batched(w, warehouse_id, catalog, schema, function_names, claims,
+                              chunker=None, on_chunk=None, cache=None, runner=None,
+                              statement_timeout=DEFAULT_STATEMENT_TIMEOUT, max_failures=DEFAULT_MAX_FAILURES):
+    """
+    Evaluate UC functions over many claims, one statement per chunk.
+
+    Args:
+        claims: list of (claim_key, claim_text) tuples; keys must be unique
+        on_chunk: optional callback(chunk_results, done_count, total) after each chunk
+        cache: optional LLMResultCache; fully cached claims never reach the warehouse
+        runner: optional shared StatementRunner; a chunk still running after
+            statement_timeout seconds is cancelled and retried smaller
+        max_failures: failed statements (timeouts, row errors) allowed across the whole batch
+
+    Returns:
+        dict of claim_key -> {function_name: parsed result or None}
+
+    Raises:
+        UCBatchAborted on a statement-level error or after max_failures failed statements
+        (chunks already finished have been passed to on_chunk and the cache)
+    """
+    chunker = chunker or AdaptiveChunker()
+    runner = runner or StatementRunner(w, warehouse_id)
+    claims = [(str(key), text or "") for key, text in claims]
+    results = {}
+    total = len(claims)
+    done = 0
+
+    if cache is not None and claims:
+        hits = {fn: cache.get_many(fn, [[text] for _, text in claims]) for fn in function_names}
+        remaining = []
+        cached_results = {}
+        for i, (key, text) in enumerate(claims):
+            if all(i in hits[fn] for fn in function_names):
+                cached_results[key] = {fn: hits[fn][i] for fn in function_names}
+            else:
+                remaining.append((key, text))
+        results.update(cached_results)
+        claims = remaining
+        done = len(cached_results)
+        if on_chunk and cached_results:
+            on_chunk(cached_results, done, total)
+
+    start = 0
+    failures = 0
+
+    while start < len(claims):
+        end = chunker.take(claims, start)
+        chunk = claims[start:end]
+        statement = build_batch_statement(catalog, schema, function_names, chunk)
+
+        began = time.time()
+        error = None
+        chunk_results = {}
+        try:
+            response = runner.run(statement, timeout=statement_timeout)
+            for row in runner.fetch_rows(response):
+                chunk_results[row[0]] = {
+                    fn: parse_uc_value(value) for fn, value in zip(function_names, row[1:])
+                }
+        except Exception as e:
+            error = e
+        if error is not None and is_statement_level_error(error):
+            raise UCBatchAborted(f"UC batch stopped: {error}") from error
+        chunker.record(len(chunk), time.time() - began, error is None)
+
+        if error is not None:
+            failures += 1
+            if failures > max_failures:
+                raise UCBatchAborted(f"UC batch stopped after {failures} failed statements: {error}") from error
+            if len(chunk) > 1:
+                # Retry the same claims with the smaller chunk size
+                continue
+
+        for key, _ in chunk:
+            results[key] = chunk_results.get(key, {fn: None for fn in function_names})
+        start = end
+        done += len(chunk)
+
+        if cache is not None:
+            for fn in function_names:
+                cache.put_many(fn, [([text], results[key][fn]) for key, text in chunk])
+
+        if on_chunk:
+            on_chunk({key: results[key] for key, _ in chunk}, done, total)
+
+    return results
@@ -0,0 +1,327 @@
+"""
+Vector Search Utility - Shared, cached queries against the fraud cases index
+
+Every page and FraudAgent used to POST to
+/api/2.0/vector-search/indexes/{index}/query for each search, even though
+the same fraud-pattern queries repeat constantly. query_index() goes through
+a process-wide cache keyed on
+
+    (normalized query text, columns, num_results, filters)
+
+Entries expire after VECTOR_CACHE_TTL seconds. The whole cache is dropped
+when the index content changes: every VECTOR_CACHE_VERSION_CHECK seconds a
+background thread reads the fraud_cases_kb Delta version and the index sync
+status. If either changed, old results are discarded. Lookups only compare
+against the last token read, so they never wait on the check.
+
+query_index_many() serves many queries at once (batch Deep analysis). Queries
+that miss the cache are embedded in batched calls to the EMBEDDING_MODEL
+serving endpoint, and the nearest-neighbour lookups then run concurrently
+with query_vector.
+
+With LOCAL_VECTOR_INDEX=true, searches on the fraud cases index are answered
+in-process by a LocalIndexMirror (utils/local_index) of fraud_cases_kb. The
+remote index is used while the mirror is loading or stale.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from utils.databricks_client import CATALOG, SCHEMA, get_workspace_client, get_query_metrics, run_query
+from utils.local_index import LocalIndexMirror
+from utils.ttl_cache import VersionedTTLCache
+
+VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
+KNOWLEDGE_BASE_TABLE = f"{CATALOG}.{SCHEMA}.fraud_cases_kb"
+DEFAULT_COLUMNS = ["doc_id", "doc_type", "title", "content"]
+
+# Defaults can be overridden via app_env in config.yaml
+VECTOR_CACHE_TTL = float(os.getenv("VECTOR_CACHE_TTL", "3600"))
+VECTOR_CACHE_VERSION_CHECK = float(os.getenv("VECTOR_CACHE_VERSION_CHECK", "60"))
+VECTOR_CACHE_MAX_ENTRIES = int(os.getenv("VECTOR_CACHE_MAX_ENTRIES", "1024"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "databricks-gte-large-en")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+VECTOR_MAX_CONCURRENCY = int(os.getenv("VECTOR_MAX_CONCURRENCY", "8"))
+LOCAL_VECTOR_INDEX = os.getenv("LOCAL_VECTOR_INDEX", "false").lower() == "true"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class VectorSearchError(RuntimeError):
+    """The vector search endpoint returned an error response"""
+
+
+def normalize_query(text) -> str:
+    """Lower-case, whitespace-collapsed query text used in cache keys"""
+    return _WHITESPACE.sub(" ", str(text or "")).strip().lower()
+
+
+def query_cache_key(index_name, query_text, columns, num_results, filters=None) -> str:
+    """Cache key for one vector search request"""
+    payload = json.dumps(
+        [index_name, normalize_query(query_text), list(columns), int(num_results), filters or {}],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def kb_table_version(kb_table=KNOWLEDGE_BASE_TABLE):
+    """Current Delta version of the knowledge base table"""
+    rows = run_query(f"DESCRIBE HISTORY {kb_table} LIMIT 1", label="kb_version", retries=0)
+    return rows[0][0] if rows else None
+
+
+def index_version_token(index_name=VECTOR_INDEX, kb_table=KNOWLEDGE_BASE_TABLE, w=None):
+    """
+    Marker that changes whenever the index content may have changed.
+
+    Combines the source Delta table version with the index sync status
+    (indexed row count + status message). Returns None if neither is readable.
+    """
+    parts = []
+    try:
+        parts.append(f"kb:{kb_table_version(kb_table)}")
+    except Exception:
+        parts.append("kb:?")
+    try:
+        w = w or get_workspace_client()
+        status = w.api_client.do("GET", f"/api/2.0/vector-search/indexes/{index_name}").get("status", {})
+        parts.append(f"rows:{status.get('indexed_row_count')}|{status.get('message', '')}")
+    except Exception:
+        parts.append("index:?")
+    if all(part.endswith("?") for part in parts):
+        return None
+    return ";".join(parts)
+
+
+class VectorQueryCache(VersionedTTLCache):
+    """LRU + TTL cache of vector search results, cleared when the index version changes"""
+
+    def __init__(self, ttl_seconds=VECTOR_CACHE_TTL, max_entries=VECTOR_CACHE_MAX_ENTRIES,
+                 version_check_seconds=VECTOR_CACHE_VERSION_CHECK, version_fn=index_version_token):
+        super().__init__(ttl_seconds, max_entries, version_check_seconds, version_fn)
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_vector_cache() -> VectorQueryCache:
+    """Process-wide vector query cache shared by all pages and FraudAgent"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = VectorQueryCache()
+        return _shared_cache
+
+
+_local_mirror = None
+
+
+def get_local_mirror():
+    """Process-wide local mirror of fraud_cases_kb, or None if LOCAL_VECTOR_INDEX is off"""
+    global _local_mirror
+    if not LOCAL_VECTOR_INDEX:
+        return None
+    with _shared_cache_lock:
+        if _local_mirror is None:
+            _local_mirror = LocalIndexMirror(
+                load_rows=lambda: (DEFAULT_COLUMNS, [list(row) for row in run_query(
+                    f"SELECT {', '.join(DEFAULT_COLUMNS)} FROM {KNOWLEDGE_BASE_TABLE}", label="kb_load"
+                )]),
+                embed=embed_texts,
+                version=kb_table_version,
+                version_check_seconds=VECTOR_CACHE_VERSION_CHECK
+            )
+        return _local_mirror
+
+
+def _local_mirror_for(index_name, filters):
+    # The mirror only holds the default index and does not apply filters
+    return get_local_mirror() if index_name == VECTOR_INDEX and not filters else None
+
+
+def query_index(query_text, columns=None, num_results=3, filters=None, index_name=VECTOR_INDEX,
+                use_cache=True, w=None):
+    """
+    Similarity search on a Vector Search index, served from the shared cache when possible.
+
+    Returns:
+        list of result rows (data_array), one list of column values per row
+
+    Raises:
+        VectorSearchError if the endpoint returns an error response
+    """
+    columns = list(columns or DEFAULT_COLUMNS)
+    cache = get_vector_cache() if use_cache else None
+    key = query_cache_key(index_name, query_text, columns, num_results, filters)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    mirror = _local_mirror_for(index_name, filters)
+    if mirror is not None:
+        try:
+            rows = mirror.search(query_text, num_results, columns)
+        except Exception:
+            rows = None
+        if rows is not None:
+            if cache is not None:
+                cache.put(key, rows)
+            return rows
+
+    body = {"columns": columns, "num_results": num_results, "query_text": query_text}
+    if filters:
+        body["filters_json"] = json.dumps(filters)
+
+    w = w or get_workspace_client()
+    started = time.time()
+    try:
+        response = w.api_client.do("POST", f"/api/2.0/vector-search/indexes/{index_name}/query", body=body)
+        if isinstance(response, dict) and "error_code" in response:
+            raise VectorSearchError(f"Vector Search error: {response.get('message', 'Unknown error')}")
+    except Exception:
+        get_query_metrics().record("vector_search", time.time() - started, ok=False)
+        raise
+    get_query_metrics().record("vector_search", time.time() - started, ok=True)
+
+    rows = response.get("result", {}).get("data_array", []) or []
+    if cache is not None:
+        cache.put(key, rows)
+    return rows
+
+
+def embed_texts(texts, endpoint=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE, w=None):
+    """
+    Embed texts with the serving endpoint, batch_size texts per request.
+
+    Returns:
+        list of embedding vectors in input order
+    """
+    w = w or get_workspace_client()
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        batch = list(texts[start:start + batch_size])
+        started = time.time()
+        try:
+            response = w.api_client.do("POST", f"/serving-endpoints/{endpoint}/invocations", body={"input": batch})
+            data = sorted(response.get("data", []), key=lambda item: item.get("index", 0))
+            if len(data) != len(batch):
+                raise VectorSearchError(f"Embedding endpoint returned {len(data)} vectors for {len(batch)} texts")
+        except Exception:
+            get_query_metrics().record("embed_batch", time.time() - started, ok=False)
+            raise
+        get_query_metrics().record("embed_batch", time.time() - started, ok=True)
+        embeddings.extend(item["embedding"] for item in data)
+    return embeddings
+
+
+def query_index_by_vector(query_vector, columns=None, num_results=3, filters=None, index_name=VECTOR_INDEX, w=None):
+    """Nearest-neighbour lookup for a precomputed embedding (no cache)"""
+    body = {"columns": list(columns or DEFAULT_COLUMNS), "num_results": num_results, "query_vector": query_vector}
+    if filters:
+        body["filters_json"] = json.dumps(filters)
+
+    w = w or get_workspace_client()
+    started = time.time()
+    try:
+        response = w.api_client.do("POST", f"/api/2.0/vector-search/indexes/{index_name}/query", body=body)
+        if isinstance(response, dict) and "error_code" in response:
+            raise VectorSearchError(f"Vector Search error: {response.get('message', 'Unknown error')}")
+    except Exception:
+        get_query_metrics().record("vector_search_by_vector", time.time() - started, ok=False)
+        raise
+    get_query_metrics().record("vector_search_by_vector", time.time() - started, ok=True)
+    return response.get("result", {}).get("data_array", []) or []
+
+
+def query_index_many(query_texts, columns=None, num_results=3, filters=None, index_name=VECTOR_INDEX,
+                     embedding_endpoint=EMBEDDING_MODEL, max_workers=VECTOR_MAX_CONCURRENCY, w=None):
+    """
+    Similarity search for many queries at once.
+
+    Cached queries are answered locally. The rest are de-duplicated, embedded
+    in batched calls and looked up concurrently. If the embedding endpoint
+    fails, the lookups fall back to query_text searches (still concurrent).
+    A query whose lookup fails gets an empty result instead of failing the batch.
+
+    Returns:
+        list of result-row lists, aligned with query_texts
+    """
+    columns = list(columns or DEFAULT_COLUMNS)
+    cache = get_vector_cache()
+    w = w or get_workspace_client()
+
+    keys = [query_cache_key(index_name, text, columns, num_results, filters) for text in query_texts]
+    results = {}
+    pending = {}
+    for key, text in zip(keys, query_texts):
+        if key in results or key in pending:
+            continue
+        cached = cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending[key] = text
+
+    if pending:
+        pending_keys = list(pending)
+        mirror = _local_mirror_for(index_name, filters)
+        try:
+            vectors = embed_texts([pending[key] for key in pending_keys], endpoint=embedding_endpoint, w=w)
+
+            def lookup(i):
+                rows = mirror.search_vector(vectors[i], num_results, columns) if mirror is not None else None
+                if rows is None:
+                    rows = query_index_by_vector(vectors[i], columns, num_results, filters, index_name, w)
+                return rows
+        except Exception:
+            lookup = lambda i: query_index(pending[pending_keys[i]], columns, num_results, filters,
+                                           index_name, use_cache=False, w=w)
+
+        def safe_lookup(i):
+            try:
+                return lookup(i)
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending_keys))),
+                                thread_name_prefix="vector-search") as pool:
+            for key, rows in zip(pending_keys, pool.map(safe_lookup, range(len(pending_keys)))):
+                results[key] = rows or []
+                if rows is not None:
+                    cache.put(key, rows)
+
+    return [results[key] for key in keys]
+
+
+def render_vector_cache_metrics():
+    """Show vector query cache hit / miss metrics in an expander"""
+    stats = get_vector_cache().stats()
+    with st.expander("🗄️ Vector Search Cache"):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Hit Rate", f"{stats['hit_rate'] * 100:.0f}%")
+        col2.metric("Hits / Misses", f"{stats['hits']} / {stats['misses']}")
+        col3.metric("Cached Queries", stats["entries"])
+        col4.metric("Invalidations", stats["invalidations"])
+        st.caption(
+            f"Entries expire after {VECTOR_CACHE_TTL:.0f}s ({stats['expired']} expired so far) and are dropped "
+            f"when the knowledge base or index sync changes. Index version: {stats['version'] or 'unknown'}"
+        )
+        mirror = get_local_mirror()
+        if mirror is not None:
+            local = mirror.stats()
+            st.caption(
+                f"Local index: {local['entries']} chunks ({local['backend'] or 'loading'}), "
+                f"{local['local_hits']} local searches, {local['fallbacks']} remote fallbacks, "
+                f"KB version {local['version']}{' (stale, refreshing)' if local['stale'] else ''}"
+            )
+        if st.button("Clear vector search cache"):
+            get_vector_cache().clear()
+            st.rerun()
@@ -63,6 +63,13 @@ def load_config(environment: str = None) -> dict:
     return config, environment
 
 
+def app_env_overrides(config: dict, environment: str) -> dict:
+    """Optional tuning env vars: common app_env, with the environment's app_env on top"""
+    overrides = dict(config['common'].get('app_env') or {})
+    overrides.update(config['environments'][environment].get('app_env') or {})
+    return overrides
+
+
 def generate_app_yaml(config: dict, environment: str) -> str:
     """Generate app.yaml content from config"""
     
@@ -118,6 +125,13 @@ env:
     value: '{common_config['embedding_model']}'
 """
     
+    # Tuning knobs read by app/utils (anything not listed keeps its code default)
+    overrides = app_env_overrides(config, environment)
+    if overrides:
+        app_yaml_content += "  \n  # Tuning overrides (app_env in config.yaml)\n"
+        for name, value in overrides.items():
+            app_yaml_content += f"  - name: '{name}'\n    value: '{value}'\n"
+    
     return app_yaml_content
 
 
@@ -2,11 +2,13 @@
 # Grant Service Principal Permissions
 # This script grants the app's service principal permissions to:
 # 1. Catalog (USE_CATALOG)
-# 2. Schema (USE_SCHEMA, SELECT)
+# 2. Schema (USE_SCHEMA, SELECT, CREATE_TABLE for the app's cache table)
 # 3. SQL Warehouse (CAN_USE)
 # 4. UC Functions (EXECUTE on fraud_classify, fraud_extract_indicators, fraud_generate_explanation)
 # 5. Vector Index Source Table (SELECT on fraud_cases_kb)
 # 6. Genie Space (CAN_USE) - for natural language queries
+# 7. Shared data cache table (SELECT, MODIFY on app_data_cache)
+# 8. LLM result cache table (SELECT, MODIFY on llm_result_cache)
 #
 # Usage:
 #   ./grant_permissions.sh [environment]
@@ -106,10 +108,10 @@ echo -e "      ${GREEN}✅ USE_CATALOG granted on ${CATALOG}${NC}"
 # 2. Schema permissions
 echo "  2️⃣  Granting SCHEMA permissions..."
 databricks grants update schema ${CATALOG}.${SCHEMA} \
-  --json "{\"changes\": [{\"principal\": \"$SP_ID\", \"add\": [\"USE_SCHEMA\", \"SELECT\"]}]}" \
+  --json "{\"changes\": [{\"principal\": \"$SP_ID\", \"add\": [\"USE_SCHEMA\", \"SELECT\", \"CREATE_TABLE\"]}]}" \
   --profile ${PROFILE} 2>&1 | grep -v "Warning" || true
 
-echo -e "      ${GREEN}✅ USE_SCHEMA, SELECT granted on ${CATALOG}.${SCHEMA}${NC}"
+echo -e "      ${GREEN}✅ USE_SCHEMA, SELECT, CREATE_TABLE granted on ${CATALOG}.${SCHEMA}${NC}"
 
 # 3. Warehouse permissions
 echo "  3️⃣  Granting WAREHOUSE permissions..."
@@ -143,6 +145,13 @@ databricks grants update function ${CATALOG}.${SCHEMA}.fraud_generate_explanatio
 
 echo -e "      ${GREEN}✅ EXECUTE granted on fraud_generate_explanation${NC}"
 
+# Grant EXECUTE on fraud_analyze_full (single-pass analysis)
+databricks grants update function ${CATALOG}.${SCHEMA}.fraud_analyze_full \
+  --json "{\"changes\": [{\"principal\": \"$SP_ID\", \"add\": [\"EXECUTE\"]}]}" \
+  --profile ${PROFILE} 2>&1 | grep -v "Warning" || true
+
+echo -e "      ${GREEN}✅ EXECUTE granted on fraud_analyze_full${NC}"
+
 # 5. Vector index source table permissions (SELECT)
 echo "  5️⃣  Granting VECTOR INDEX source table permissions..."
 databricks grants update table ${CATALOG}.${SCHEMA}.fraud_cases_kb \
@@ -192,6 +201,22 @@ else
     echo -e "      ${GREEN}✅ CAN_USE granted on Genie Space${NC}"
 fi
 
+# 7. Shared data cache table (the app creates it on first use; grant in case it was created by someone else)
+echo "  7️⃣  Granting SHARED CACHE table permissions..."
+databricks grants update table ${CATALOG}.${SCHEMA}.app_data_cache \
+  --json "{\"changes\": [{\"principal\": \"$SP_ID\", \"add\": [\"SELECT\", \"MODIFY\"]}]}" \
+  --profile ${PROFILE} 2>&1 | grep -v "Warning" || true
+
+echo -e "      ${GREEN}✅ SELECT, MODIFY granted on app_data_cache (shared data cache)${NC}"
+
+# 8. LLM result cache table (usually created by the batch job, so the app does not own it)
+echo "  8️⃣  Granting LLM RESULT CACHE table permissions..."
+databricks grants update table ${CATALOG}.${SCHEMA}.llm_result_cache \
+  --json "{\"changes\": [{\"principal\": \"$SP_ID\", \"add\": [\"SELECT\", \"MODIFY\"]}]}" \
+  --profile ${PROFILE} 2>&1 | grep -v "Warning" || true
+
+echo -e "      ${GREEN}✅ SELECT, MODIFY granted on llm_result_cache (UC function result cache)${NC}"
+
 echo ""
 echo "========================================================================"
 echo -e "${GREEN}✅ ALL PERMISSIONS GRANTED SUCCESSFULLY!${NC}"
@@ -201,8 +226,10 @@ echo "Your app should now be able to:"
 echo "  ✅ Access catalog: ${CATALOG}"
 echo "  ✅ Query schema: ${CATALOG}.${SCHEMA}"
 echo "  ✅ Use warehouse: ${WAREHOUSE_ID}"
-echo "  ✅ Execute UC functions: fraud_classify, fraud_extract_indicators, fraud_generate_explanation"
+echo "  ✅ Execute UC functions: fraud_classify, fraud_extract_indicators, fraud_generate_explanation, fraud_analyze_full"
 echo "  ✅ Query vector index: ${CATALOG}.${SCHEMA}.fraud_cases_index"
+echo "  ✅ Read and write the shared data cache: ${CATALOG}.${SCHEMA}.app_data_cache"
+echo "  ✅ Read and write the LLM result cache: ${CATALOG}.${SCHEMA}.llm_result_cache"
 if [ ! -z "$GENIE_SPACE_ID" ]; then
     echo "  ✅ Query Genie Space: ${GENIE_SPACE_ID}"
 fi
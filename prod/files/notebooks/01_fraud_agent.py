@@ -420,11 +420,25 @@ for i, doc in enumerate(search_results, 1):
 
 # COMMAND ----------
 
+import hashlib
+import threading
+from concurrent.futures import Future
+
+GENIE_CACHE_TTL_SECONDS = 900  # Answers also expire whenever fraud_analysis changes
+
 class GenieConversationTool:
     """
     Genie Conversation API wrapper using WorkspaceClient.
     Same class as dashboard - directly portable!
+    
+    Answers are cached per (space, normalized question) and concurrent identical
+    questions share one conversation - same behaviour as app/utils/genie_client.py.
     """
+    # Shared across instances (the agent tool creates a new instance per call)
+    _cache = {}
+    _inflight = {}
+    _lock = threading.Lock()
+    
     def __init__(self, workspace_client: WorkspaceClient, space_id: str):
         self.w = workspace_client
         self.space_id = space_id
@@ -491,7 +505,55 @@ class GenieConversationTool:
         print(f"[Genie] ⏱️ Timeout after {max_wait_seconds}s")
         return {'status': 'timeout', 'error': f'Query did not complete within {max_wait_seconds}s'}
     
+    def _cache_key(self, question: str):
+        normalized = " ".join(question.lower().split()).rstrip("?.! ")
+        return hashlib.sha256(f"{self.space_id}|{normalized}".encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _data_version():
+        """Delta version of fraud_analysis - cached answers are only valid for the version they saw"""
+        try:
+            return spark.sql(f"DESCRIBE HISTORY {CATALOG}.{SCHEMA}.fraud_analysis LIMIT 1").first()['version']
+        except Exception:
+            return None
+    
     def query(self, question: str):
+        """Cached, coalesced Genie query (see query_uncached for the workflow)"""
+        key = self._cache_key(question)
+        version = self._data_version()
+        
+        with GenieConversationTool._lock:
+            entry = GenieConversationTool._cache.get(key)
+            if entry and entry['version'] == version and time.time() - entry['stored_at'] < GENIE_CACHE_TTL_SECONDS:
+                print(f"[Genie] ⚡ Cache hit for: {question[:100]}")
+                return dict(entry['result'], cached=True)
+            future = GenieConversationTool._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                GenieConversationTool._inflight[key] = future
+        
+        if not owner:
+            print(f"[Genie] 🔗 Waiting on identical in-flight question: {question[:100]}")
+            return dict(future.result(), coalesced=True)
+        
+        try:
+            result = self.query_uncached(question)
+            if 'error' not in result:
+                with GenieConversationTool._lock:
+                    GenieConversationTool._cache[key] = {
+                        'result': result, 'version': version, 'stored_at': time.time()
+                    }
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with GenieConversationTool._lock:
+                GenieConversationTool._inflight.pop(key, None)
+    
+    def query_uncached(self, question: str):
         """
         Complete Genie query workflow: start → poll → extract results → fetch data
         Returns structured results with actual data rows or error message.
@@ -1060,10 +1122,13 @@ result_3 = run_agent_test("Need to integrate our system with Salesforce API for
 
 # COMMAND ----------
 
-def sequential_pipeline(claim_text: str):
+def sequential_pipeline(claim_text: str, single_pass: bool = False):
     """
     Run all 4 tools sequentially (current dashboard approach).
     Always executes all tools regardless of claim complexity.
+    
+    single_pass=True replaces the classify + extract calls with one
+    fraud_analyze_full call (see setup/05a_uc_fraud_analyze_full.py).
     """
     print("\n" + "=" * 80)
     print("🔄 SEQUENTIAL PIPELINE - Running ALL tools")
@@ -1072,15 +1137,24 @@ def sequential_pipeline(claim_text: str):
     start_time = time.time()
     results = {}
     
-    # Step 1: Classify
-    print("1️⃣ Step 1: Classifying claim...")
-    results['classification'] = call_uc_function("fraud_classify", {"claim_text": claim_text})
-    print(f"   ✅ Done\n")
-    
-    # Step 2: Extract
-    print("2️⃣ Step 2: Extracting metadata...")
-    results['metadata'] = call_uc_function("fraud_extract_indicators", {"claim_text": claim_text})
-    print(f"   ✅ Done\n")
+    if single_pass:
+        # Steps 1+2: One model call returns classification, indicators and explanation
+        print("1️⃣ Step 1+2: Classifying and extracting metadata (single pass)...")
+        full = call_uc_function("fraud_analyze_full", {"claim_text": claim_text}) or {}
+        results['classification'] = full.get('classification')
+        results['metadata'] = full.get('indicators')
+        results['explanation'] = full.get('explanation')
+        print(f"   ✅ Done\n")
+    else:
+        # Step 1: Classify
+        print("1️⃣ Step 1: Classifying claim...")
+        results['classification'] = call_uc_function("fraud_classify", {"claim_text": claim_text})
+        print(f"   ✅ Done\n")
+        
+        # Step 2: Extract
+        print("2️⃣ Step 2: Extracting metadata...")
+        results['metadata'] = call_uc_function("fraud_extract_indicators", {"claim_text": claim_text})
+        print(f"   ✅ Done\n")
     
     # Step 3: Search
     print("3️⃣ Step 3: Searching fraud knowledge base...")
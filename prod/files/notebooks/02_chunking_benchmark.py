@@ -0,0 +1,147 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Chunking Benchmark (offline)
+# MAGIC
+# MAGIC Compares knowledge base chunking strategies from `shared/chunking.py` before changing 06a:
+# MAGIC
+# MAGIC - **Chunk count** and token size distribution (tiny chunks waste index space)
+# MAGIC - **Embedding cost** in tokens sent to `cfg.embedding_model` (optionally priced)
+# MAGIC - **Recall@k / MRR** on a labelled query set - a query is a hit if a chunk of the document that answers it is in the top k
+# MAGIC
+# MAGIC Embeddings are computed in memory. Nothing is written to the knowledge base table or the vector index.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+dbutils.widgets.text("environment", "prod", "Environment")
+dbutils.widgets.text("k", "3", "Recall@k")
+dbutils.widgets.text("cost_per_million_tokens", "0", "Embedding $ per 1M tokens")
+
+# COMMAND ----------
+
+import sys
+import os
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+from shared.chunking import CharChunker, TokenCounter, get_chunker, parse_document, benchmark_chunkers
+
+env = dbutils.widgets.get("environment")
+cfg = get_config(env)
+K = int(dbutils.widgets.get("k"))
+COST_PER_MILLION = float(dbutils.widgets.get("cost_per_million_tokens"))
+
+print(f"Volume: {cfg.volume_path}")
+print(f"Embedding model: {cfg.embedding_model}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Load Documents and Labelled Queries
+
+# COMMAND ----------
+
+documents = {}
+for file_info in dbutils.fs.ls(cfg.volume_path):
+    if file_info.path.endswith('.txt'):
+        with open(file_info.path.replace("dbfs:", ""), encoding="utf-8") as f:
+            doc = parse_document(f.read())
+        documents[doc['doc_id']] = doc['text']
+
+# Each query is answered by one knowledge base document (see 06_create_knowledge_base.py)
+labelled_queries = [
+    {"query": "Same procedure charged twice within 24 hours", "doc_id": "FRAUD-BILLING-001"},
+    {"query": "Charges far above the market rate and unbundled components", "doc_id": "FRAUD-BILLING-001"},
+    {"query": "Billing for equipment that was never delivered", "doc_id": "FRAUD-BILLING-001"},
+    {"query": "Claimant details don't match the policy holder's SSN", "doc_id": "FRAUD-IDENTITY-001"},
+    {"query": "One insurance card used in two cities on the same day", "doc_id": "FRAUD-IDENTITY-001"},
+    {"query": "Provider license can't be verified and the address is residential", "doc_id": "FRAUD-PROVIDER-001"},
+    {"query": "Payments to a doctor in exchange for patient referrals", "doc_id": "FRAUD-PROVIDER-001"},
+    {"query": "Old vehicle damage reported as part of a new incident", "doc_id": "FRAUD-EXAGGERATION-001"},
+    {"query": "Physical therapy continuing long after normal recovery time", "doc_id": "FRAUD-EXAGGERATION-001"},
+    {"query": "Witnesses in a car crash gave conflicting stories and know each other", "doc_id": "FRAUD-STAGED-001"},
+    {"query": "Police report contradicts the accident described in the claim", "doc_id": "FRAUD-STAGED-001"},
+    {"query": "When should a claim over $50,000 be escalated?", "doc_id": "FRAUD-INVESTIGATION-001"},
+    {"query": "Steps to verify documentation and medical records during a review", "doc_id": "FRAUD-INVESTIGATION-001"},
+    {"query": "Can we deny a claim based only on the model's decision?", "doc_id": "FRAUD-LEGAL-001"},
+    {"query": "HIPAA and privacy rules for investigation files", "doc_id": "FRAUD-LEGAL-001"},
+]
+labelled_queries = [q for q in labelled_queries if q["doc_id"] in documents]
+
+print(f"✅ Loaded {len(documents)} documents and {len(labelled_queries)} labelled queries")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Embedding Function
+
+# COMMAND ----------
+
+from databricks.sdk import WorkspaceClient
+
+w = WorkspaceClient()
+EMBED_BATCH_SIZE = 64
+
+def embed(texts):
+    """Embed texts with the knowledge base's embedding endpoint (batched)"""
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        response = w.api_client.do(
+            'POST', f'/serving-endpoints/{cfg.embedding_model}/invocations', body={"input": batch}
+        )
+        vectors.extend(item["embedding"] for item in response["data"])
+    return vectors
+
+print(f"✅ Embedding with {cfg.embedding_model}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Run Benchmark
+
+# COMMAND ----------
+
+count_tokens = TokenCounter(cfg.embedding_model)
+print(f"Token counts: {'model tokenizer' if count_tokens.exact else 'estimated (transformers not available)'}")
+
+chunkers = {
+    "char (original, 1500 chars)": CharChunker(max_chunk_size=1500),
+    "token 256 / overlap 32": get_chunker("token", cfg.embedding_model, max_tokens=256, min_tokens=48,
+                                          overlap_tokens=32, count_tokens=count_tokens),
+    "token 384 / overlap 48": get_chunker("token", cfg.embedding_model, max_tokens=384, min_tokens=64,
+                                          overlap_tokens=48, count_tokens=count_tokens),
+    "token 512 / overlap 64": get_chunker("token", cfg.embedding_model, max_tokens=512, min_tokens=96,
+                                          overlap_tokens=64, count_tokens=count_tokens),
+}
+
+results = benchmark_chunkers(
+    documents, labelled_queries, chunkers, embed,
+    k=K, count_tokens=count_tokens, cost_per_million_tokens=COST_PER_MILLION
+)
+
+import pandas as pd
+display(pd.DataFrame(results))
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Summary
+
+# COMMAND ----------
+
+best = max(results, key=lambda r: (r[f"recall@{K}"], r["mrr"], -r["embed_tokens"]))
+
+print("=" * 80)
+print("CHUNKING BENCHMARK")
+print("=" * 80)
+for r in results:
+    print(f"{r['chunker']:<30} chunks={r['chunks']:<5} min_tokens={r['min_tokens']:<5} "
+          f"embed_tokens={r['embed_tokens']:<7} recall@{K}={r[f'recall@{K}']:.2f} mrr={r['mrr']:.2f}")
+print("=" * 80)
+print(f"✅ Best: {best['chunker']}")
+print("\n📝 Apply it by setting the chunk_* widgets on 06a_chunk_knowledge_base.py")
+print("=" * 80)
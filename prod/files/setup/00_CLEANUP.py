@@ -108,7 +108,7 @@ try:
     print(f"✅ Dropped schema: {cfg.catalog}.{cfg.schema}")
     print("   ✅ All tables removed (claims, fraud_cases_kb)")
     print("   ✅ All volumes removed")
-    print("   ✅ All functions removed (fraud_classify, fraud_extract_indicators, fraud_generate_explanation)")
+    print("   ✅ All functions removed (fraud_classify, fraud_extract_indicators, fraud_generate_explanation, fraud_analyze_full)")
 except Exception as e:
     print(f"❌ Error dropping schema: {e}")
 
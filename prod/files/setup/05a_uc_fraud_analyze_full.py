@@ -0,0 +1,113 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # UC Function: fraud_analyze_full
+# MAGIC
+# MAGIC Single-pass healthcare fraud analysis: classification, fraud indicators and adjudicator
+# MAGIC explanation from ONE model call. Returns the same three structs as
+# MAGIC fraud_classify / fraud_extract_indicators / fraud_generate_explanation, so callers can
+# MAGIC opt into it without changing how results are read, while sending the claim text once
+# MAGIC instead of three times.
+# MAGIC All configuration from config.yaml.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+# Add this before get_config()
+dbutils.widgets.text("environment", "prod", "Environment")
+
+# COMMAND ----------
+
+import sys
+import os
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+
+env = dbutils.widgets.get("environment")
+cfg = get_config(env)
+
+print(f"Creating function in: {cfg.catalog}.{cfg.schema}")
+print(f"Using LLM: {cfg.llm_endpoint}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Drop Existing Function
+
+# COMMAND ----------
+
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_analyze_full")
+print("Dropped existing function (if any)")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Create UC Function
+
+# COMMAND ----------
+
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_analyze_full(claim_text STRING)
+RETURNS STRUCT<
+  classification: STRUCT<is_fraudulent: BOOLEAN, fraud_probability: DOUBLE, fraud_type: STRING, confidence: DOUBLE>,
+  indicators: STRUCT<red_flags: ARRAY<STRING>, suspicious_patterns: ARRAY<STRING>, risk_score: DOUBLE, affected_entities: ARRAY<STRING>>,
+  explanation: STRUCT<explanation: STRING, evidence: ARRAY<STRING>, recommendations: ARRAY<STRING>>
+>
+COMMENT 'Classifies a healthcare claim, extracts fraud indicators and explains the decision in a single AI call'
+RETURN 
+  FROM_JSON(
+    TRIM(REGEXP_REPLACE(REGEXP_REPLACE(
+      AI_QUERY(
+        'databricks-claude-sonnet-4-5',
+        CONCAT(
+          'You are a healthcare fraud detection AI working for a payer. Return ONLY a JSON object.\\n\\n',
+          'CLAIM: ', claim_text, '\\n\\n',
+          'Return this JSON: {{',
+          '"classification": {{"is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "Upcoding/Unbundling/Phantom/Duplicate/Unnecessary/Kickback/Identity/Prescription/None", "confidence": 0.0-1.0}}, ',
+          '"indicators": {{"red_flags": ["flag1", "flag2"], "suspicious_patterns": ["pattern1"], "risk_score": 0.9, "affected_entities": ["entity1"]}}, ',
+          '"explanation": {{"explanation": "summary text for a claims adjuster", "evidence": ["fact1", "fact2"], "recommendations": ["action1", "action2"]}}',
+          '}}\\n\\n',
+          'Rules: If claim says "billed X but actually Y" then is_fraudulent=true. If provider has fraud pattern then is_fraudulent=true. If amount 2-3x higher then is_fraudulent=true.\\n',
+          'The explanation must justify the classification decision.\\n\\n',
+          'Return ONLY the JSON object, no other text.'
+        )
+      ), '```json', ''), '```', '')),
+    'STRUCT<classification:STRUCT<is_fraudulent:BOOLEAN,fraud_probability:DOUBLE,fraud_type:STRING,confidence:DOUBLE>,indicators:STRUCT<red_flags:ARRAY<STRING>,suspicious_patterns:ARRAY<STRING>,risk_score:DOUBLE,affected_entities:ARRAY<STRING>>,explanation:STRUCT<explanation:STRING,evidence:ARRAY<STRING>,recommendations:ARRAY<STRING>>>'
+  )
+""")
+
+print(f"✅ Function created: {cfg.catalog}.{cfg.schema}.fraud_analyze_full")
+print(f"✅ Includes markdown stripping (removes ```json and ``` wrappers)")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Test Function
+
+# COMMAND ----------
+
+test_result = spark.sql(f"""
+SELECT {cfg.catalog}.{cfg.schema}.fraud_analyze_full(
+  'Healthcare claim: Patient billed for CPT 99215 (complex office visit) but medical notes indicate routine check-up. Provider has 4 similar upcoding patterns this month. Claim amount $450 vs typical $150.'
+) as analysis
+""").collect()[0]
+
+analysis = test_result['analysis']
+print("Test Result:")
+print(f"  Is Fraudulent: {analysis['classification']['is_fraudulent']}")
+print(f"  Fraud Type: {analysis['classification']['fraud_type']}")
+print(f"  Risk Score: {analysis['indicators']['risk_score']}")
+print(f"  Red Flags: {analysis['indicators']['red_flags']}")
+print(f"  Explanation: {analysis['explanation']['explanation']}")
+
+# COMMAND ----------
+
+print("=" * 80)
+print("UC FUNCTION CREATED SUCCESSFULLY!")
+print("=" * 80)
+print(f"✅ Function: {cfg.catalog}.{cfg.schema}.fraud_analyze_full")
+print("   1 AI_QUERY call per claim instead of 3 (classify + extract + explain)")
+print("=" * 80)
@@ -3,6 +3,17 @@
 # MAGIC # Chunk Fraud Knowledge Base for Vector Search
 # MAGIC
 # MAGIC Reads documents from volume, chunks them optimally, and creates table with Change Data Feed enabled.
+# MAGIC
+# MAGIC Each chunk gets a stable `chunk_id` built from (doc_id, chunk_index, content hash). Chunks are
+# MAGIC MERGEd into the table: unchanged chunks are left alone, so Change Data Feed only carries new,
+# MAGIC edited and deleted chunks and the vector index re-embeds just those rows on sync.
+# MAGIC
+# MAGIC Ingestion runs on the executors: files are read with Spark's `binaryFile` source (no size cap)
+# MAGIC and chunked with `mapInPandas`, so thousands of documents scale with cluster size.
+# MAGIC
+# MAGIC Chunking comes from `shared/chunking.py`. The default `token` strategy sizes chunks in
+# MAGIC `cfg.embedding_model` tokens, merges undersized sections, keeps sentences whole and overlaps
+# MAGIC neighbouring chunks. `char` is the original splitter. Compare them with `notebooks/02_chunking_benchmark.py`.
 
 # COMMAND ----------
 
@@ -13,6 +24,11 @@
 
 # Add this before get_config()
 dbutils.widgets.text("environment", "prod", "Environment")
+dbutils.widgets.dropdown("rebuild", "false", ["false", "true"], "Drop and rebuild table")
+dbutils.widgets.dropdown("chunk_strategy", "token", ["token", "char"], "Chunking strategy")
+dbutils.widgets.text("chunk_max_tokens", "384", "Max tokens per chunk")
+dbutils.widgets.text("chunk_min_tokens", "64", "Min tokens per chunk")
+dbutils.widgets.text("chunk_overlap_tokens", "48", "Overlap tokens")
 
 # COMMAND ----------
 
@@ -20,34 +36,58 @@ import sys
 import os
 sys.path.append(os.path.abspath('..'))
 from shared.config import get_config
+import shared.chunking
+from shared.chunking import get_chunker, parse_document
+from pyspark import cloudpickle
+
+# Executors don't have shared/ on their path - ship the module with the chunking function
+cloudpickle.register_pickle_by_value(shared.chunking)
 
 env = dbutils.widgets.get("environment")
 cfg = get_config(env)
 
 VOLUME_PATH = cfg.volume_path
 FULL_TABLE_NAME = cfg.knowledge_base_table
+REBUILD = dbutils.widgets.get("rebuild") == "true"
+
+chunker = get_chunker(
+    dbutils.widgets.get("chunk_strategy"),
+    embedding_model=cfg.embedding_model,
+    max_tokens=int(dbutils.widgets.get("chunk_max_tokens")),
+    min_tokens=int(dbutils.widgets.get("chunk_min_tokens")),
+    overlap_tokens=int(dbutils.widgets.get("chunk_overlap_tokens"))
+)
 
 print(f"Table: {FULL_TABLE_NAME}")
 print(f"Volume: {VOLUME_PATH}")
+print(f"Mode: {'rebuild' if REBUILD else 'incremental'}")
+if chunker.name == "token":
+    print(f"Chunking: {chunker.max_tokens} max / {chunker.min_tokens} min / {chunker.overlap_tokens} overlap tokens "
+          f"({'model tokenizer' if chunker.count_tokens.exact else 'estimated tokens'}, {cfg.embedding_model})")
+else:
+    print(f"Chunking: {chunker.max_chunk_size} chars (original splitter)")
 
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Drop and Recreate Table with CDF
+# MAGIC ## Create Table with CDF (if needed)
 
 # COMMAND ----------
 
-# Drop and recreate for clean slate
-print(f"🔄 Dropping and recreating table for clean slate")
-try:
+# Tables from before chunk_id existed were keyed on doc_id - rebuild those once
+if spark.catalog.tableExists(FULL_TABLE_NAME) and "chunk_id" not in spark.table(FULL_TABLE_NAME).columns:
+    print("⚠️  Existing table has no chunk_id column - rebuilding")
+    REBUILD = True
+
+if REBUILD:
+    print(f"🔄 Dropping table for a full rebuild")
     spark.sql(f"DROP TABLE IF EXISTS {FULL_TABLE_NAME}")
     print(f"✅ Dropped existing table: {FULL_TABLE_NAME}")
-except Exception as e:
-    print(f"ℹ️  No existing table to drop: {e}")
 
 # Create table with proper schema for chunked documents and CDF enabled
 spark.sql(f"""
-    CREATE TABLE {FULL_TABLE_NAME} (
+    CREATE TABLE IF NOT EXISTS {FULL_TABLE_NAME} (
+        chunk_id STRING NOT NULL,
         doc_id STRING,
         doc_type STRING,
         title STRING,
@@ -57,12 +97,13 @@ spark.sql(f"""
         total_chunks INT,
         char_count INT,
         created_at TIMESTAMP,
-        file_name STRING
+        file_name STRING,
+        content_hash STRING
     )
     USING DELTA
     TBLPROPERTIES ('delta.enableChangeDataFeed' = 'true')
 """)
-print(f"✅ Table created with Change Data Feed enabled: {FULL_TABLE_NAME}")
+print(f"✅ Table ready with Change Data Feed enabled: {FULL_TABLE_NAME}")
 
 # COMMAND ----------
 
@@ -72,8 +113,14 @@ print(f"✅ Table created with Change Data Feed enabled: {FULL_TABLE_NAME}")
 # COMMAND ----------
 
 from datetime import datetime
+import hashlib
 import re
 
+def make_chunk_id(doc_id, chunk_index, content):
+    """Stable chunk key: same document, position and text -> same ID"""
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return f"{doc_id}-{chunk_index:04d}-{content_hash[:12]}", content_hash
+
 def extract_keywords(text, max_keywords=10):
     """Extract keywords from text"""
     stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
@@ -96,115 +143,39 @@ def extract_keywords(text, max_keywords=10):
     keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:max_keywords]
     return [word for word, freq in keywords]
 
-def split_into_sections(content):
-    """Split document into logical sections"""
-    sections = []
-    current_section = ""
-    current_title = ""
-    
-    lines = content.split('\n')
+def chunk_document(content, file_path):
+    """Chunk one document's full text (runs on executors - no dbutils here; errors propagate)"""
+    # Extract metadata from content
+    doc = parse_document(content)
+    doc_id, doc_type, title = doc['doc_id'], doc['doc_type'], doc['title']
+    file_name = file_path.split('/')[-1]
     
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        
-        # Check if this is a section header (all caps, short line, or numbered)
-        is_header = (
-            (stripped.isupper() and len(stripped) < 80 and len(stripped) > 5) or
-            (re.match(r'^\d+\.', stripped)) or
-            (re.match(r'^[A-Z][^.!?]*:$', stripped))
-        )
-        
-        if is_header and current_section:
-            # Save previous section
-            sections.append({'title': current_title, 'content': current_section.strip()})
-            current_section = line + '\n'
-            current_title = stripped
-        else:
-            current_section += line + '\n'
+    chunks = chunker.chunk(doc['text'])
     
-    # Add final section
-    if current_section:
-        sections.append({'title': current_title, 'content': current_section.strip()})
+    # Create chunk records
+    total_chunks = len(chunks)
+    chunk_records = []
     
-    return sections
-
-def chunk_document(file_path, min_chunk_size=800, max_chunk_size=1500):
-    """Read and chunk a document from volume"""
-    try:
-        # Read file content
-        content = dbutils.fs.head(file_path, 1000000)  # Read up to 1MB
-        
-        # Extract metadata from content
-        lines = content.split('\n')
-        doc_id = ""
-        doc_type = ""
-        title = ""
-        main_content = []
-        
-        for i, line in enumerate(lines):
-            if line.startswith("Document ID:"):
-                doc_id = line.replace("Document ID:", "").strip()
-            elif line.startswith("Type:"):
-                doc_type = line.replace("Type:", "").strip()
-            elif line.startswith("Title:"):
-                title = line.replace("Title:", "").strip()
-            elif i > 4:  # Skip metadata lines
-                main_content.append(line)
-        
-        content_text = '\n'.join(main_content).strip()
-        file_name = file_path.split('/')[-1]
-        
-        # Split into sections
-        sections = split_into_sections(content_text)
+    for idx, chunk_content in enumerate(chunks):
+        keywords = extract_keywords(chunk_content)
+        chunk_id, content_hash = make_chunk_id(doc_id, idx, chunk_content)
         
-        chunks = []
-        for section in sections:
-            section_content = section['content']
-            
-            # If section is small enough, keep as single chunk
-            if len(section_content) <= max_chunk_size:
-                chunks.append(section_content)
-            else:
-                # Split large sections by paragraphs
-                paragraphs = section_content.split('\n\n')
-                current_chunk = ""
-                
-                for para in paragraphs:
-                    if len(current_chunk) + len(para) <= max_chunk_size:
-                        current_chunk += para + '\n\n'
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk.strip())
-                        current_chunk = para + '\n\n'
-                
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-        
-        # Create chunk records
-        total_chunks = len(chunks)
-        chunk_records = []
-        
-        for idx, chunk_content in enumerate(chunks):
-            keywords = extract_keywords(chunk_content)
-            
-            chunk_records.append({
-                'doc_id': doc_id,
-                'doc_type': doc_type,
-                'title': title,
-                'content': chunk_content,
-                'keywords': keywords,
-                'chunk_index': idx,
-                'total_chunks': total_chunks,
-                'char_count': len(chunk_content),
-                'created_at': datetime.now(),
-                'file_name': file_name
-            })
-        
-        return chunk_records
+        chunk_records.append({
+            'chunk_id': chunk_id,
+            'doc_id': doc_id,
+            'doc_type': doc_type,
+            'title': title,
+            'content': chunk_content,
+            'keywords': keywords,
+            'chunk_index': idx,
+            'total_chunks': total_chunks,
+            'char_count': len(chunk_content),
+            'created_at': datetime.now(),
+            'file_name': file_name,
+            'content_hash': content_hash
+        })
     
-    except Exception as e:
-        print(f"Error processing {file_path}: {e}")
-        return []
+    return chunk_records
 
 print("✅ Chunking functions loaded")
 
@@ -212,34 +183,18 @@ print("✅ Chunking functions loaded")
 
 # MAGIC %md
 # MAGIC ## Process All Documents
-
-# COMMAND ----------
-
-# List all files in volume
-files = dbutils.fs.ls(VOLUME_PATH)
-print(f"Found {len(files)} files in volume")
-
-all_chunks = []
-for file_info in files:
-    if file_info.path.endswith('.txt'):
-        print(f"Processing: {file_info.name}")
-        chunks = chunk_document(file_info.path)
-        all_chunks.extend(chunks)
-        print(f"  → Created {len(chunks)} chunks")
-
-print(f"\n✅ Total chunks created: {len(all_chunks)}")
-
-# COMMAND ----------
-
-# MAGIC %md
-# MAGIC ## Insert Chunks into Table
+# MAGIC
+# MAGIC `binaryFile` reads each file whole (no 1MB `dbutils.fs.head` cap) and `mapInPandas` chunks
+# MAGIC them in parallel. Arrow batches are kept small so large documents don't pile up in executor memory.
 
 # COMMAND ----------
 
 from pyspark.sql.types import *
+import pandas as pd
 
 # Define schema
 chunk_schema = StructType([
+    StructField("chunk_id", StringType(), False),
     StructField("doc_id", StringType(), False),
     StructField("doc_type", StringType(), False),
     StructField("title", StringType(), False),
@@ -249,16 +204,106 @@ chunk_schema = StructType([
     StructField("total_chunks", IntegerType(), False),
     StructField("char_count", IntegerType(), False),
     StructField("created_at", TimestampType(), False),
-    StructField("file_name", StringType(), False)
+    StructField("file_name", StringType(), False),
+    StructField("content_hash", StringType(), False)
 ])
+CHUNK_COLUMNS = chunk_schema.fieldNames()
+
+# Each file is one row - a few files per Arrow batch bounds memory for large documents
+spark.conf.set("spark.sql.execution.arrow.maxRecordsPerBatch", "8")
+
+files_df = (
+    spark.read.format("binaryFile")
+    .option("pathGlobFilter", "*.txt")
+    .option("recursiveFileLookup", "true")
+    .load(VOLUME_PATH)
+    .select("path", "length", "content")
+)
+
+file_stats = files_df.selectExpr("COUNT(*) AS files", "COALESCE(SUM(length), 0) AS bytes").collect()[0]
+num_files = file_stats['files']
+print(f"Found {num_files} .txt files in volume ({file_stats['bytes'] / 1024 / 1024:.1f} MB)")
+
+def chunk_files(batches):
+    """mapInPandas: (path, length, content bytes) batches -> chunk record batches"""
+    for batch in batches:
+        records = []
+        for path, raw in zip(batch["path"], batch["content"]):
+            text = bytes(raw).decode("utf-8", errors="replace")
+            try:
+                records.extend(chunk_document(text, path))
+            except Exception as e:
+                # Fail the Spark job (and the notebook) before the MERGE, naming the file
+                raise RuntimeError(f"Error chunking {path}: {e}") from e
+        yield pd.DataFrame(records, columns=CHUNK_COLUMNS)
+
+# Spread files over the cluster (binaryFile packs many small files into one partition)
+num_partitions = max(1, min(num_files, spark.sparkContext.defaultParallelism * 2))
+chunks_df = files_df.repartition(num_partitions, "path").mapInPandas(chunk_files, schema=chunk_schema).cache()
+chunks_df.createOrReplaceTempView("new_chunks")
+
+# The MERGE deletes every chunk this run did not produce - a file without chunks would lose its rows
+missing_files = [
+    row['file_name'] for row in
+    files_df.selectExpr("element_at(split(path, '/'), -1) AS file_name").distinct()
+    .join(chunks_df.select("file_name").distinct(), "file_name", "left_anti")
+    .collect()
+]
+if missing_files:
+    raise RuntimeError(
+        f"{len(missing_files)} file(s) produced no chunks - not merging, existing chunks kept: "
+        f"{', '.join(sorted(missing_files)[:20])}"
+    )
+
+print(f"✅ Chunked {num_files} files across {num_partitions} partitions")
 
-# Create DataFrame and write to table
-if all_chunks:
-    chunks_df = spark.createDataFrame(all_chunks, schema=chunk_schema)
-    chunks_df.write.mode("append").saveAsTable(FULL_TABLE_NAME)
-    print(f"✅ Inserted {len(all_chunks)} chunks into {FULL_TABLE_NAME}")
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Merge Chunks into Table
+# MAGIC
+# MAGIC - New chunk_id → INSERT (embedded on next sync)
+# MAGIC - Same chunk_id → left untouched unless document metadata changed
+# MAGIC - chunk_id no longer produced (edited or removed document) → DELETE
+# MAGIC
+# MAGIC The run stops before this step if chunking a file raises (the Spark job fails with the file
+# MAGIC path) or any file produced no chunks, so a failed read or parse never deletes a document's
+# MAGIC existing chunks.
+
+# COMMAND ----------
+
+# MERGE so only changed chunks show up in the Change Data Feed
+if num_files:
+    merge_metrics = spark.sql(f"""
+    MERGE INTO {FULL_TABLE_NAME} AS t
+    USING new_chunks AS s
+    ON t.chunk_id = s.chunk_id
+    WHEN MATCHED AND (
+        t.title IS DISTINCT FROM s.title OR
+        t.doc_type IS DISTINCT FROM s.doc_type OR
+        t.total_chunks IS DISTINCT FROM s.total_chunks OR
+        t.file_name IS DISTINCT FROM s.file_name
+    ) THEN UPDATE SET
+        t.title = s.title,
+        t.doc_type = s.doc_type,
+        t.total_chunks = s.total_chunks,
+        t.file_name = s.file_name
+    WHEN NOT MATCHED THEN INSERT *
+    WHEN NOT MATCHED BY SOURCE THEN DELETE
+    """).collect()[0]
+    chunks_df.unpersist()
+    
+    # Every source chunk is either matched or inserted, so the table now holds exactly this run's chunks
+    total_chunks = spark.table(FULL_TABLE_NAME).count()
+    
+    print(f"✅ Merged {total_chunks} chunks into {FULL_TABLE_NAME}")
+    print(f"   Inserted: {merge_metrics['num_inserted_rows']}")
+    print(f"   Updated:  {merge_metrics['num_updated_rows']}")
+    print(f"   Deleted:  {merge_metrics['num_deleted_rows']}")
+    print(f"   Unchanged: {total_chunks - merge_metrics['num_inserted_rows'] - merge_metrics['num_updated_rows']}")
 else:
-    print("⚠️  No chunks to insert")
+    total_chunks = 0
+    print("⚠️  No files found - table left unchanged")
 
 # COMMAND ----------
 
@@ -277,6 +322,7 @@ SELECT
     COUNT(DISTINCT doc_id) as unique_docs,
     AVG(char_count) as avg_chunk_size,
     MIN(char_count) as min_chunk_size,
+    SUM(CASE WHEN char_count < 200 THEN 1 ELSE 0 END) as tiny_chunks,
     MAX(char_count) as max_chunk_size
 FROM {FULL_TABLE_NAME}
 """).collect()[0]
@@ -286,12 +332,13 @@ print(f"Unique Docs:     {stats['unique_docs']}")
 print(f"Avg Chunk Size:  {stats['avg_chunk_size']:.0f} chars")
 print(f"Min Chunk Size:  {stats['min_chunk_size']} chars")
 print(f"Max Chunk Size:  {stats['max_chunk_size']} chars")
+print(f"Tiny (<200 ch):  {stats['tiny_chunks']}")
 print("=" * 80)
 
 # Show sample chunks
 print("\nSample chunks:")
 display(spark.sql(f"""
-SELECT doc_id, title, chunk_index, total_chunks, char_count, LEFT(content, 100) as content_preview
+SELECT chunk_id, doc_id, title, chunk_index, total_chunks, char_count, LEFT(content, 100) as content_preview
 FROM {FULL_TABLE_NAME}
 LIMIT 5
 """))
@@ -304,12 +351,13 @@ LIMIT 5
 # COMMAND ----------
 
 print("=" * 80)
-print("KNOWLEDGE BASE TABLE CREATED WITH CDF!")
+print("KNOWLEDGE BASE TABLE UPDATED WITH CDF!")
 print("=" * 80)
 print(f"✅ Table: {FULL_TABLE_NAME}")
 print(f"✅ Change Data Feed: ENABLED")
-print(f"✅ Total Chunks: {len(all_chunks)}")
+print(f"✅ Files: {num_files}")
+print(f"✅ Total Chunks: {total_chunks}")
 print("=" * 80)
-print("\n📝 Next step: Run 07_create_vector_index.py to create vector search index")
+print("\n📝 Next step: Run 07_create_vector_index.py to create or sync the vector search index")
 print("=" * 80)
 
@@ -4,6 +4,9 @@
 # MAGIC
 # MAGIC Creates vector search index for semantic search of fraud cases.
 # MAGIC All configuration from config.yaml.
+# MAGIC
+# MAGIC The index is keyed on `chunk_id` (see 06a), so a TRIGGERED sync only re-embeds chunks that
+# MAGIC 06a inserted, updated or deleted. Indexes created with the old `doc_id` key are recreated once.
 
 # COMMAND ----------
 
@@ -107,25 +110,43 @@ if not endpoint_exists:
 
 print(f"Checking if vector search index exists: {cfg.vector_index}")
 
+PRIMARY_KEY = "chunk_id"
+
+def index_primary_key(index):
+    """Primary key of an existing index, or None if it can't be read"""
+    try:
+        return index.describe().get('primary_key')
+    except Exception:
+        return None
+
 # Check if index already exists by listing all indexes
 index_exists = False
 try:
     # Try to get the index directly
     existing_index = vsc.get_index(cfg.vector_index)
-    if existing_index:
+    existing_key = index_primary_key(existing_index) if existing_index else None
+    if existing_index and existing_key not in (None, PRIMARY_KEY):
+        # doc_id is shared by every chunk of a document - one embedding per doc, not per chunk
+        print(f"⚠️  Existing index is keyed on '{existing_key}', expected '{PRIMARY_KEY}'")
+        print("   Deleting it so it can be recreated with chunk-level keys...")
+        vsc.delete_index(endpoint_name=cfg.vector_endpoint, index_name=cfg.vector_index)
+        time.sleep(10)
+        print("✅ Old index deleted")
+    elif existing_index:
         index_exists = True
         status = existing_index.get('status', {}).get('detailed_state', 'UNKNOWN')
         print(f"✅ Index already exists: {cfg.vector_index}")
         print(f"   Status: {status}")
         print(f"   Source: {cfg.knowledge_base_table}")
+        print(f"   Primary key: {existing_key or PRIMARY_KEY}")
         print(f"   Embedding model: {cfg.embedding_model}")
         print("\nℹ️  Skipping index creation (already exists)")
         print("   To recreate the index, delete it manually first:")
         print(f"   - Go to Databricks UI > Compute > Vector Search")
         print(f"   - Or run: vsc.delete_index('{cfg.vector_index}')")
         
-        # Trigger sync on existing index
-        print("\nTriggering sync on existing index...")
+        # Trigger sync on existing index - only changed chunks are re-embedded
+        print("\nTriggering incremental sync on existing index...")
         try:
             vsc.get_index(index_name=cfg.vector_index).sync()
             print("✅ Sync triggered successfully")
@@ -159,7 +180,7 @@ if not index_exists:
             source_table_name=cfg.knowledge_base_table,
             index_name=cfg.vector_index,
             pipeline_type="TRIGGERED",
-            primary_key="doc_id",
+            primary_key=PRIMARY_KEY,
             embedding_source_column="content",
             embedding_model_endpoint_name=cfg.embedding_model
         )
@@ -212,7 +233,7 @@ print("Testing vector search...")
 try:
     results = vsc.get_index(index_name=cfg.vector_index).similarity_search(
         query_text="How to detect billing fraud with duplicate charges?",
-        columns=["doc_id", "doc_type", "title", "content"],
+        columns=["doc_id", "doc_type", "title", "content", "chunk_id"],
         num_results=3
     )
     
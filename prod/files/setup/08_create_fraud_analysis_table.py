@@ -65,7 +65,13 @@ CREATE TABLE {cfg.catalog}.{cfg.schema}.fraud_analysis (
     -- From fraud_generate_explanation function
     explanation STRING,
     evidence ARRAY<STRING>,
-    recommendations ARRAY<STRING>
+    recommendations ARRAY<STRING>,
+    
+    -- SHA-256 of the claim_text that was analyzed (drives incremental re-analysis)
+    claim_text_hash STRING,
+    
+    -- Audit: which path decided the result (rules_legit / rules_fraud / llm)
+    decision_path STRING
 )
 USING DELTA
 COMMENT 'Fraud detection analysis results for all claims'
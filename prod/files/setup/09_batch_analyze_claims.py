@@ -2,8 +2,22 @@
 # MAGIC %md
 # MAGIC # Batch Analyze All Claims
 # MAGIC
-# MAGIC Runs the 3 UC fraud detection functions on all claims and stores results.
+# MAGIC Runs the 3 UC fraud detection functions on claims and stores results.
 # MAGIC This populates the fraud_analysis table for Genie queries.
+# MAGIC
+# MAGIC **Modes:**
+# MAGIC - `incremental` (default): only claims that are new, or whose `claim_text` changed since
+# MAGIC   they were last analyzed, are scored and MERGEd into fraud_analysis
+# MAGIC - `full`: re-score every claim and overwrite fraud_analysis
+# MAGIC
+# MAGIC Set `single_pass` to `true` to use `fraud_analyze_full` (one AI_QUERY per claim)
+# MAGIC instead of the three separate classify / extract / explain functions.
+# MAGIC
+# MAGIC With `prescreen` on, deterministic rules (amount vs. claim-type range, fraud pattern
+# MAGIC keywords, later copies of a claim in the batch) decide obvious fraud first; only the
+# MAGIC rest reach the LLM. `prescreen_legit` (off by default) also lets the rules clear claims
+# MAGIC with a low amount for their type and no red flags.
+# MAGIC The `decision_path` column records which path decided each claim.
 
 # COMMAND ----------
 
@@ -14,6 +28,12 @@
 
 # Add this before get_config()
 dbutils.widgets.text("environment", "prod", "Environment")
+dbutils.widgets.dropdown("mode", "incremental", ["incremental", "full"], "Mode")
+dbutils.widgets.dropdown("single_pass", "false", ["false", "true"], "Single-pass (fraud_analyze_full)")
+dbutils.widgets.dropdown("prescreen", "true", ["true", "false"], "Pre-screen with rules")
+dbutils.widgets.dropdown("prescreen_legit", "false", ["false", "true"], "Pre-screen clears low-risk claims")
+dbutils.widgets.text("prescreen_legit_threshold", "0.0", "Pre-screen legit threshold")
+dbutils.widgets.text("prescreen_fraud_threshold", "0.7", "Pre-screen fraud threshold")
 
 # COMMAND ----------
 
@@ -26,10 +46,21 @@ from datetime import datetime
 from pyspark.sql.functions import col, current_timestamp
 
 env = dbutils.widgets.get("environment")
+mode = dbutils.widgets.get("mode")
+SINGLE_PASS = dbutils.widgets.get("single_pass") == "true"
+PRESCREEN = dbutils.widgets.get("prescreen") == "true"
+PRESCREEN_LEGIT = dbutils.widgets.get("prescreen_legit") == "true"
+PRESCREEN_LEGIT_THRESHOLD = float(dbutils.widgets.get("prescreen_legit_threshold"))
+PRESCREEN_FRAUD_THRESHOLD = float(dbutils.widgets.get("prescreen_fraud_threshold"))
 cfg = get_config(env)
 
+ANALYSIS_TABLE = f"{cfg.catalog}.{cfg.schema}.fraud_analysis"
+
 print(f"Analyzing claims from: {cfg.claims_table}")
-print(f"Storing results in: {cfg.catalog}.{cfg.schema}.fraud_analysis")
+print(f"Storing results in: {ANALYSIS_TABLE}")
+print(f"Mode: {mode}")
+print(f"Analysis: {'single-pass fraud_analyze_full' if SINGLE_PASS else 'classify + extract + explain'}")
+print(f"Pre-screen: {'on' if PRESCREEN else 'off'}")
 
 # TESTING: Set to a small number for testing, or None to process all claims
 TEST_LIMIT = 10  # Change to None to process all claims
@@ -42,8 +73,30 @@ print(f"\n⚠️  TEST MODE: Processing only {TEST_LIMIT} claims" if TEST_LIMIT
 
 # COMMAND ----------
 
-# Load all claims (or filter for new/unanalyzed claims)
-claims_df = spark.table(cfg.claims_table)
+# Tables created before claim_text_hash / decision_path existed get the columns added here
+if mode == "incremental":
+    if not spark.catalog.tableExists(ANALYSIS_TABLE):
+        print("⚠️  fraud_analysis does not exist yet - falling back to full mode")
+        mode = "full"
+    else:
+        existing_columns = spark.table(ANALYSIS_TABLE).columns
+        for column in ["claim_text_hash", "decision_path"]:
+            if column not in existing_columns:
+                spark.sql(f"ALTER TABLE {ANALYSIS_TABLE} ADD COLUMNS ({column} STRING)")
+                print(f"✅ Added {column} column to fraud_analysis")
+
+if mode == "incremental":
+    # New claims, or claims whose text changed since they were analyzed
+    # (rows analyzed before the hash column existed have NULL and are re-scored once)
+    claims_df = spark.sql(f"""
+    SELECT c.*
+    FROM {cfg.claims_table} c
+    LEFT ANTI JOIN {ANALYSIS_TABLE} f
+        ON c.claim_id = f.claim_id
+        AND f.claim_text_hash = SHA2(c.claim_text, 256)
+    """)
+else:
+    claims_df = spark.table(cfg.claims_table)
 
 # Apply test limit if set
 if TEST_LIMIT:
@@ -53,6 +106,9 @@ if TEST_LIMIT:
 total_claims = claims_df.count()
 print(f"📊 Found {total_claims} claims to analyze")
 
+if total_claims == 0:
+    dbutils.notebook.exit("No new or changed claims - fraud_analysis is up to date")
+
 # Show sample
 print("\nSample claims:")
 display(claims_df.limit(3))
@@ -63,103 +119,257 @@ claims_df.createOrReplaceTempView("claims_to_process")
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Batch Process Claims Using UC Functions
+# MAGIC ## Prepare LLM Result Cache
+# MAGIC
+# MAGIC Results are looked up in the same content-addressed cache the Streamlit app uses
+# MAGIC (`llm_result_cache`), so unchanged claims are never re-scored by AI_QUERY.
 
 # COMMAND ----------
 
-# Register UDFs that call the UC functions
-# This allows us to process in batch rather than row-by-row
+# Shared cache key definition lives with the app code
+sys.path.append(os.path.abspath('../app'))
+from utils.llm_cache import (
+    CACHE_TABLE_NAME, EST_COST_PER_CALL,
+    cache_key_sql, cache_table_ddl, function_versions_sql
+)
 
-print("Running batch fraud analysis...")
-print("This will call all 3 UC functions for each claim...")
-print("Note: Some claims may be skipped if they trigger content filters")
+CACHE_TABLE = f"{cfg.catalog}.{cfg.schema}.{CACHE_TABLE_NAME}"
+spark.sql(cache_table_ddl(CACHE_TABLE))
 
-# Process claims with error handling using TRY/CATCH
-# Call all 3 UC functions using SQL with try_* functions for error handling
-analyzed_df = spark.sql(f"""
-SELECT 
-    claim_id,
-    CURRENT_TIMESTAMP() as analysis_timestamp,
-    claim_text,
-    
-    -- Call fraud_classify with error handling
-    TRY_CAST(
-        {cfg.catalog}.{cfg.schema}.fraud_classify(claim_text) 
-        AS STRUCT<is_fraudulent:BOOLEAN, fraud_probability:DOUBLE, fraud_type:STRING, confidence:DOUBLE>
-    ) as classification,
+# Version = hash of each function's SQL body, so prompt edits invalidate old entries
+fn_versions = {
+    row['routine_name']: row['version']
+    for row in spark.sql(function_versions_sql(cfg.catalog, cfg.schema)).collect()
+}
+
+def fn_version(function_name):
+    return fn_versions.get(function_name, "v0")
+
+print(f"✅ LLM result cache: {CACHE_TABLE}")
+for fn in ["fraud_classify", "fraud_extract_indicators", "fraud_generate_explanation", "fraud_analyze_full"]:
+    print(f"   {fn}: version {fn_version(fn)}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Pre-screen Claims with Deterministic Rules
+# MAGIC
+# MAGIC Same rules as the Batch Processing page (`app/utils/prescreen.py`), compiled to SQL.
+
+# COMMAND ----------
+
+from utils.prescreen import prescreen_sql, DECISION_FRAUD, DECISION_LLM
+
+if PRESCREEN:
+    # Like the page, only later copies of a claim text within this batch count as duplicates
+    prescreened_df = spark.sql(prescreen_sql(
+        source="claims_to_process",
+        legit_threshold=PRESCREEN_LEGIT_THRESHOLD,
+        fraud_threshold=PRESCREEN_FRAUD_THRESHOLD,
+        allow_legit=PRESCREEN_LEGIT
+    ))
+    prescreened_df.cache()
+    prescreened_df.createOrReplaceTempView("prescreened_claims")
     
-    -- Call fraud_extract_indicators with error handling
-    TRY_CAST(
-        {cfg.catalog}.{cfg.schema}.fraud_extract_indicators(claim_text)
-        AS STRUCT<red_flags:ARRAY<STRING>, suspicious_patterns:ARRAY<STRING>, risk_score:DOUBLE, affected_entities:ARRAY<STRING>>
-    ) as indicators
+    path_counts = {row['decision_path']: row['count'] for row in prescreened_df.groupBy("decision_path").count().collect()}
+    print("=" * 80)
+    print("PRE-SCREEN RESULTS")
+    print("=" * 80)
+    print(f"Decided legitimate by rules: {path_counts.get('rules_legit', 0)}")
+    print(f"Decided fraud by rules:      {path_counts.get('rules_fraud', 0)}")
+    print(f"Sent to LLM:                 {path_counts.get(DECISION_LLM, 0)}")
+    print("=" * 80)
     
-FROM claims_to_process
-""")
+    spark.sql(f"SELECT * FROM prescreened_claims WHERE decision_path = '{DECISION_LLM}'") \
+        .createOrReplaceTempView("claims_for_llm")
+else:
+    spark.sql(f"SELECT *, '{DECISION_LLM}' AS decision_path FROM claims_to_process") \
+        .createOrReplaceTempView("claims_for_llm")
 
-# Now we need to call fraud_generate_explanation with the classification results
-# First, persist the intermediate results
-analyzed_df.createOrReplaceTempView("temp_analysis")
+CLASSIFY_SCHEMA = "STRUCT<is_fraudulent:BOOLEAN, fraud_probability:DOUBLE, fraud_type:STRING, confidence:DOUBLE>"
+INDICATORS_SCHEMA = "STRUCT<red_flags:ARRAY<STRING>, suspicious_patterns:ARRAY<STRING>, risk_score:DOUBLE, affected_entities:ARRAY<STRING>>"
+EXPLANATION_SCHEMA = "STRUCT<explanation:STRING, evidence:ARRAY<STRING>, recommendations:ARRAY<STRING>>"
+FULL_SCHEMA = f"STRUCT<classification:{CLASSIFY_SCHEMA}, indicators:{INDICATORS_SCHEMA}, explanation:{EXPLANATION_SCHEMA}>"
 
-# Call explanation function with classification results - skip rows with NULL classification
-final_df = spark.sql(f"""
-SELECT 
-    t.claim_id,
-    t.analysis_timestamp,
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Batch Process Claims Using UC Functions
+
+# COMMAND ----------
+
+print("Running batch fraud analysis...")
+print("Note: Some claims may be skipped if they trigger content filters")
+
+if SINGLE_PASS:
+    print("Calling fraud_analyze_full once for each claim not already in the cache...")
+
+    # One AI_QUERY returns classification, indicators and explanation together
+    final_df = spark.sql(f"""
+    WITH keyed AS (
+        SELECT
+            claim_id,
+            claim_text,
+            {cache_key_sql('fraud_analyze_full', fn_version('fraud_analyze_full'), [('claim_text', 'string')])} AS full_key
+        FROM claims_for_llm
+    ),
+    scored AS (
+        SELECT
+            k.claim_id,
+            CURRENT_TIMESTAMP() as analysis_timestamp,
+            k.claim_text,
+            k.full_key,
+            cf.result_json IS NOT NULL as full_cached,
+            CASE
+                WHEN cf.result_json IS NOT NULL THEN FROM_JSON(cf.result_json, '{FULL_SCHEMA}')
+                ELSE TRY_CAST({cfg.catalog}.{cfg.schema}.fraud_analyze_full(k.claim_text) AS {FULL_SCHEMA})
+            END as full_result
+        FROM keyed k
+        LEFT JOIN {CACHE_TABLE} cf ON cf.cache_key = k.full_key
+    )
+    SELECT
+        *,
+        full_result.classification as classification,
+        full_result.indicators as indicators,
+        full_result.explanation as explanation_result
+    FROM scored
+    """)
+else:
+    print("Calling all 3 UC functions for each claim not already in the cache...")
+
+    # Call classify + extract only on cache misses (CASE is evaluated lazily)
+    analyzed_df = spark.sql(f"""
+    WITH keyed AS (
+        SELECT
+            claim_id,
+            claim_text,
+            {cache_key_sql('fraud_classify', fn_version('fraud_classify'), [('claim_text', 'string')])} AS classify_key,
+            {cache_key_sql('fraud_extract_indicators', fn_version('fraud_extract_indicators'), [('claim_text', 'string')])} AS indicators_key
+        FROM claims_for_llm
+    )
+    SELECT 
+        k.claim_id,
+        CURRENT_TIMESTAMP() as analysis_timestamp,
+        k.claim_text,
+        k.classify_key,
+        k.indicators_key,
+        cc.result_json IS NOT NULL as classify_cached,
+        ci.result_json IS NOT NULL as indicators_cached,
     
-    -- Extract classification fields (with NULL handling)
-    COALESCE(t.classification.is_fraudulent, FALSE) as is_fraudulent,
-    COALESCE(t.classification.fraud_probability, 0.0) as fraud_probability,
-    COALESCE(t.classification.fraud_type, 'Unknown') as fraud_type,
-    COALESCE(t.classification.confidence, 0.0) as classification_confidence,
+        -- Call fraud_classify with error handling
+        CASE
+            WHEN cc.result_json IS NOT NULL THEN FROM_JSON(cc.result_json, '{CLASSIFY_SCHEMA}')
+            ELSE TRY_CAST({cfg.catalog}.{cfg.schema}.fraud_classify(k.claim_text) AS {CLASSIFY_SCHEMA})
+        END as classification,
     
-    -- Extract indicator fields (with NULL handling)
-    COALESCE(t.indicators.red_flags, ARRAY()) as red_flags,
-    COALESCE(t.indicators.suspicious_patterns, ARRAY()) as suspicious_patterns,
-    COALESCE(t.indicators.risk_score, 0.0) as risk_score,
-    COALESCE(t.indicators.affected_entities, ARRAY()) as affected_entities,
+        -- Call fraud_extract_indicators with error handling
+        CASE
+            WHEN ci.result_json IS NOT NULL THEN FROM_JSON(ci.result_json, '{INDICATORS_SCHEMA}')
+            ELSE TRY_CAST({cfg.catalog}.{cfg.schema}.fraud_extract_indicators(k.claim_text) AS {INDICATORS_SCHEMA})
+        END as indicators
     
-    -- Call explanation function with error handling (only if classification succeeded)
-    CASE 
-        WHEN t.classification IS NOT NULL THEN
-            TRY_CAST(
-                {cfg.catalog}.{cfg.schema}.fraud_generate_explanation(
-                    t.claim_text,
-                    t.classification.is_fraudulent,
-                    t.classification.fraud_type
-                ) AS STRUCT<explanation:STRING, evidence:ARRAY<STRING>, recommendations:ARRAY<STRING>>
-            )
-        ELSE NULL
-    END as explanation_result
+    FROM keyed k
+    LEFT JOIN {CACHE_TABLE} cc ON cc.cache_key = k.classify_key
+    LEFT JOIN {CACHE_TABLE} ci ON ci.cache_key = k.indicators_key
+    """)
+
+    # Now we need to call fraud_generate_explanation with the classification results
+    # First, persist the intermediate results
+    analyzed_df.createOrReplaceTempView("temp_analysis")
+
+    # Call explanation function with classification results - skip rows with NULL classification
+    final_df = spark.sql(f"""
+    WITH keyed AS (
+        SELECT
+            t.*,
+            {cache_key_sql('fraud_generate_explanation', fn_version('fraud_generate_explanation'), [
+                ('t.claim_text', 'string'),
+                ('t.classification.is_fraudulent', 'boolean'),
+                ('t.classification.fraud_type', 'string')
+            ])} AS explanation_key
+        FROM temp_analysis t
+    )
+    SELECT 
+        t.*,
+        ce.result_json IS NOT NULL as explanation_cached,
     
-FROM temp_analysis t
-""")
+        -- Call explanation function with error handling (only if classification succeeded)
+        CASE 
+            WHEN t.classification IS NULL THEN NULL
+            WHEN ce.result_json IS NOT NULL THEN FROM_JSON(ce.result_json, '{EXPLANATION_SCHEMA}')
+            ELSE
+                TRY_CAST(
+                    {cfg.catalog}.{cfg.schema}.fraud_generate_explanation(
+                        t.claim_text,
+                        t.classification.is_fraudulent,
+                        t.classification.fraud_type
+                    ) AS {EXPLANATION_SCHEMA}
+                )
+        END as explanation_result
+    
+    FROM keyed t
+    LEFT JOIN {CACHE_TABLE} ce ON ce.cache_key = t.explanation_key
+    """)
 
-# Extract explanation fields
-# First create temp view from final_df
+# IMPORTANT: Cache the result to avoid re-computing expensive LLM calls
+# (both the results table and the cache write-back below read from it)
+print("Caching results to avoid re-computation...")
+final_df.cache()
 final_df.createOrReplaceTempView("temp_final")
 
+# Extract classification, indicator and explanation fields (with NULL handling)
 final_with_explanation = spark.sql(f"""
 SELECT 
     claim_id,
     analysis_timestamp,
-    is_fraudulent,
-    fraud_probability,
-    fraud_type,
-    classification_confidence,
-    red_flags,
-    suspicious_patterns,
-    risk_score,
-    affected_entities,
+    COALESCE(classification.is_fraudulent, FALSE) as is_fraudulent,
+    COALESCE(classification.fraud_probability, 0.0) as fraud_probability,
+    COALESCE(classification.fraud_type, 'Unknown') as fraud_type,
+    COALESCE(classification.confidence, 0.0) as classification_confidence,
+    COALESCE(indicators.red_flags, ARRAY()) as red_flags,
+    COALESCE(indicators.suspicious_patterns, ARRAY()) as suspicious_patterns,
+    COALESCE(indicators.risk_score, 0.0) as risk_score,
+    COALESCE(indicators.affected_entities, ARRAY()) as affected_entities,
     COALESCE(explanation_result.explanation, 'No explanation available') as explanation,
     COALESCE(explanation_result.evidence, ARRAY()) as evidence,
-    COALESCE(explanation_result.recommendations, ARRAY()) as recommendations
+    COALESCE(explanation_result.recommendations, ARRAY()) as recommendations,
+    SHA2(claim_text, 256) as claim_text_hash,
+    '{DECISION_LLM}' as decision_path
 FROM temp_final
 """)
 
-# IMPORTANT: Cache the result to avoid re-computing expensive LLM calls
-print("Caching results to avoid re-computation...")
-final_with_explanation.cache()
+# Claims decided by the pre-screen rules never reached the LLM
+if PRESCREEN:
+    rules_df = spark.sql(f"""
+    SELECT 
+        claim_id,
+        CURRENT_TIMESTAMP() as analysis_timestamp,
+        decision_path = '{DECISION_FRAUD}' as is_fraudulent,
+        CASE WHEN decision_path = '{DECISION_FRAUD}' THEN prescreen_score ELSE 0.0D END as fraud_probability,
+        CASE WHEN decision_path = '{DECISION_FRAUD}' THEN prescreen_fraud_type ELSE 'None' END as fraud_type,
+        prescreen_confidence as classification_confidence,
+        prescreen_reasons as red_flags,
+        CAST(ARRAY() AS ARRAY<STRING>) as suspicious_patterns,
+        prescreen_score as risk_score,
+        CAST(ARRAY() AS ARRAY<STRING>) as affected_entities,
+        CONCAT(
+            'Decided by pre-screen rules (score ', CAST(ROUND(prescreen_score, 2) AS STRING), '): ',
+            CASE WHEN SIZE(prescreen_reasons) = 0
+                THEN 'low amount for the claim type and no fraud indicators'
+                ELSE ARRAY_JOIN(prescreen_reasons, '; ')
+            END
+        ) as explanation,
+        prescreen_reasons as evidence,
+        CASE WHEN decision_path = '{DECISION_FRAUD}'
+            THEN ARRAY('Route to special investigations for review')
+            ELSE ARRAY('Process through standard adjudication')
+        END as recommendations,
+        SHA2(claim_text, 256) as claim_text_hash,
+        decision_path
+    FROM prescreened_claims
+    WHERE decision_path != '{DECISION_LLM}'
+    """)
+    final_with_explanation = final_with_explanation.unionByName(rules_df)
 
 # Count successful vs failed analyses
 success_count = final_with_explanation.filter("explanation != 'No explanation available'").count()
@@ -169,6 +379,70 @@ if success_count < total_claims:
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Update LLM Result Cache
+
+# COMMAND ----------
+
+# Write back fresh (non-NULL) results so the app and the next run can reuse them
+if SINGLE_PASS:
+    spark.sql(f"""
+    MERGE INTO {CACHE_TABLE} AS c
+    USING (
+        SELECT full_key AS cache_key, 'fraud_analyze_full' AS function_name,
+               '{fn_version('fraud_analyze_full')}' AS function_version, TO_JSON(full_result) AS result_json
+        FROM temp_final WHERE NOT full_cached AND full_result IS NOT NULL
+    ) AS s
+    ON c.cache_key = s.cache_key
+    WHEN NOT MATCHED THEN INSERT (cache_key, function_name, function_version, result_json, created_at)
+    VALUES (s.cache_key, s.function_name, s.function_version, s.result_json, CURRENT_TIMESTAMP())
+    """)
+
+    cache_stats = spark.sql("""
+    SELECT SUM(CAST(full_cached AS INT)) AS hits, COUNT(*) AS lookups
+    FROM temp_final
+    """).collect()[0]
+else:
+    spark.sql(f"""
+    MERGE INTO {CACHE_TABLE} AS c
+    USING (
+        SELECT classify_key AS cache_key, 'fraud_classify' AS function_name,
+               '{fn_version('fraud_classify')}' AS function_version, TO_JSON(classification) AS result_json
+        FROM temp_final WHERE NOT classify_cached AND classification IS NOT NULL
+        UNION ALL
+        SELECT indicators_key, 'fraud_extract_indicators',
+               '{fn_version('fraud_extract_indicators')}', TO_JSON(indicators)
+        FROM temp_final WHERE NOT indicators_cached AND indicators IS NOT NULL
+        UNION ALL
+        SELECT explanation_key, 'fraud_generate_explanation',
+               '{fn_version('fraud_generate_explanation')}', TO_JSON(explanation_result)
+        FROM temp_final WHERE NOT explanation_cached AND explanation_result IS NOT NULL
+    ) AS s
+    ON c.cache_key = s.cache_key
+    WHEN NOT MATCHED THEN INSERT (cache_key, function_name, function_version, result_json, created_at)
+    VALUES (s.cache_key, s.function_name, s.function_version, s.result_json, CURRENT_TIMESTAMP())
+    """)
+
+    cache_stats = spark.sql("""
+    SELECT
+        SUM(CAST(classify_cached AS INT)) + SUM(CAST(indicators_cached AS INT))
+            + SUM(CAST(explanation_cached AS INT)) AS hits,
+        COUNT(*) * 3 AS lookups
+    FROM temp_final
+    """).collect()[0]
+
+cache_hits = cache_stats['hits'] or 0
+cache_lookups = cache_stats['lookups'] or 0
+print("=" * 80)
+print("LLM RESULT CACHE")
+print("=" * 80)
+print(f"Cache hits:      {cache_hits} / {cache_lookups} function calls")
+print(f"Hit rate:        {(cache_hits / cache_lookups * 100) if cache_lookups else 0:.1f}%")
+print(f"Est. cost saved: ${cache_hits * EST_COST_PER_CALL:.4f}")
+print("=" * 80)
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Show Sample Results
 
@@ -186,15 +460,26 @@ display(final_with_explanation.limit(3))
 
 # COMMAND ----------
 
-# Write results to fraud_analysis table
-final_with_explanation.write.mode("overwrite").saveAsTable(
-    f"{cfg.catalog}.{cfg.schema}.fraud_analysis"
-)
+if mode == "full":
+    # Write results to fraud_analysis table
+    final_with_explanation.write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(ANALYSIS_TABLE)
+else:
+    # Upsert only the re-scored claims; everything else is left untouched
+    final_with_explanation.createOrReplaceTempView("new_analysis")
+    spark.sql(f"""
+    MERGE INTO {ANALYSIS_TABLE} AS t
+    USING new_analysis AS s
+    ON t.claim_id = s.claim_id
+    WHEN MATCHED THEN UPDATE SET *
+    WHEN NOT MATCHED THEN INSERT *
+    """)
 
 # Unpersist cache after write
-final_with_explanation.unpersist()
+final_df.unpersist()
+if PRESCREEN:
+    prescreened_df.unpersist()
 
-print(f"✅ Saved {total_claims} fraud analysis results to table")
+print(f"✅ Saved {total_claims} fraud analysis results to table ({mode} mode)")
 
 # COMMAND ----------
 
@@ -215,7 +500,7 @@ SELECT
     AVG(risk_score) as avg_risk_score,
     MIN(analysis_timestamp) as analysis_start,
     MAX(analysis_timestamp) as analysis_end
-FROM {cfg.catalog}.{cfg.schema}.fraud_analysis
+FROM {ANALYSIS_TABLE}
 """).collect()[0]
 
 print(f"Total Analyzed:  {stats['total_analyzed']}")
@@ -228,7 +513,7 @@ print("=" * 80)
 print("\nFraud Types:")
 display(spark.sql(f"""
 SELECT fraud_type, COUNT(*) as count
-FROM {cfg.catalog}.{cfg.schema}.fraud_analysis
+FROM {ANALYSIS_TABLE}
 WHERE is_fraudulent = TRUE
 GROUP BY fraud_type
 ORDER BY count DESC
@@ -266,7 +551,8 @@ print(f"✅ Analyzed: {total_claims} claims")
 print(f"✅ Results stored in: {cfg.catalog}.{cfg.schema}.fraud_analysis")
 print(f"✅ Unified view ready: {cfg.catalog}.{cfg.schema}.fraud_claims_complete")
 print("=" * 80)
-print("\n📝 Next step: Update Genie Space to query fraud_claims_complete view")
+print("\n📝 Next step: Run 11_refresh_insights_aggregates.py to update the Fraud Insights dashboard")
+print("   Then update Genie Space to query fraud_claims_complete view")
 print("   Or test queries in Genie: 'Show me all fraudulent claims'")
 print("=" * 80)
 
@@ -0,0 +1,301 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Refresh Fraud Insights Aggregates
+# MAGIC
+# MAGIC Maintains the small pre-aggregated tables the Fraud Insights dashboard reads, so page load
+# MAGIC does not grow with fraud_analysis:
+# MAGIC
+# MAGIC | Table | Grain | Feeds |
+# MAGIC |-------|-------|-------|
+# MAGIC | `fraud_insights_daily` | analysis date | KPIs and trends |
+# MAGIC | `fraud_insights_by_type` | fraud type (fraudulent claims) | Fraud type distribution |
+# MAGIC | `fraud_insights_indicators` | red flag (fraudulent claims) | Top red flags |
+# MAGIC
+# MAGIC **Incremental:** fraud_analysis has Change Data Feed enabled. Each run reads only the changes
+# MAGIC since the version recorded in `fraud_insights_state` to find the keys (dates, fraud types,
+# MAGIC red flags) they touched, recomputes just those keys from fraud_analysis, and MERGEs the
+# MAGIC results over the old rows. Replacing instead of adding deltas makes a run that fails before
+# MAGIC recording its state safe to repeat.
+# MAGIC
+# MAGIC **Full rebuild** happens on the first run, when fraud_analysis was recreated (08) or overwritten
+# MAGIC (09 `full` mode), or when the needed change data is no longer available.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+# Add this before get_config()
+dbutils.widgets.text("environment", "prod", "Environment")
+dbutils.widgets.dropdown("rebuild", "false", ["false", "true"], "Force full rebuild")
+
+# COMMAND ----------
+
+import sys
+import os
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+from pyspark.sql.functions import col
+
+env = dbutils.widgets.get("environment")
+FORCE_REBUILD = dbutils.widgets.get("rebuild") == "true"
+cfg = get_config(env)
+
+SOURCE_TABLE = cfg.analysis_table
+AGGREGATE_TABLES = [cfg.insights_daily_table, cfg.insights_by_type_table, cfg.insights_indicators_table]
+
+print(f"Source: {SOURCE_TABLE}")
+for table in AGGREGATE_TABLES:
+    print(f"Aggregate: {table}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Create Aggregate Tables (if needed)
+
+# COMMAND ----------
+
+spark.sql(f"""
+CREATE TABLE IF NOT EXISTS {cfg.insights_daily_table} (
+    analysis_date DATE,
+    total_claims BIGINT,
+    fraud_cases BIGINT,
+    risk_score_sum DOUBLE,
+    risk_score_count BIGINT
+)
+USING DELTA
+COMMENT 'Daily claim and fraud counts from fraud_analysis (maintained by 11_refresh_insights_aggregates)'
+""")
+
+spark.sql(f"""
+CREATE TABLE IF NOT EXISTS {cfg.insights_by_type_table} (
+    fraud_type STRING,
+    fraud_cases BIGINT
+)
+USING DELTA
+COMMENT 'Fraudulent claims per fraud type (maintained by 11_refresh_insights_aggregates)'
+""")
+
+spark.sql(f"""
+CREATE TABLE IF NOT EXISTS {cfg.insights_indicators_table} (
+    indicator STRING,
+    occurrences BIGINT
+)
+USING DELTA
+COMMENT 'Red flag frequency across fraudulent claims (maintained by 11_refresh_insights_aggregates)'
+""")
+
+spark.sql(f"""
+CREATE TABLE IF NOT EXISTS {cfg.insights_state_table} (
+    aggregate_table STRING,
+    source_table_id STRING,
+    source_version BIGINT,
+    refresh_mode STRING,
+    refreshed_at TIMESTAMP
+)
+USING DELTA
+COMMENT 'Last fraud_analysis version folded into each insights aggregate'
+""")
+
+print("✅ Aggregate tables ready")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Aggregation Logic
+# MAGIC
+# MAGIC Every aggregate is a sum, so one query shape serves both modes: `sign` is 1 for every row of
+# MAGIC fraud_analysis, and ±1 per change row when listing the keys a set of changes touched.
+# MAGIC Full aggregates read fraud_analysis pinned to the version this run records in the state table.
+
+# COMMAND ----------
+
+def aggregate_queries(source):
+    """{aggregate table: (key column, SELECT of signed deltas over `source`)}"""
+    return {
+        cfg.insights_daily_table: ("analysis_date", f"""
+            SELECT
+                DATE(analysis_timestamp) AS analysis_date,
+                SUM(sign) AS total_claims,
+                SUM(CASE WHEN is_fraudulent THEN sign ELSE 0 END) AS fraud_cases,
+                SUM(CASE WHEN risk_score IS NOT NULL THEN sign * risk_score ELSE 0 END) AS risk_score_sum,
+                SUM(CASE WHEN risk_score IS NOT NULL THEN sign ELSE 0 END) AS risk_score_count
+            FROM {source}
+            GROUP BY DATE(analysis_timestamp)
+        """),
+        cfg.insights_by_type_table: ("fraud_type", f"""
+            SELECT fraud_type, SUM(sign) AS fraud_cases
+            FROM {source}
+            WHERE is_fraudulent = TRUE
+            GROUP BY fraud_type
+        """),
+        cfg.insights_indicators_table: ("indicator", f"""
+            SELECT indicator, SUM(sign) AS occurrences
+            FROM (SELECT explode(red_flags) AS indicator, sign FROM {source}
+                  WHERE is_fraudulent = TRUE AND red_flags IS NOT NULL)
+            GROUP BY indicator
+        """),
+    }
+
+# Rows whose count is missing after a recompute no longer exist in fraud_analysis
+COUNT_COLUMN = {
+    cfg.insights_daily_table: "total_claims",
+    cfg.insights_by_type_table: "fraud_cases",
+    cfg.insights_indicators_table: "occurrences",
+}
+
+def record_state(table, table_id, version, refresh_mode):
+    spark.sql(f"""
+    MERGE INTO {cfg.insights_state_table} AS t
+    USING (SELECT '{table}' AS aggregate_table, '{table_id}' AS source_table_id,
+                  {version} AS source_version, '{refresh_mode}' AS refresh_mode,
+                  current_timestamp() AS refreshed_at) AS s
+    ON t.aggregate_table = s.aggregate_table
+    WHEN MATCHED THEN UPDATE SET *
+    WHEN NOT MATCHED THEN INSERT *
+    """)
+
+def rebuild(table, select_sql, table_id, version):
+    spark.sql(f"INSERT OVERWRITE {table} {select_sql}")
+    record_state(table, table_id, version, "full")
+
+def apply_changes(table, key, full_sql, changes_sql, table_id, version):
+    """Recompute the keys touched by changes_sql from full_sql and replace their rows"""
+    count = COUNT_COLUMN[table]
+    spark.sql(f"""
+    MERGE INTO {table} AS t
+    USING (
+        SELECT c.{key}, f.* EXCEPT ({key})
+        FROM (SELECT DISTINCT {key} FROM ({changes_sql})) AS c
+        LEFT JOIN ({full_sql}) AS f ON c.{key} <=> f.{key}
+    ) AS s
+    ON t.{key} <=> s.{key}
+    WHEN MATCHED AND s.{count} IS NULL THEN DELETE
+    WHEN MATCHED THEN UPDATE SET *
+    WHEN NOT MATCHED AND s.{count} IS NOT NULL THEN INSERT *
+    """)
+    record_state(table, table_id, version, "incremental")
+
+print("✅ Aggregation functions loaded")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Refresh
+
+# COMMAND ----------
+
+if not spark.catalog.tableExists(SOURCE_TABLE):
+    dbutils.notebook.exit("fraud_analysis does not exist yet - run 08 and 09 first")
+
+detail = spark.sql(f"DESCRIBE DETAIL {SOURCE_TABLE}").first()
+source_id = detail['id']
+current_version = spark.sql(f"DESCRIBE HISTORY {SOURCE_TABLE} LIMIT 1").first()['version']
+
+state = {
+    row['aggregate_table']: row
+    for row in spark.sql(f"SELECT * FROM {cfg.insights_state_table}").collect()
+}
+
+# Overwrites (09 full mode) replace every row - CDF is not a reliable delta for those
+REPLACING_OPERATIONS = ['CREATE TABLE AS SELECT', 'CREATE OR REPLACE TABLE AS SELECT',
+                        'REPLACE TABLE AS SELECT', 'TRUNCATE']
+
+def overwritten_since(version):
+    history = spark.sql(f"DESCRIBE HISTORY {SOURCE_TABLE}").where(col("version") > version)
+    replaced = col("operation").isin(REPLACING_OPERATIONS) | (
+        (col("operation") == "WRITE") & (col("operationParameters")["mode"] == "Overwrite")
+    )
+    return history.where(replaced).count() > 0
+
+# Pin every read to current_version so the aggregates match the version recorded in state
+PINNED_SOURCE = f"{SOURCE_TABLE} VERSION AS OF {current_version}"
+full_queries = aggregate_queries(f"(SELECT *, 1 AS sign FROM {PINNED_SOURCE})")
+summary = []
+
+for table in AGGREGATE_TABLES:
+    key, full_sql = full_queries[table]
+    last = state.get(table)
+
+    reason = None
+    if FORCE_REBUILD:
+        reason = "forced"
+    elif last is None:
+        reason = "first run"
+    elif last['source_table_id'] != source_id:
+        reason = "fraud_analysis was recreated"
+    elif last['source_version'] > current_version:
+        reason = "source version went backwards"
+    elif last['source_version'] < current_version and overwritten_since(last['source_version']):
+        reason = "fraud_analysis was overwritten"
+
+    if reason:
+        rebuild(table, full_sql, source_id, current_version)
+        summary.append((table, f"full rebuild ({reason})"))
+        continue
+
+    if last['source_version'] == current_version:
+        summary.append((table, "up to date"))
+        continue
+
+    try:
+        spark.sql(f"""
+            SELECT *, CASE WHEN _change_type IN ('insert', 'update_postimage') THEN 1 ELSE -1 END AS sign
+            FROM table_changes('{SOURCE_TABLE}', {last['source_version'] + 1}, {current_version})
+        """).createOrReplaceTempView("analysis_changes")
+        _, changes_sql = aggregate_queries("analysis_changes")[table]
+        apply_changes(table, key, full_sql, changes_sql, source_id, current_version)
+        summary.append((table, f"incremental (versions {last['source_version'] + 1}-{current_version})"))
+    except Exception as e:
+        # Change data vacuumed or otherwise unavailable - recompute from scratch
+        print(f"⚠️  Incremental refresh of {table} failed ({e}); rebuilding")
+        rebuild(table, full_sql, source_id, current_version)
+        summary.append((table, "full rebuild (change data unavailable)"))
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Verify
+
+# COMMAND ----------
+
+def aggregate_totals():
+    return spark.sql(f"""
+    SELECT SUM(total_claims) AS total_claims, SUM(fraud_cases) AS fraud_cases
+    FROM {cfg.insights_daily_table}
+    """).first()
+
+source_totals = spark.sql(f"""
+SELECT COUNT(*) AS total_claims, SUM(CASE WHEN is_fraudulent THEN 1 ELSE 0 END) AS fraud_cases
+FROM {PINNED_SOURCE}
+""").first()
+expected = (source_totals['total_claims'], source_totals['fraud_cases'] or 0)
+
+def drifted(totals):
+    return (totals['total_claims'] or 0, totals['fraud_cases'] or 0) != expected
+
+totals = aggregate_totals()
+if drifted(totals):
+    print(f"⚠️  Aggregates drifted from fraud_analysis "
+          f"({totals['total_claims'] or 0} / {totals['fraud_cases'] or 0} claims / fraud "
+          f"vs {expected[0]} / {expected[1]}); rebuilding")
+    for table in AGGREGATE_TABLES:
+        rebuild(table, full_queries[table][1], source_id, current_version)
+    summary = [(table, "full rebuild (drift)") for table in AGGREGATE_TABLES]
+    totals = aggregate_totals()
+    if drifted(totals):
+        raise RuntimeError(
+            f"Insights aggregates still differ from {SOURCE_TABLE} version {current_version} after a rebuild"
+        )
+
+print("=" * 80)
+print("FRAUD INSIGHTS AGGREGATES REFRESHED")
+print("=" * 80)
+for table, outcome in summary:
+    print(f"✅ {table.split('.')[-1]:<28} {outcome}")
+print(f"✅ fraud_analysis version: {current_version}")
+print(f"✅ Claims (aggregate / source): {totals['total_claims'] or 0} / {expected[0]}")
+print(f"✅ Fraud (aggregate / source):  {totals['fraud_cases'] or 0} / {expected[1]}")
+print("=" * 80)
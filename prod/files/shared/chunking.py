@@ -0,0 +1,370 @@
+"""
+Fraud Detection Claims - Knowledge Base Chunking Module
+
+Pluggable chunking engine used by setup/06a_chunk_knowledge_base.py and the
+offline benchmark in notebooks/02_chunking_benchmark.py.
+
+- CharChunker: the original splitter (character limits, paragraph breaks)
+- TokenChunker: sizes in embedding-model tokens, merges undersized sections,
+  never cuts a sentence, and carries a sliding overlap between chunks
+- benchmark_chunkers: chunk count, embedding tokens/cost and recall@k of each
+  chunker on a labelled query set
+
+Nothing here needs Spark or dbutils, so chunkers run on executors inside
+mapInPandas (06a ships this module to them with cloudpickle).
+
+Usage:
+    from shared.chunking import get_chunker
+    chunker = get_chunker("token", embedding_model=cfg.embedding_model)
+    chunks = chunker.chunk(document_text)
+"""
+
+import re
+import time
+import math
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Max input tokens per embedding endpoint; chunks are sized well below these
+MODEL_TOKEN_LIMITS = {
+    "databricks-gte-large-en": 8192,
+    "databricks-bge-large-en": 512,
+}
+
+# Hugging Face tokenizers matching the endpoints (used only if transformers is installed)
+MODEL_TOKENIZERS = {
+    "databricks-gte-large-en": "Alibaba-NLP/gte-large-en-v1.5",
+    "databricks-bge-large-en": "BAAI/bge-large-en-v1.5",
+}
+
+DEFAULT_MAX_TOKENS = 384
+DEFAULT_MIN_TOKENS = 64
+DEFAULT_OVERLAP_TOKENS = 48
+
+STRATEGY_TOKEN = "token"
+STRATEGY_CHAR = "char"
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"(\[])|\n+')
+_WORD_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Counts tokens the way the embedding model does.
+
+    Uses the model's Hugging Face tokenizer when transformers is available,
+    otherwise a WordPiece-style estimate (words and punctuation, long words
+    counted as several pieces) that stays within ~10% for English prose.
+    """
+
+    def __init__(self, embedding_model: Optional[str] = None, use_tokenizer: bool = True):
+        self.embedding_model = embedding_model
+        self.use_tokenizer = use_tokenizer
+        self._tokenizer = None
+        self._loaded = False
+
+    def __getstate__(self):
+        # Executors load their own tokenizer instead of unpickling one
+        state = dict(self.__dict__)
+        state["_tokenizer"] = None
+        state["_loaded"] = False
+        return state
+
+    def _load(self):
+        self._loaded = True
+        name = MODEL_TOKENIZERS.get(self.embedding_model or "")
+        if not (self.use_tokenizer and name):
+            return
+        try:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(name)
+        except Exception:
+            self._tokenizer = None  # Offline or not installed - estimate instead
+
+    @property
+    def exact(self) -> bool:
+        """True if counts come from the model's tokenizer"""
+        if not self._loaded:
+            self._load()
+        return self._tokenizer is not None
+
+    def __call__(self, text: str) -> int:
+        if not self._loaded:
+            self._load()
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False))
+        return sum(max(1, math.ceil(len(piece) / 8)) for piece in _WORD_PIECES.findall(text))
+
+
+def parse_document(content: str) -> Dict[str, str]:
+    """Header fields (Document ID / Type / Title) and body of a knowledge base file"""
+    doc_id = ""
+    doc_type = ""
+    title = ""
+    main_content = []
+
+    for i, line in enumerate(content.split('\n')):
+        if line.startswith("Document ID:"):
+            doc_id = line.replace("Document ID:", "").strip()
+        elif line.startswith("Type:"):
+            doc_type = line.replace("Type:", "").strip()
+        elif line.startswith("Title:"):
+            title = line.replace("Title:", "").strip()
+        elif i > 4:  # Skip metadata lines
+            main_content.append(line)
+
+    return {"doc_id": doc_id, "doc_type": doc_type, "title": title, "text": '\n'.join(main_content).strip()}
+
+
+def split_into_sections(content: str) -> List[Dict[str, str]]:
+    """Split document into logical sections"""
+    sections = []
+    current_section = ""
+    current_title = ""
+
+    for line in content.split('\n'):
+        stripped = line.strip()
+
+        # Check if this is a section header (all caps, short line, or numbered)
+        is_header = (
+            (stripped.isupper() and len(stripped) < 80 and len(stripped) > 5) or
+            (re.match(r'^\d+\.', stripped)) or
+            (re.match(r'^[A-Z][^.!?]*:$', stripped))
+        )
+
+        if is_header and current_section:
+            # Save previous section
+            sections.append({'title': current_title, 'content': current_section.strip()})
+            current_section = line + '\n'
+            current_title = stripped
+        else:
+            current_section += line + '\n'
+
+    # Add final section
+    if current_section:
+        sections.append({'title': current_title, 'content': current_section.strip()})
+
+    return sections
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences and list items (line breaks count as boundaries)"""
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+class CharChunker:
+    """Original 06a splitter: sections, then paragraphs up to max_chunk_size characters"""
+
+    name = STRATEGY_CHAR
+
+    def __init__(self, max_chunk_size: int = 1500):
+        self.max_chunk_size = max_chunk_size
+
+    def chunk(self, text: str) -> List[str]:
+        chunks = []
+        for section in split_into_sections(text):
+            section_content = section['content']
+
+            # If section is small enough, keep as single chunk
+            if len(section_content) <= self.max_chunk_size:
+                chunks.append(section_content)
+                continue
+
+            # Split large sections by paragraphs
+            current_chunk = ""
+            for para in section_content.split('\n\n'):
+                if len(current_chunk) + len(para) <= self.max_chunk_size:
+                    current_chunk += para + '\n\n'
+                else:
+                    if current_chunk:
+                        chunks.append(current_chunk.strip())
+                    current_chunk = para + '\n\n'
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+
+        return [c for c in chunks if c]
+
+
+class TokenChunker:
+    """
+    Token-sized chunks that respect section and sentence boundaries.
+
+    1. Split into sections (headers)
+    2. Merge sections under min_tokens into their neighbour; one too small to
+       stand alone that does not fit whole is prepended to the next section
+    3. Pack sentences into chunks of at most max_tokens; a sentence that alone
+       exceeds max_tokens is split on words as a last resort
+    4. Start each chunk after the first with the previous chunk's trailing
+       sentences, up to overlap_tokens
+    """
+
+    name = STRATEGY_TOKEN
+
+    def __init__(self, max_tokens: int = DEFAULT_MAX_TOKENS, min_tokens: int = DEFAULT_MIN_TOKENS,
+                 overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, count_tokens: Optional[Callable[[str], int]] = None):
+        if overlap_tokens >= max_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than max_tokens ({max_tokens})")
+        self.max_tokens = max_tokens
+        self.min_tokens = min(min_tokens, max_tokens)
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens or TokenCounter()
+
+    def _merge_small_sections(self, sections: List[str]) -> List[str]:
+        merged = []
+        for section in sections:
+            if merged and self.count_tokens(merged[-1]) < self.min_tokens:
+                # Too small to be its own chunk - lead the next section even if it then needs packing
+                merged[-1] = merged[-1] + "\n\n" + section
+            elif merged and self.count_tokens(section) < self.min_tokens and \
+                    self.count_tokens(merged[-1]) + self.count_tokens(section) <= self.max_tokens:
+                merged[-1] = merged[-1] + "\n\n" + section
+            else:
+                merged.append(section)
+        return merged
+
+    def _split_long_sentence(self, sentence: str) -> List[str]:
+        pieces, current = [], []
+        for word in sentence.split():
+            if current and self.count_tokens(" ".join(current + [word])) > self.max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def _pack(self, section: str) -> List[str]:
+        sentences = []
+        for sentence in split_sentences(section):
+            if self.count_tokens(sentence) > self.max_tokens:
+                sentences.extend(self._split_long_sentence(sentence))
+            else:
+                sentences.append(sentence)
+
+        chunks, current, current_tokens = [], [], 0
+        for sentence in sentences:
+            tokens = self.count_tokens(sentence)
+            if current and current_tokens + tokens > self.max_tokens:
+                chunks.append(current)
+                # Carry trailing sentences forward as overlap
+                overlap, overlap_tokens = [], 0
+                for prev in reversed(current):
+                    prev_tokens = self.count_tokens(prev)
+                    if overlap_tokens + prev_tokens > self.overlap_tokens or \
+                            overlap_tokens + prev_tokens + tokens > self.max_tokens:
+                        break
+                    overlap.insert(0, prev)
+                    overlap_tokens += prev_tokens
+                current, current_tokens = overlap, overlap_tokens
+            current.append(sentence)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return ["\n".join(c) for c in chunks]
+
+    def chunk(self, text: str) -> List[str]:
+        sections = [s['content'] for s in split_into_sections(text) if s['content']]
+        chunks = []
+        for section in self._merge_small_sections(sections):
+            chunks.extend(self._pack(section))
+
+        # A trailing fragment below min_tokens joins the previous chunk when it fits
+        if len(chunks) > 1 and self.count_tokens(chunks[-1]) < self.min_tokens and \
+                self.count_tokens(chunks[-2]) + self.count_tokens(chunks[-1]) <= self.max_tokens:
+            chunks[-2] = chunks[-2] + "\n" + chunks.pop()
+        return chunks
+
+
+def get_chunker(strategy: str = STRATEGY_TOKEN, embedding_model: Optional[str] = None,
+                max_tokens: int = DEFAULT_MAX_TOKENS, min_tokens: int = DEFAULT_MIN_TOKENS,
+                overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, max_chunk_size: int = 1500,
+                count_tokens: Optional[Callable[[str], int]] = None):
+    """
+    Build a chunker by name.
+
+    Args:
+        strategy: "token" (TokenChunker) or "char" (original CharChunker)
+        embedding_model: serving endpoint name; picks the tokenizer and caps
+            max_tokens at the model's input limit
+    """
+    if strategy == STRATEGY_CHAR:
+        return CharChunker(max_chunk_size=max_chunk_size)
+    if strategy != STRATEGY_TOKEN:
+        raise ValueError(f"Unknown chunking strategy '{strategy}' (expected '{STRATEGY_TOKEN}' or '{STRATEGY_CHAR}')")
+    limit = MODEL_TOKEN_LIMITS.get(embedding_model or "")
+    if limit:
+        max_tokens = min(max_tokens, limit)
+    return TokenChunker(max_tokens=max_tokens, min_tokens=min_tokens, overlap_tokens=overlap_tokens,
+                        count_tokens=count_tokens or TokenCounter(embedding_model))
+
+
+def _cosine_top_k(query_vec, chunk_vecs, k):
+    def norm(v):
+        return math.sqrt(sum(x * x for x in v)) or 1.0
+    q_norm = norm(query_vec)
+    scores = [
+        (sum(a * b for a, b in zip(query_vec, vec)) / (q_norm * norm(vec)), i)
+        for i, vec in enumerate(chunk_vecs)
+    ]
+    scores.sort(reverse=True)
+    return [i for _, i in scores[:k]]
+
+
+def benchmark_chunkers(documents: Dict[str, str], queries: Sequence[Dict], chunkers: Dict[str, object],
+                       embed: Callable[[List[str]], List[List[float]]], k: int = 3,
+                       count_tokens: Optional[Callable[[str], int]] = None,
+                       cost_per_million_tokens: float = 0.0) -> List[Dict]:
+    """
+    Compare chunkers on a labelled query set.
+
+    Args:
+        documents: doc_id -> document text
+        queries: [{"query": str, "doc_id": str}] - the document that answers each query
+        chunkers: label -> chunker (anything with .chunk(text))
+        embed: list of texts -> list of vectors (the embedding endpoint)
+        k: recall cut-off - a query is a hit if a chunk of its doc_id is in the top k
+        count_tokens: tokenizer used for the embedding cost (defaults to the estimate)
+        cost_per_million_tokens: optional price to turn tokens into cost
+
+    Returns:
+        One dict per chunker: chunks, avg/min/max tokens, embed_tokens,
+        embed_cost, recall@k, mrr and embed_seconds
+    """
+    count_tokens = count_tokens or TokenCounter()
+    query_vecs = embed([q["query"] for q in queries]) if queries else []
+    results = []
+
+    for label, chunker in chunkers.items():
+        chunk_texts, chunk_docs = [], []
+        for doc_id, text in documents.items():
+            for chunk in chunker.chunk(text):
+                chunk_texts.append(chunk)
+                chunk_docs.append(doc_id)
+
+        token_counts = [count_tokens(c) for c in chunk_texts]
+        started = time.time()
+        chunk_vecs = embed(chunk_texts) if chunk_texts else []
+        embed_seconds = time.time() - started
+
+        hits, reciprocal_ranks = 0, []
+        for query, query_vec in zip(queries, query_vecs):
+            ranked_docs = [chunk_docs[i] for i in _cosine_top_k(query_vec, chunk_vecs, k)]
+            if query["doc_id"] in ranked_docs:
+                hits += 1
+                reciprocal_ranks.append(1.0 / (ranked_docs.index(query["doc_id"]) + 1))
+            else:
+                reciprocal_ranks.append(0.0)
+
+        embed_tokens = sum(token_counts)
+        results.append({
+            "chunker": label,
+            "chunks": len(chunk_texts),
+            "avg_tokens": round(embed_tokens / len(chunk_texts), 1) if chunk_texts else 0,
+            "min_tokens": min(token_counts) if token_counts else 0,
+            "max_tokens": max(token_counts) if token_counts else 0,
+            "embed_tokens": embed_tokens,
+            "embed_cost": round(embed_tokens / 1_000_000 * cost_per_million_tokens, 6),
+            f"recall@{k}": round(hits / len(queries), 3) if queries else 0.0,
+            "mrr": round(sum(reciprocal_ranks) / len(queries), 3) if queries else 0.0,
+            "embed_seconds": round(embed_seconds, 2),
+        })
+    return results
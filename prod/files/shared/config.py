@@ -63,6 +63,13 @@ class FraudDetectionConfig:
         self.knowledge_base_table = f"{self.catalog}.{self.schema}.fraud_cases_kb"
         self.vector_index = f"{self.catalog}.{self.schema}.fraud_cases_index"
         self.config_table = f"{self.catalog}.{self.schema}.config_genie"
+        self.analysis_table = f"{self.catalog}.{self.schema}.fraud_analysis"
+        
+        # Pre-aggregated tables behind the Fraud Insights dashboard (setup/11)
+        self.insights_daily_table = f"{self.catalog}.{self.schema}.fraud_insights_daily"
+        self.insights_by_type_table = f"{self.catalog}.{self.schema}.fraud_insights_by_type"
+        self.insights_indicators_table = f"{self.catalog}.{self.schema}.fraud_insights_indicators"
+        self.insights_state_table = f"{self.catalog}.{self.schema}.fraud_insights_state"
     
     def __repr__(self):
         return f"FraudDetectionConfig(env={self.catalog}, warehouse={self.warehouse_id})"